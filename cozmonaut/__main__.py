@@ -5,26 +5,119 @@
 
 import time
 
-from cozmonaut.component.client import ComponentClient, ClientOperation
-from cozmonaut.component.client.operation.interact import OperationInteractMode
+# Time startup from here, imports included
+_start = time.perf_counter()
+
+import argparse
+import signal
+import threading
+
+from cozmonaut.component.client import ClientOperation, ComponentClient
+
+
+def _waypoint(text: str):
+    """
+    Parse a waypoint given as "x,y".
+
+    :param text: The waypoint text
+    :return: The x and y coordinates (mm)
+    """
+
+    try:
+        x, y = text.split(',')
+        return float(x), float(y)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected x,y but got {text!r}')
+
+
+def _parser() -> argparse.ArgumentParser:
+    """
+    :return: The command-line parser, with a subcommand for each operation
+    """
+
+    parser = argparse.ArgumentParser(prog='cozmonaut', description='Meet and greet people with Cozmo robots')
+    ops = parser.add_subparsers(dest='op', metavar='operation')
+    ops.required = True
 
-if __name__ == '__main__':
     # Arguments for Cozmo interactions
-    args = {
-        'mode': OperationInteractMode.both,
-        'serial_a': '45a18821',
-        'serial_b': None,  # No second Cozmo yet
-    }
+    interact = ops.add_parser(ClientOperation.interact.name, help='drive the robots around to meet people')
+    interact.add_argument('--mode', choices=('both', 'only_a', 'only_b'), default='both',
+                          help='which robots must be found to run')
+    interact.add_argument('--serial-a', default='45a18821', help='the serial number of Cozmo A')
+    interact.add_argument('--serial-b', help='the serial number of Cozmo B')
+    interact.add_argument('--database', default='mysql://root@localhost/cozmo', help='the friends database URL')
+    interact.add_argument('--gallery-snapshot', default='gallery.snap', help='the face gallery snapshot file')
+    interact.add_argument('--battery-threshold', type=float, help='the battery voltage to charge at (volts)')
+    interact.add_argument('--swap-lead', type=float,
+                          help='seconds to spare for the swap, on top of docking time')
+    interact.add_argument('--dock-attempts', type=int, help='the number of docking attempts before giving up')
+    interact.add_argument('--waypoint', dest='patrol_route', type=_waypoint, action='append', metavar='X,Y',
+                          help='a patrol waypoint in millimeters out from the charger (repeat for a route)')
+    interact.add_argument('--track-quality', type=float, help='the tracker quality below which a face is lost')
+    interact.add_argument('--max-face-tasks', type=int, help='the number of faces to interact with at once')
+    interact.add_argument('--camera-latency', type=float, help='how long camera frames take to arrive (seconds)')
+    interact.add_argument('--no-motion-compensation', dest='motion_compensation', action='store_false',
+                          default=None, help="don't move face trackers along with the camera")
+
+    friend_list = ops.add_parser(ClientOperation.friend_list.name, help='list known friends')
+    friend_list.add_argument('--database', required=True, help='the friends database URL')
+    friend_list.add_argument('--sort', choices=('id', 'name', 'seen'), help='the sort key')
+    friend_list.add_argument('--descending', action='store_true', default=None, help='sort in descending order')
+    friend_list.add_argument('--since', help='only list friends seen since this date (YYYY-MM-DD)')
+    friend_list.add_argument('--prefix', help='only list friends whose names start with this')
+    friend_list.add_argument('--format', choices=('text', 'json'), help='the output format')
+    friend_list.add_argument('--page-size', type=int, help='the number of friends to read at a time')
+
+    friend_remove = ops.add_parser(ClientOperation.friend_remove.name, help='remove friends')
+    friend_remove.add_argument('ids', type=int, nargs='*', help='the face IDs to remove')
+    friend_remove.add_argument('--database', required=True, help='the friends database URL')
+    friend_remove.add_argument('--not-seen-days', type=int, help='remove friends not seen in this many days')
+    friend_remove.add_argument('--batch-size', type=int, help='the number of friends to remove per transaction')
 
-    # Create client component and prime it to launch the "interact" operation with above arguments
-    comp = ComponentClient(ClientOperation.interact, args)
+    friend_enroll = ops.add_parser(ClientOperation.friend_enroll.name, help='enroll friends from photos')
+    friend_enroll.add_argument('directory', help='the directory of photos')
+    friend_enroll.add_argument('--database', required=True, help='the friends database URL')
+    friend_enroll.add_argument('--workers', type=int, help='the number of worker processes')
+    friend_enroll.add_argument('--tolerance', type=float, help='the distance under which two faces are the same')
+    friend_enroll.add_argument('--batch-size', type=int, help='the number of friends to insert per transaction')
+
+    return parser
+
+
+def main():
+    args = vars(_parser().parse_args())
+    op = args.pop('op')
+
+    # Leave out whatever wasn't given, so the operation picks its own defaults
+    args = {key: value for key, value in args.items() if value is not None}
+
+    # Stop on Ctrl+C or a polite kill
+    stop = threading.Event()
+
+    def on_signal(signum, frame):
+        print(f'Got {signal.Signals(signum).name}; stopping...')
+        stop.set()
+
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+
+    # Create client component and prime it to launch the operation with above arguments
+    comp = ComponentClient(op, args)
 
     # Start client component
+    # Only now is the operation (and whatever it depends on) imported
     comp.start()
 
-    # Wait to simulate running other stuff
-    # TODO: This is where we can run the text-to-speech input (ncurses?), install ^C handler, etc.
-    time.sleep(3)
+    print(f'Started the {op} operation in {time.perf_counter() - _start:.2f} s')
+
+    # Run until told to stop (or the operation is done by itself)
+    while not comp.finished:
+        if stop.wait(0.1):
+            break
 
     # Stop client component
     comp.stop()
+
+
+if __name__ == '__main__':
+    main()
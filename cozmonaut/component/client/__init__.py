@@ -3,13 +3,15 @@
 # Copyright 2019 The Cozmonaut Contributors
 #
 
+import importlib
 from enum import Enum
+from typing import Dict, Type, Union
 
 from cozmonaut.component import AbstractComponent
 from cozmonaut.component.client.operation import AbstractClientOperation
-from cozmonaut.component.client.operation.friend_list import OperationFriendList
-from cozmonaut.component.client.operation.friend_remove import OperationFriendRemove
-from cozmonaut.component.client.operation.interact import OperationInteract
+
+# The entry point group that other packages can register client operations under
+ENTRY_POINT_GROUP = 'cozmonaut.client_operations'
 
 
 class ClientOperation(Enum):
@@ -22,6 +24,85 @@ class ClientOperation(Enum):
     friend_list = 1
     friend_remove = 2
     interact = 3
+    friend_enroll = 4
+
+
+# Where to find each client operation ("module:class", like an entry point)
+# Nothing is imported until an operation is actually used, as some of them pull in heavy dependencies
+_operations: Dict[str, str] = {
+    ClientOperation.friend_list.name: 'cozmonaut.component.client.operation.friend_list:OperationFriendList',
+    ClientOperation.friend_remove.name: 'cozmonaut.component.client.operation.friend_remove:OperationFriendRemove',
+    ClientOperation.interact.name: 'cozmonaut.component.client.operation.interact.operation:OperationInteract',
+    ClientOperation.friend_enroll.name: 'cozmonaut.component.client.operation.friend_enroll:OperationFriendEnroll',
+}
+
+# The operation classes loaded so far
+_loaded: Dict[str, Type[AbstractClientOperation]] = {}
+
+
+def register_operation(name: str, target: str):
+    """
+    Register a client operation.
+
+    :param name: The operation name
+    :param target: Where to find the operation class ("module:class")
+    """
+
+    _operations[name] = target
+    _loaded.pop(name, None)
+
+
+def operation_names():
+    """
+    :return: The names of all registered client operations
+    """
+    return sorted(_operations)
+
+
+def load_operation(name: str) -> Type[AbstractClientOperation]:
+    """
+    Load a client operation class, importing only what it needs.
+
+    Operations not registered here are looked for among the entry points that
+    installed packages provide.
+
+    :param name: The operation name
+    :return: The operation class
+    :raises KeyError: If there is no such operation
+    """
+
+    op_class = _loaded.get(name)
+    if op_class is not None:
+        return op_class
+
+    target = _operations.get(name)
+    if target is None:
+        target = _find_entry_point(name)
+        if target is None:
+            raise KeyError(name)
+
+    module_name, _, class_name = target.partition(':')
+    op_class = getattr(importlib.import_module(module_name), class_name)
+
+    _loaded[name] = op_class
+    return op_class
+
+
+def _find_entry_point(name: str):
+    """
+    Look for a client operation among the installed entry points.
+
+    :param name: The operation name
+    :return: Where to find the operation class ("module:class"), or None
+    """
+
+    # This scans every installed package, so only do it when we have to
+    import pkg_resources
+
+    for entry_point in pkg_resources.iter_entry_points(ENTRY_POINT_GROUP, name):
+        return f'{entry_point.module_name}:{".".join(entry_point.attrs)}'
+
+    return None
 
 
 class ComponentClient(AbstractComponent):
@@ -34,20 +115,26 @@ class ComponentClient(AbstractComponent):
     component, itself, is started.
     """
 
-    def __init__(self, op_name: ClientOperation, op_args: dict):
+    def __init__(self, op_name: Union[ClientOperation, str], op_args: dict):
+        # Accept the enum or the name of any registered operation
+        if isinstance(op_name, ClientOperation):
+            op_name = op_name.name
+
         self._op_name = op_name
         self._op_args = op_args
 
         self._op = None
 
+    @property
+    def finished(self) -> bool:
+        """
+        :return: True if the operation has finished on its own, otherwise False
+        """
+        return self._op is not None and self._op.finished
+
     def start(self):
         # Create the relevant operation instance
-        if self._op_name == ClientOperation.friend_list:
-            self._op = OperationFriendList(self._op_args)
-        elif self._op_name == ClientOperation.friend_remove:
-            self._op = OperationFriendRemove(self._op_args)
-        elif self._op_name == ClientOperation.interact:
-            self._op = OperationInteract(self._op_args)
+        self._op = load_operation(self._op_name)(self._op_args)
 
         # Start the operation
         self._op.start()
@@ -22,3 +22,10 @@ class AbstractClientOperation(ABC):
         """
         Stop the operation synchronously.
         """
+
+    @property
+    def finished(self) -> bool:
+        """
+        :return: True if the operation has finished on its own, otherwise False (it runs until stopped)
+        """
+        return False
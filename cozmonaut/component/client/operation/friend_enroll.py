@@ -0,0 +1,201 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures.process import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import PIL.Image
+import numpy
+
+from cozmonaut.component.client.operation import AbstractClientOperation
+from cozmonaut.component.client.operation.interact.face_tracker import RECOGNITION_TOLERANCE, compute_identities
+from cozmonaut.database import open_database
+from cozmonaut.database.friends import FriendRepository
+from cozmonaut.database.schema import create_schema
+
+# The photo file extensions we look for
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+class OperationFriendEnroll(AbstractClientOperation):
+    """
+    The friend enroll operation.
+
+    This enrolls friends from a directory of photos, without a robot ever
+    having to see them. Each photo should show exactly one face, and the file
+    name (minus extension, with underscores as spaces) is taken as the name.
+    Photos are processed across a pool of worker processes. Faces that nearly
+    match one already known (or one enrolled earlier in the same run) are
+    skipped as duplicates, and the rest are inserted in bulk.
+
+    Arguments:
+     - database: The database URL
+     - directory: The directory of photos
+     - workers: The number of worker processes (defaults to one per CPU)
+     - tolerance: The distance under which two faces count as duplicates (defaults to the recognition tolerance)
+     - batch_size: The number of friends to insert per transaction
+    """
+
+    def __init__(self, args: dict):
+        # Operation arguments
+        self.args = args
+
+        # The operation thread
+        self._thread = None
+
+    @property
+    def finished(self) -> bool:
+        return self._thread is not None and not self._thread.is_alive()
+
+    def start(self):
+        # Start operation thread
+        self._thread = threading.Thread(target=self.main)
+        self._thread.start()
+
+    def stop(self):
+        # Wait for the enrollment to finish
+        self._thread.join()
+
+    def main(self):
+        directory = self.args.get('directory')
+        batch_size = self.args.get('batch_size', 500)
+
+        # Find all the photos
+        paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                       if name.lower().endswith(PHOTO_EXTENSIONS))
+
+        print(f'Found {len(paths)} photos in {directory}')
+
+        db = open_database(self.args.get('database'))
+        friends = FriendRepository(db)
+
+        try:
+            create_schema(db)
+
+            # Start deduplicating against everyone we already know
+            _, known = friends.load_identities()
+            # Anyone recognition would take for a known friend is a duplicate
+            dedupe = _Deduplicator(known, self.args.get('tolerance', RECOGNITION_TOLERANCE))
+
+            start = time.perf_counter()
+            processed = 0
+            enrolled = 0
+            skipped = 0
+            duplicates = 0
+
+            # The friends waiting to be inserted
+            pending: List[Tuple[str, numpy.ndarray]] = []
+
+            # Workers are spawned fresh, as forking this (multithreaded) process could copy a held lock into them
+            with ProcessPoolExecutor(max_workers=self.args.get('workers'),
+                                     mp_context=multiprocessing.get_context('spawn')) as executor:
+                # Results come back in order, a few photos per round trip to each worker
+                for path, ident in executor.map(_embed_photo, paths, chunksize=8):
+                    processed += 1
+
+                    if ident is None:
+                        skipped += 1
+                    elif not dedupe.admit(ident):
+                        duplicates += 1
+                    else:
+                        pending.append((_photo_name(path), ident))
+
+                    # Insert in bulk
+                    if len(pending) >= batch_size:
+                        enrolled += len(friends.add_friends(pending))
+                        pending.clear()
+
+                    if processed % 100 == 0:
+                        elapsed = time.perf_counter() - start
+                        print(f'Processed {processed}/{len(paths)} photos ({processed / elapsed:.1f} images/s)')
+
+            # Insert the stragglers
+            if pending:
+                enrolled += len(friends.add_friends(pending))
+
+            elapsed = time.perf_counter() - start
+            print(f'Enrolled {enrolled} friends from {processed} photos in {elapsed:.1f} s '
+                  f'({processed / elapsed if elapsed else 0:.1f} images/s); '
+                  f'skipped {skipped} without exactly one face and {duplicates} duplicates')
+        finally:
+            db.close()
+
+
+class _Deduplicator:
+    """
+    Filters out faces that nearly match ones already seen.
+    """
+
+    def __init__(self, known: numpy.ndarray, tolerance: float):
+        """
+        :param known: The face identities already known (an N-by-128 matrix)
+        :param tolerance: The distance under which two faces count as duplicates
+        """
+
+        self._tolerance = tolerance
+
+        # The accepted face identities and their squared norms, in buffers that grow by doubling
+        capacity = max(1024, 2 * len(known))
+        self._idents = numpy.empty((capacity, known.shape[1]), numpy.float32)
+        self._idents[:len(known)] = known
+        self._norms = numpy.empty(capacity, numpy.float32)
+        self._norms[:len(known)] = numpy.einsum('ij,ij->i', known, known)
+        self._count = len(known)
+
+    def admit(self, ident: numpy.ndarray) -> bool:
+        """
+        Accept a face unless it nearly matches one already accepted.
+
+        :param ident: The face identity
+        :return: True if accepted, otherwise False
+        """
+
+        ident = numpy.asarray(ident, numpy.float32)
+        norm = float(ident @ ident)
+
+        if self._count:
+            # Squared distances to everyone at once, as one matrix-vector product
+            distances = self._norms[:self._count] - 2 * (self._idents[:self._count] @ ident) + norm
+            if distances.min() < self._tolerance ** 2:
+                return False
+
+        if self._count == len(self._idents):
+            self._idents = numpy.resize(self._idents, (2 * len(self._idents), self._idents.shape[1]))
+            self._norms = numpy.resize(self._norms, 2 * len(self._norms))
+
+        self._idents[self._count] = ident
+        self._norms[self._count] = norm
+        self._count += 1
+        return True
+
+
+def _embed_photo(path: str) -> Tuple[str, Optional[numpy.ndarray]]:
+    """
+    Compute the face identity in a photo. This runs in a worker process.
+
+    :param path: The photo path
+    :return: The path and the face identity (or None unless there's exactly one face)
+    """
+
+    try:
+        image = numpy.array(PIL.Image.open(path).convert('RGB'))
+    except OSError:
+        return path, None
+
+    idents = compute_identities(image)
+    return path, idents[0] if len(idents) == 1 else None
+
+
+def _photo_name(path: str) -> str:
+    """
+    :param path: The photo path
+    :return: The name of the person in the photo
+    """
+
+    return os.path.splitext(os.path.basename(path))[0].replace('_', ' ')
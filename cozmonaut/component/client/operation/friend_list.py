@@ -3,23 +3,83 @@
 # Copyright 2019 The Cozmonaut Contributors
 #
 
+import json
+import sys
+import threading
+from datetime import datetime
+
 from cozmonaut.component.client.operation import AbstractClientOperation
+from cozmonaut.database import open_database
+from cozmonaut.database.friends import FriendRepository
+from cozmonaut.database.schema import create_schema
 
 
 class OperationFriendList(AbstractClientOperation):
     """
     The friend list operation.
+
+    This writes known friends to standard output, one per line, as they are
+    read from the database. Friends are read a page at a time, so even a huge
+    list starts printing right away and never piles up in memory.
+
+    Arguments:
+     - database: The database URL
+     - sort: The sort key ('id', 'name', or 'seen')
+     - descending: True to sort in descending order
+     - since: Only list friends seen since this date (YYYY-MM-DD)
+     - prefix: Only list friends whose names start with this
+     - format: The output format ('text' or 'json' for JSON lines)
+     - page_size: The number of friends to read at a time
     """
 
     def __init__(self, args: dict):
-        super().__init__(args)
-
         # Operation arguments
         self.args = args
 
+        # The operation thread
+        self._thread = None
+
+    @property
+    def finished(self) -> bool:
+        return self._thread is not None and not self._thread.is_alive()
+
     def start(self):
-        print('friend list')
+        # Start operation thread
+        self._thread = threading.Thread(target=self.main)
+        self._thread.start()
 
     def stop(self):
-        # TODO: Wait for all DB operations to finish, etc.
-        pass
+        # Wait for the listing to finish
+        self._thread.join()
+
+    def main(self):
+        db = open_database(self.args.get('database'))
+        friends = FriendRepository(db)
+
+        since = self.args.get('since')
+        if isinstance(since, str):
+            since = datetime.strptime(since, '%Y-%m-%d')
+
+        json_lines = self.args.get('format', 'text') == 'json'
+
+        try:
+            # Make sure the tables are there (and up to date), so a fresh database just lists nobody
+            create_schema(db)
+
+            pages = friends.iter_friends(sort=self.args.get('sort', 'id'),
+                                         descending=self.args.get('descending', False),
+                                         seen_since=since,
+                                         name_prefix=self.args.get('prefix'),
+                                         page_size=self.args.get('page_size', 1000))
+
+            for page in pages:
+                for friend in page:
+                    if json_lines:
+                        print(json.dumps({'fid': friend.fid, 'name': friend.name, 'seen': friend.seen}))
+                    else:
+                        print(f'{friend.fid}\t{friend.name}\t{friend.seen}')
+
+                # Get each page out the door before fetching the next one
+                sys.stdout.flush()
+        finally:
+            db.close()
@@ -3,23 +3,98 @@
 # Copyright 2019 The Cozmonaut Contributors
 #
 
+import threading
+import time
+from datetime import datetime, timedelta
+
 from cozmonaut.component.client.operation import AbstractClientOperation
+from cozmonaut.database import open_database
+from cozmonaut.database.friends import FriendRepository
+from cozmonaut.database.schema import create_schema
 
 
 class OperationFriendRemove(AbstractClientOperation):
     """
     The friend remove operation.
+
+    This removes friends from the database in batches, one transaction per
+    batch. Friends can be picked by face ID, by how long it has been since they
+    were last seen, or both. Running interact operations drop the removed faces
+    from their trackers on their next sync with the database.
+
+    Arguments:
+     - database: The database URL
+     - ids: The face IDs to remove
+     - not_seen_days: Remove friends not seen in this many days
+     - batch_size: The number of friends to remove per transaction
     """
 
     def __init__(self, args: dict):
-        super().__init__(args)
-
         # Operation arguments
         self.args = args
 
+        # The operation thread
+        self._thread = None
+
+    @property
+    def finished(self) -> bool:
+        return self._thread is not None and not self._thread.is_alive()
+
     def start(self):
-        print('friend remove')
+        # Start operation thread
+        self._thread = threading.Thread(target=self.main)
+        self._thread.start()
 
     def stop(self):
-        # TODO: Wait for all DB operations to finish, etc.
-        pass
+        # Wait for all DB operations to finish
+        self._thread.join()
+
+    def main(self):
+        db = open_database(self.args.get('database'))
+        friends = FriendRepository(db)
+
+        batch_size = self.args.get('batch_size', 1000)
+
+        start = time.perf_counter()
+        removed = 0
+
+        try:
+            # Make sure the tables are there (and up to date)
+            # Without the change log triggers, running trackers would never hear about the removals
+            create_schema(db)
+
+            # Remove the given face IDs
+            ids = list(self.args.get('ids') or ())
+            for i in range(0, len(ids), batch_size):
+                removed += friends.remove_friends(ids[i:i + batch_size])
+                self._report(removed, start)
+
+            # Remove friends not seen in a while
+            not_seen_days = self.args.get('not_seen_days')
+            if not_seen_days is not None:
+                cutoff = datetime.now() - timedelta(days=not_seen_days)
+
+                while True:
+                    stale = friends.stale_friend_ids(cutoff, batch_size)
+                    if not stale:
+                        break
+
+                    removed += friends.remove_friends(stale)
+                    self._report(removed, start)
+        finally:
+            db.close()
+
+        elapsed = time.perf_counter() - start
+        print(f'Removed {removed} friends in {elapsed:.2f} s ({removed / elapsed if elapsed else 0:.0f} rows/s)')
+
+    @staticmethod
+    def _report(removed: int, start: float):
+        """
+        Report progress.
+
+        :param removed: The number of friends removed so far
+        :param start: The start time
+        """
+
+        elapsed = time.perf_counter() - start
+        print(f'Removed {removed} friends so far ({removed / elapsed if elapsed else 0:.0f} rows/s)')
@@ -0,0 +1,187 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+import math
+from typing import Tuple
+
+# The distance between Cozmo's treads (mm)
+WHEEL_BASE = 46
+
+
+def clip_angle(angle: float) -> float:
+    """
+    Clip an angle to the shortest equivalent turn.
+
+    Without this, Cozmo could spin on itself several times or turn, for
+    instance, -350 degrees instead of 10 degrees.
+
+    :param angle: The angle (radians)
+    :return: The equivalent angle in [-pi, pi] (radians)
+    """
+    return math.atan2(math.sin(angle), math.cos(angle))
+
+
+class AlignmentController:
+    """
+    A closed-loop controller that drives a robot onto a target pose.
+
+    This is the classic polar-coordinate controller for a differential drive
+    robot. Given the robot's pose and the target pose, it gives the wheel
+    speeds to use until the next control tick. Run it at a fixed rate, feeding
+    it the latest pose each time, and the robot glides onto the target, arriving
+    with the right heading, instead of stopping to turn, drive, and turn again.
+
+    It only does arithmetic, so it can be run against a simulated robot just as
+    well as a real one.
+    """
+
+    def __init__(self, distance_tol: float = 5, angle_tol: float = math.radians(5), k_rho: float = 1.5,
+                 k_alpha: float = 4, k_beta: float = -1.5, max_speed: float = 60):
+        """
+        :param distance_tol: The tolerance for placement error (mm)
+        :param angle_tol: The tolerance for orientation error (radians)
+        :param k_rho: The gain on distance to the target (1/s)
+        :param k_alpha: The gain on bearing to the target (1/s)
+        :param k_beta: The gain on heading error at the target (1/s; must be negative)
+        :param max_speed: The maximum wheel speed (mm/s)
+        """
+
+        self._distance_tol = distance_tol
+        self._angle_tol = angle_tol
+        self._k_rho = k_rho
+        self._k_alpha = k_alpha
+        self._k_beta = k_beta
+        self._max_speed = max_speed
+
+    def error(self, pose: Tuple[float, float, float], target: Tuple[float, float, float]) -> Tuple[float, float]:
+        """
+        Find how far a pose is from the target.
+
+        :param pose: The robot's x, y (mm), and heading (radians)
+        :param target: The target x, y (mm), and heading (radians)
+        :return: The distance (mm) and heading error (radians)
+        """
+
+        x, y, theta = pose
+        gx, gy, gtheta = target
+
+        return math.hypot(gx - x, gy - y), clip_angle(gtheta - theta)
+
+    def within_tolerance(self, pose: Tuple[float, float, float], target: Tuple[float, float, float]) -> bool:
+        """
+        :param pose: The robot's x, y (mm), and heading (radians)
+        :param target: The target x, y (mm), and heading (radians)
+        :return: True if the pose is on the target (within tolerance), otherwise False
+        """
+
+        distance, heading = self.error(pose, target)
+        return distance < self._distance_tol and math.fabs(heading) < self._angle_tol
+
+    def command(self, pose: Tuple[float, float, float], target: Tuple[float, float, float]) -> Tuple[float, float]:
+        """
+        Compute the wheel speeds for the next control tick.
+
+        :param pose: The robot's x, y (mm), and heading (radians)
+        :param target: The target x, y (mm), and heading (radians)
+        :return: The left and right wheel speeds (mm/s)
+        """
+
+        x, y, theta = pose
+        gx, gy, gtheta = target
+
+        rho, heading = self.error(pose, target)
+
+        if rho < self._distance_tol:
+            # Close enough, so just turn to face the right way
+            v = 0
+            w = self._k_alpha * heading
+        else:
+            # Bearing to the target, relative to where we face
+            alpha = clip_angle(math.atan2(gy - y, gx - x) - theta)
+
+            # If the target is behind us, back up to it instead of turning around
+            direction = 1
+            if math.fabs(alpha) > math.pi / 2:
+                direction = -1
+                alpha = clip_angle(alpha + math.pi)
+
+            # How far the target heading is from the line to the target
+            beta = clip_angle(gtheta - theta - alpha)
+
+            v = direction * self._k_rho * rho
+            w = self._k_alpha * alpha + self._k_beta * beta
+
+        # Differential drive
+        left = v - w * WHEEL_BASE / 2
+        right = v + w * WHEEL_BASE / 2
+
+        # Slow both wheels by the same factor, so the robot keeps its curve
+        fastest = max(math.fabs(left), math.fabs(right))
+        if fastest > self._max_speed:
+            left *= self._max_speed / fastest
+            right *= self._max_speed / fastest
+
+        return left, right
+
+
+class AlignmentResult:
+    """
+    The result of an alignment.
+    """
+
+    def __init__(self, aligned: bool, elapsed: float, iterations: int, distance: float, heading: float):
+        """
+        :param aligned: True if the robot made it onto the target, otherwise False
+        :param elapsed: The time taken (seconds)
+        :param iterations: The number of control ticks
+        :param distance: The final distance from the target (mm)
+        :param heading: The final heading error (radians)
+        """
+
+        self._aligned = aligned
+        self._elapsed = elapsed
+        self._iterations = iterations
+        self._distance = distance
+        self._heading = heading
+
+    @property
+    def aligned(self) -> bool:
+        """
+        :return: True if the robot made it onto the target, otherwise False
+        """
+        return self._aligned
+
+    @property
+    def elapsed(self) -> float:
+        """
+        :return: The time taken (seconds)
+        """
+        return self._elapsed
+
+    @property
+    def iterations(self) -> int:
+        """
+        :return: The number of control ticks
+        """
+        return self._iterations
+
+    @property
+    def distance(self) -> float:
+        """
+        :return: The final distance from the target (mm)
+        """
+        return self._distance
+
+    @property
+    def heading(self) -> float:
+        """
+        :return: The final heading error (radians)
+        """
+        return self._heading
+
+    def __str__(self):
+        state = 'aligned' if self._aligned else 'not aligned'
+        return (f'{state} in {self._elapsed:.2f} s and {self._iterations} iterations '
+                f'({self._distance:.1f} mm, {math.degrees(self._heading):.1f} deg off)')
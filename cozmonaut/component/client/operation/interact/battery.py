@@ -0,0 +1,173 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+import math
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+
+class BatteryModel:
+    """
+    A model of one robot's battery.
+
+    Cozmo's battery voltage is noisy, and it sags whenever the motors work, so a
+    single reading says little. This keeps a smoothed voltage (an exponentially
+    weighted moving average), fits a line through the recent smoothed readings,
+    and from the slope of that line predicts how long until the voltage reaches
+    some threshold.
+    """
+
+    def __init__(self, smoothing: float = 0.1, window: float = 300, min_span: float = 30):
+        """
+        :param smoothing: The weight of each new reading in the moving average (0 to 1)
+        :param window: How far back to fit the discharge line (seconds)
+        :param min_span: The least history needed to predict anything (seconds)
+        """
+
+        self._smoothing = smoothing
+        self._window = window
+        self._min_span = min_span
+
+        # The smoothed voltage
+        self._voltage: Optional[float] = None
+
+        # The recent history of smoothed voltage (time, voltage)
+        self._history: Deque[Tuple[float, float]] = deque()
+
+    @property
+    def voltage(self) -> Optional[float]:
+        """
+        :return: The smoothed voltage (volts), or None if there are no readings yet
+        """
+        return self._voltage
+
+    @property
+    def slope(self) -> float:
+        """
+        :return: The recent rate of change of the voltage (volts per second)
+        """
+
+        n = len(self._history)
+        if n < 2 or self._history[-1][0] - self._history[0][0] < self._min_span:
+            return 0
+
+        # Least squares fit (relative to the first sample time to keep the numbers small)
+        t0 = self._history[0][0]
+        mean_t = sum(t - t0 for t, _ in self._history) / n
+        mean_v = sum(v for _, v in self._history) / n
+
+        cov = sum((t - t0 - mean_t) * (v - mean_v) for t, v in self._history)
+        var = sum((t - t0 - mean_t) ** 2 for t, _ in self._history)
+
+        return cov / var if var > 0 else 0
+
+    def clear(self):
+        """
+        Forget all readings (say, after the robot is put on the charger).
+        """
+
+        self._voltage = None
+        self._history.clear()
+
+    def add(self, t: float, voltage: float):
+        """
+        Add a voltage reading.
+
+        :param t: The time of the reading (seconds)
+        :param voltage: The voltage (volts)
+        """
+
+        if self._voltage is None:
+            self._voltage = voltage
+        else:
+            self._voltage += self._smoothing * (voltage - self._voltage)
+
+        self._history.append((t, self._voltage))
+
+        # Drop readings that have fallen out of the window
+        while self._history and self._history[0][0] < t - self._window:
+            self._history.popleft()
+
+    def time_to(self, threshold: float) -> float:
+        """
+        Predict how long until the voltage falls to a threshold.
+
+        :param threshold: The threshold (volts)
+        :return: The time left (seconds; zero if already there, infinite if not falling)
+        """
+
+        if self._voltage is None:
+            return math.inf
+
+        if self._voltage <= threshold:
+            return 0
+
+        slope = self.slope
+        if slope >= 0:
+            return math.inf
+
+        return (threshold - self._voltage) / slope
+
+
+class SwapScheduler:
+    """
+    Decides when to swap the idle robot in for the active one.
+
+    The active robot must be on its way home before its battery runs down to
+    the threshold, and docking takes time. So the swap starts once the time left
+    before the threshold is no more than the lead time: long enough for the
+    other robot to leave its charger and for this one to dock.
+    """
+
+    def __init__(self, threshold: float = 3.5, lead_time: float = 120):
+        """
+        :param threshold: The battery voltage below which a robot must be charging (volts)
+        :param lead_time: How far ahead of the threshold to start the swap (seconds)
+        """
+
+        self._threshold = threshold
+        self._lead_time = lead_time
+
+    @property
+    def threshold(self) -> float:
+        """
+        :return: The battery voltage below which a robot must be charging (volts)
+        """
+        return self._threshold
+
+    @property
+    def lead_time(self) -> float:
+        """
+        :return: How far ahead of the threshold to start the swap (seconds)
+        """
+        return self._lead_time
+
+    @lead_time.setter
+    def lead_time(self, value: float):
+        """
+        :param value: How far ahead of the threshold to start the swap (seconds)
+        """
+        self._lead_time = value
+
+    def time_left(self, model: BatteryModel) -> float:
+        """
+        :param model: The battery model of the active robot
+        :return: The predicted time before it reaches the threshold (seconds)
+        """
+        return model.time_to(self._threshold)
+
+    def swap_due(self, model: BatteryModel) -> bool:
+        """
+        :param model: The battery model of the active robot
+        :return: True if it is time to swap the other robot in, otherwise False
+        """
+        return self.time_left(model) <= self._lead_time
+
+    def must_dock(self, model: BatteryModel) -> bool:
+        """
+        :param model: The battery model of the active robot
+        :return: True if it has to go charge now, swap or no swap, otherwise False
+        """
+        return self.time_left(model) == 0
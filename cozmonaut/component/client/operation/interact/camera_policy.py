@@ -0,0 +1,140 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+import cozmo
+
+
+class CameraPolicy:
+    """
+    A policy for how much of a robot's camera stream we use.
+
+    Cozmo streams frames whether or not anybody is around, and every frame we
+    accept costs decode time and face tracker work. This policy picks a target
+    frame rate and whether color is worth it, based on what the robot is doing:
+
+     - Tracking faces: color, full rate
+     - Active, but no faces: color, reduced rate (we only need to spot faces)
+     - Idle on the charger: grayscale, trickle rate
+
+    Frames beyond the target rate are decimated (dropped before processing). On
+    top of that, if processing falls behind the target rate, the rate backs off
+    until processing keeps up again.
+    """
+
+    def __init__(self, tracking_fps: float = 15, searching_fps: float = 5, idle_fps: float = 1,
+                 max_load: float = 0.8):
+        """
+        :param tracking_fps: The target frame rate while tracking faces
+        :param searching_fps: The target frame rate while active with no faces in view
+        :param idle_fps: The target frame rate while idling on the charger
+        :param max_load: The maximum fraction of each frame interval we may spend processing
+        """
+
+        self._tracking_fps = tracking_fps
+        self._searching_fps = searching_fps
+        self._idle_fps = idle_fps
+        self._max_load = max_load
+
+        # What the robot is up to
+        self._idle = False
+        self._tracking = False
+
+        # The time of the last accepted frame
+        self._last_admit = None
+
+        # A moving average of time spent processing each frame (seconds)
+        self._busy = 0
+
+        # Frame counters
+        self._frames_seen = 0
+        self._frames_admitted = 0
+
+    @property
+    def color(self) -> bool:
+        """
+        :return: True if color imaging is worth it right now, otherwise False
+        """
+
+        # Never switch away from color with faces in view (recognition needs color)
+        return self._tracking or not self._idle
+
+    @property
+    def target_fps(self) -> float:
+        """
+        :return: The target frame rate
+        """
+
+        if self._tracking:
+            fps = self._tracking_fps
+        elif self._idle:
+            fps = self._idle_fps
+        else:
+            fps = self._searching_fps
+
+        # Back off if processing can't keep up
+        if self._busy > 0:
+            fps = min(fps, self._max_load / self._busy)
+
+        return fps
+
+    @property
+    def admit_ratio(self) -> float:
+        """
+        :return: The fraction of frames seen that were admitted
+        """
+        return self._frames_admitted / self._frames_seen if self._frames_seen else 0
+
+    def set_idle(self, idle: bool):
+        """
+        :param idle: True if the robot is idling on its charger, otherwise False
+        """
+        self._idle = idle
+
+    def set_tracking(self, tracking: bool):
+        """
+        :param tracking: True if any faces are being tracked, otherwise False
+        """
+        self._tracking = tracking
+
+    def admit(self, now: float) -> bool:
+        """
+        Decide whether to process a frame.
+
+        :param now: The current monotonic time (seconds)
+        :return: True if the frame should be processed, otherwise False
+        """
+
+        self._frames_seen += 1
+
+        # Accept frames no faster than the target rate
+        # The bit of slack keeps us from dropping every other frame due to jitter
+        if self._last_admit is not None and now - self._last_admit < 0.9 / self.target_fps:
+            return False
+
+        self._last_admit = now
+        self._frames_admitted += 1
+        return True
+
+    def report(self, busy: float):
+        """
+        Report how long processing an admitted frame took.
+
+        :param busy: The processing time (seconds)
+        """
+
+        self._busy = 0.8 * self._busy + 0.2 * busy
+
+    def apply(self, robot: cozmo.robot.Robot):
+        """
+        Apply the policy to a robot's camera.
+
+        :param robot: The robot instance
+        """
+
+        if robot.camera.color_image_enabled != self.color:
+            robot.camera.color_image_enabled = self.color
+
+        if not robot.camera.image_stream_enabled:
+            robot.camera.image_stream_enabled = True
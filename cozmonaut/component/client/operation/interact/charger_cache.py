@@ -0,0 +1,118 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+import math
+from typing import Optional
+
+from cozmo.util import Pose
+
+
+class ChargerPoseCache:
+    """
+    Remembers where a robot last saw its charger.
+
+    Finding the charger means spinning in place until it comes into view, which
+    is the slowest part of docking. But the charger doesn't move, so as long as
+    the robot hasn't lost its bearings since (that is, its pose still shares an
+    origin with the charger's pose), a recent sighting is as good as a new one.
+
+    Cozmo's world forgets the charger's pose whenever it is invalidated; this
+    cache keeps it, along with the origin it belongs to and when it was seen.
+    """
+
+    def __init__(self):
+        # The last good charger pose and when it was seen (seconds on the caller's clock)
+        self._pose: Optional[Pose] = None
+        self._seen_at: Optional[float] = None
+
+        # Lookup counters
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def pose(self) -> Optional[Pose]:
+        """
+        :return: The last good charger pose, if any
+        """
+        return self._pose
+
+    @property
+    def origin_id(self) -> Optional[int]:
+        """
+        :return: The origin of the last good charger pose, if any
+        """
+        return self._pose.origin_id if self._pose is not None else None
+
+    @property
+    def hits(self) -> int:
+        """
+        :return: The number of lookups that found a usable pose
+        """
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """
+        :return: The number of lookups that did not
+        """
+        return self._misses
+
+    def age(self, now: float) -> float:
+        """
+        :param now: The current time (seconds)
+        :return: The age of the last good charger pose (seconds; infinite if none)
+        """
+
+        if self._seen_at is None:
+            return math.inf
+
+        return now - self._seen_at
+
+    def remember(self, pose: Pose, seen_at: float):
+        """
+        Remember a sighting of the charger.
+
+        Older sightings than the one remembered are ignored.
+
+        :param pose: The charger pose
+        :param seen_at: When the charger was seen (seconds)
+        """
+
+        if not pose.is_valid:
+            return
+
+        if self._seen_at is not None and seen_at < self._seen_at:
+            return
+
+        # Keep a copy, as Cozmo invalidates its own pose objects in place
+        self._pose = Pose(pose.position.x, pose.position.y, pose.position.z,
+                          q0=pose.rotation.q0, q1=pose.rotation.q1, q2=pose.rotation.q2, q3=pose.rotation.q3,
+                          origin_id=pose.origin_id)
+        self._seen_at = seen_at
+
+    def forget(self):
+        """
+        Forget the charger pose (say, because docking against it failed).
+        """
+
+        self._pose = None
+        self._seen_at = None
+
+    def lookup(self, robot_pose: Pose, now: float, max_age: float) -> Optional[Pose]:
+        """
+        Look up a charger pose the robot can use right now.
+
+        :param robot_pose: The robot's current pose
+        :param now: The current time (seconds)
+        :param max_age: The maximum age of a usable pose (seconds)
+        :return: The charger pose, or None if there is no usable one
+        """
+
+        if self._pose is None or self.age(now) > max_age or not self._pose.is_comparable(robot_pose):
+            self._misses += 1
+            return None
+
+        self._hits += 1
+        return self._pose
@@ -0,0 +1,773 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+import asyncio
+import itertools
+import math
+from enum import Enum
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import cozmo
+from cozmo.util import Pose, degrees, distance_mm, radians
+
+from cozmonaut.component.client.operation.interact.alignment import AlignmentController, AlignmentResult
+from cozmonaut.component.client.operation.interact.charger_cache import ChargerPoseCache
+from cozmonaut.component.client.operation.interact.motion import MotionLock
+
+# The pitch (degrees) past which a reversing robot must be climbing the charger's wall
+WALL_PITCH = 20
+
+
+class DockingPhase(Enum):
+    """
+    A phase of the docking procedure.
+    """
+
+    approach = 0  # Drive to the charger without much precision
+    locate = 1  # Get a fresh fix on the charger
+    align = 2  # Line up right in front of the charger
+    reverse = 3  # Turn around and back the rear wheels onto the charger
+    climb = 4  # Back the front wheels onto the charger
+    seat = 5  # Back up onto the charger's contacts
+    recover = 6  # Back away so the procedure can start over
+
+
+# The default time limits for the docking phases (seconds)
+PHASE_TIMEOUTS = {
+    DockingPhase.approach: 45,
+    DockingPhase.locate: 30,
+    DockingPhase.align: 30,
+    DockingPhase.reverse: 8,
+    DockingPhase.climb: 4,
+    DockingPhase.seat: 6,
+    DockingPhase.recover: 10,
+}
+
+# How long to look for the charger in each round of the search (seconds)
+# The first round only looks straight ahead; the rest look around, each longer than the last
+SEARCH_TIMEOUTS = (1, 3, 6, 12)
+
+# The phases whose failure casts doubt on where we think the charger is
+POSE_SENSITIVE_PHASES = (DockingPhase.align, DockingPhase.reverse, DockingPhase.climb)
+
+
+async def play_animation(robot: cozmo.robot.Robot, anim_trig, body=False, lift=False, parallel=False):
+    """
+    Play an animation and wait for it to finish.
+
+    :param robot: The robot instance
+    :param anim_trig: The animation trigger (one of cozmo.anim.Triggers)
+    :param body: True to keep the animation off the body track
+    :param lift: True to keep the animation off the lift track
+    :param parallel: True to run alongside other actions
+    """
+
+    await robot.play_anim_trigger(anim_trig, loop_count=1, in_parallel=parallel,
+                                  num_retries=0, use_lift_safe=False,
+                                  ignore_body_track=body, ignore_head_track=False,
+                                  ignore_lift_track=lift).wait_for_completed()
+
+
+async def frustrated(robot: cozmo.robot.Robot):
+    """
+    :param robot: The robot instance
+    """
+
+    await play_animation(robot, cozmo.anim.Triggers.FrustratedByFailureMajor)
+
+
+async def celebrate(robot: cozmo.robot.Robot):
+    """
+    :param robot: The robot instance
+    """
+
+    await play_animation(robot, cozmo.anim.Triggers.CodeLabCelebrate, body=True, lift=True, parallel=True)
+
+
+def target_pose(charger_pose: Pose, dist_charger: float):
+    """
+    Find the spot right in front of a charger.
+
+    :param charger_pose: The charger pose
+    :param dist_charger: The distance in front of the charger (mm)
+    :return: The target x, y, and z (mm), and the charger's heading (radians)
+    """
+
+    c_z_rot = charger_pose.rotation.angle_z.radians
+
+    x = charger_pose.position.x - dist_charger * math.cos(c_z_rot)
+    y = charger_pose.position.y - dist_charger * math.sin(c_z_rot)
+    z = charger_pose.position.z
+
+    return x, y, z, c_z_rot
+
+
+class DockingOutcome:
+    """
+    The outcome of docking a robot.
+    """
+
+    def __init__(self, docked: bool, attempts: int, duration: float, phase: Optional[DockingPhase] = None,
+                 reason: Optional[str] = None):
+        """
+        :param docked: True if the robot made it onto the charger, otherwise False
+        :param attempts: The number of attempts made
+        :param duration: The total time taken (seconds)
+        :param phase: The phase the last attempt failed in, if any
+        :param reason: Why the last attempt failed, if it did
+        """
+
+        self._docked = docked
+        self._attempts = attempts
+        self._duration = duration
+        self._phase = phase
+        self._reason = reason
+
+    @property
+    def docked(self) -> bool:
+        """
+        :return: True if the robot made it onto the charger, otherwise False
+        """
+        return self._docked
+
+    @property
+    def attempts(self) -> int:
+        """
+        :return: The number of attempts made
+        """
+        return self._attempts
+
+    @property
+    def duration(self) -> float:
+        """
+        :return: The total time taken (seconds)
+        """
+        return self._duration
+
+    @property
+    def phase(self) -> Optional[DockingPhase]:
+        """
+        :return: The phase the last attempt failed in, if any
+        """
+        return self._phase
+
+    @property
+    def reason(self) -> Optional[str]:
+        """
+        :return: Why the last attempt failed, if it did
+        """
+        return self._reason
+
+    def __str__(self):
+        if self._docked:
+            return f'docked after {self._attempts} attempt(s) in {self._duration:.1f} s'
+
+        return (f'gave up after {self._attempts} attempt(s) in {self._duration:.1f} s '
+                f'({self._phase.name} {self._reason})')
+
+
+class DockingStats:
+    """
+    Statistics on docking, kept to see where dock time goes.
+
+    For each phase, this records how many times it ran, how many of those
+    succeeded, and how long it took.
+    """
+
+    def __init__(self):
+        # Per-phase run counts, success counts, and total and longest durations
+        self._runs: Dict[DockingPhase, int] = {phase: 0 for phase in DockingPhase}
+        self._successes: Dict[DockingPhase, int] = {phase: 0 for phase in DockingPhase}
+        self._total_time: Dict[DockingPhase, float] = {phase: 0 for phase in DockingPhase}
+        self._max_time: Dict[DockingPhase, float] = {phase: 0 for phase in DockingPhase}
+
+        # The outcomes of whole dockings
+        self._outcomes: List[DockingOutcome] = []
+
+        # The results of alignments
+        self._alignments: List[AlignmentResult] = []
+
+    @property
+    def outcomes(self) -> List[DockingOutcome]:
+        """
+        :return: The outcomes of all dockings so far
+        """
+        return list(self._outcomes)
+
+    @property
+    def mean_duration(self) -> Optional[float]:
+        """
+        :return: The mean duration of successful dockings (seconds), or None if there were none
+        """
+
+        docked = [outcome for outcome in self._outcomes if outcome.docked]
+        return sum(outcome.duration for outcome in docked) / len(docked) if docked else None
+
+    def record_phase(self, phase: DockingPhase, duration: float, ok: bool):
+        """
+        Record one run of a docking phase.
+
+        :param phase: The phase
+        :param duration: How long it took (seconds)
+        :param ok: True if it succeeded, otherwise False
+        """
+
+        self._runs[phase] += 1
+        self._total_time[phase] += duration
+        self._max_time[phase] = max(self._max_time[phase], duration)
+        if ok:
+            self._successes[phase] += 1
+
+    def record_alignment(self, result: AlignmentResult):
+        """
+        Record the result of an alignment with the charger.
+
+        :param result: The result
+        """
+
+        self._alignments.append(result)
+
+    def record_outcome(self, outcome: DockingOutcome):
+        """
+        Record the outcome of a whole docking.
+
+        :param outcome: The outcome
+        """
+
+        self._outcomes.append(outcome)
+
+    def success_rate(self, phase: DockingPhase) -> float:
+        """
+        :param phase: The phase
+        :return: The fraction of runs of the phase that succeeded
+        """
+        return self._successes[phase] / self._runs[phase] if self._runs[phase] else 0
+
+    def mean_time(self, phase: DockingPhase) -> float:
+        """
+        :param phase: The phase
+        :return: The mean duration of the phase (seconds)
+        """
+        return self._total_time[phase] / self._runs[phase] if self._runs[phase] else 0
+
+    def summary(self) -> str:
+        """
+        :return: A human-readable summary
+        """
+
+        docked = [outcome for outcome in self._outcomes if outcome.docked]
+
+        lines = [f'{len(docked)} of {len(self._outcomes)} dockings succeeded']
+        if docked:
+            mean_attempts = sum(outcome.attempts for outcome in docked) / len(docked)
+            lines.append(f'Successful dockings took {self.mean_duration:.1f} s and {mean_attempts:.1f} attempt(s) '
+                         f'on average')
+
+        if self._alignments:
+            aligned = sum(1 for result in self._alignments if result.aligned)
+            mean_elapsed = sum(result.elapsed for result in self._alignments) / len(self._alignments)
+            mean_iterations = sum(result.iterations for result in self._alignments) / len(self._alignments)
+            lines.append(f'{aligned} of {len(self._alignments)} alignments succeeded, taking {mean_elapsed:.2f} s '
+                         f'and {mean_iterations:.0f} iterations on average')
+
+        for phase in DockingPhase:
+            if self._runs[phase]:
+                lines.append(f'  {phase.name:<9} {self._runs[phase]:>5} runs, '
+                             f'{100 * self.success_rate(phase):5.1f}% ok, '
+                             f'mean {self.mean_time(phase):5.2f} s, max {self._max_time[phase]:5.2f} s')
+
+        return '\n'.join(lines)
+
+
+class ChargerDocking:
+    """
+    Drives one robot back onto its charger.
+
+    This is an asynchronous port of the docking procedure in
+    python/chargerReturn.py, run as a state machine. Each attempt goes through
+    the docking phases in order, and every phase has a time limit. An attempt
+    that fails backs away from the charger and, after a growing pause, starts
+    over. After a bounded number of attempts, we give up and report the failure
+    so the caller can do something else (like swap in the other robot).
+
+    Every action is awaited instead of blocked on, and the climb onto the
+    charger is followed through robot state updates instead of sleep-polling,
+    so any number of robots can dock at once on one loop.
+
+    Where the charger was last seen is kept in a charger pose cache, which
+    outlives any one docking. As long as the cached pose is still comparable
+    with the robot's, we drive straight for it instead of looking around. Only
+    when it is not, or when docking against it fails, do we search again.
+
+    The robot's motion lock is held exclusively for the whole docking, so
+    nothing else (like the face servo) moves the robot in the meantime.
+    """
+
+    def __init__(self, robot: cozmo.robot.Robot, stats: DockingStats = None, cache: ChargerPoseCache = None,
+                 motion: MotionLock = None, max_attempts: int = 5, timeouts: Dict[DockingPhase, float] = None,
+                 backoff: float = 1, max_backoff: float = 8, max_pose_age: float = 600, fix_age: float = 5):
+        """
+        :param robot: The robot instance
+        :param stats: The statistics to record to (optional)
+        :param cache: The charger pose cache for the robot (optional)
+        :param motion: The robot's motion lock (optional)
+        :param max_attempts: The maximum number of attempts before giving up
+        :param timeouts: The time limits for the phases (seconds; defaults to PHASE_TIMEOUTS)
+        :param backoff: The pause after the first failed attempt (seconds; doubles with each failure)
+        :param max_backoff: The longest pause between attempts (seconds)
+        :param max_pose_age: The maximum age of a cached charger pose to drive toward (seconds)
+        :param fix_age: The maximum age of a cached charger pose to line up against (seconds)
+        """
+
+        self._robot = robot
+        self._stats = stats if stats is not None else DockingStats()
+        self._max_attempts = max_attempts
+        self._timeouts = {**PHASE_TIMEOUTS, **(timeouts or {})}
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._cache = cache if cache is not None else ChargerPoseCache()
+        self._motion = motion if motion is not None else MotionLock()
+        self._max_pose_age = max_pose_age
+        self._fix_age = fix_age
+
+        # Steers the robot onto the spot in front of the charger
+        self._controller = AlignmentController()
+
+        # Pitch (degrees) when the head is level, plus a little slack
+        self._pitch_threshold = 0
+
+        # The pose of the charger we are docking with
+        self._charger_pose = None
+
+    @property
+    def stats(self) -> DockingStats:
+        """
+        :return: The docking statistics
+        """
+        return self._stats
+
+    async def dock(self) -> DockingOutcome:
+        """
+        Dock the robot.
+
+        :return: The outcome
+        """
+
+        async with self._motion.exclusive():
+            return await self._dock()
+
+    async def _dock(self) -> DockingOutcome:
+        """
+        Dock the robot (with the motion lock held).
+
+        :return: The outcome
+        """
+
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+
+        phase = None
+        reason = None
+
+        for attempt in range(1, self._max_attempts + 1):
+            phase, reason = await self._attempt()
+
+            if phase is None:
+                outcome = DockingOutcome(True, attempt, loop.time() - start)
+                self._stats.record_outcome(outcome)
+                print(f'Robot {self._robot.serial} {outcome}')
+
+                # A small celebration (not counted toward dock time)
+                await self._run_phase_quietly(self._celebrate(), 10)
+                return outcome
+
+            print(f'Docking attempt {attempt} of {self._max_attempts} failed: {phase.name} {reason}')
+
+            # Maybe the charger isn't where we thought, so look again next time
+            if phase in POSE_SENSITIVE_PHASES:
+                self._cache.forget()
+
+            if attempt < self._max_attempts:
+                # Back away and try again, waiting a bit longer each time
+                await self._run_phase(DockingPhase.recover, self._restart_procedure)
+                await asyncio.sleep(min(self._backoff * 2 ** (attempt - 1), self._max_backoff))
+
+        # Leave the robot stopped where it is
+        self._robot.abort_all_actions(log_abort_messages=False)
+        self._robot.stop_all_motors()
+
+        outcome = DockingOutcome(False, self._max_attempts, loop.time() - start, phase, reason)
+        self._stats.record_outcome(outcome)
+        print(f'Robot {self._robot.serial} {outcome}')
+        return outcome
+
+    async def _attempt(self):
+        """
+        Make one attempt at docking.
+
+        :return: The phase that failed and why, or (None, None) if docked
+        """
+
+        steps = [
+            (DockingPhase.approach, self._approach),
+            (DockingPhase.locate, self._locate),
+            (DockingPhase.align, self._align),
+            (DockingPhase.reverse, self._reverse),
+            (DockingPhase.climb, self._climb),
+            (DockingPhase.seat, self._seat),
+        ]
+
+        for phase, step in steps:
+            reason = await self._run_phase(phase, step)
+            if reason is not None:
+                return phase, reason
+
+        return None, None
+
+    async def _run_phase(self, phase: DockingPhase, step: Callable[[], Awaitable[bool]]) -> Optional[str]:
+        """
+        Run one docking phase within its time limit.
+
+        :param phase: The phase
+        :param step: The coroutine function for the phase (returns True on success)
+        :return: Why the phase failed, or None if it succeeded
+        """
+
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+
+        try:
+            reason = None if await asyncio.wait_for(step(), self._timeouts[phase]) else 'failed'
+        except asyncio.TimeoutError:
+            # Whatever the robot was doing for the phase is still going, so stop it
+            self._robot.abort_all_actions(log_abort_messages=False)
+            self._robot.stop_all_motors()
+            reason = 'timed out'
+        except cozmo.exceptions.CozmoSDKException as e:
+            reason = f'raised {e!r}'
+
+        self._stats.record_phase(phase, loop.time() - start, reason is None)
+        return reason
+
+    async def _run_phase_quietly(self, coro: Awaitable, timeout: float):
+        """
+        Run an optional bit of the procedure, ignoring failure.
+
+        :param coro: The coroutine
+        :param timeout: The time limit (seconds)
+        """
+
+        try:
+            await asyncio.wait_for(coro, timeout)
+        except (asyncio.TimeoutError, cozmo.exceptions.CozmoSDKException):
+            pass
+
+    async def _approach(self) -> bool:
+        """
+        Drive towards the charger without much precision.
+
+        :return: True on success, otherwise False
+        """
+
+        robot = self._robot
+
+        await robot.set_head_angle(degrees(0), in_parallel=False).wait_for_completed()
+        self._pitch_threshold = math.fabs(robot.pose_pitch.degrees) + 1
+        print(f'Pitch threshold: {self._pitch_threshold}')
+
+        # See if Cozmo already knows where the charger is
+        # The cache makes sure Cozmo was not delocalized after observing the charger
+        self._observe()
+        charger_pose = self._cache.lookup(robot.pose, self._now(), self._max_pose_age)
+
+        if charger_pose is not None:
+            print('Cozmo already knows where the charger is!')
+
+            # Drive to a spot a little way in front of the charger
+            x, y, z, c_z_rot = target_pose(charger_pose, 80)
+            goal = Pose(x, y, z, angle_z=radians(c_z_rot), origin_id=charger_pose.origin_id)
+            action = robot.go_to_pose(goal, relative_to_robot=False, in_parallel=False, num_retries=5)
+        else:
+            charger = await self._find_charger()
+            action = robot.go_to_object(charger, distance_from_object=distance_mm(80), in_parallel=False,
+                                        num_retries=5)
+
+        await action.wait_for_completed()
+        return not action.has_failed
+
+    async def _locate(self) -> bool:
+        """
+        Get a fresh fix on the charger.
+
+        The coordinates tend to be too imprecise if an old coordinate system is
+        kept, so we line up against a recent sighting only. The approach leaves
+        the robot facing the charger, so there usually is one by now.
+
+        :return: True on success, otherwise False
+        """
+
+        self._observe()
+        self._charger_pose = self._cache.lookup(self._robot.pose, self._now(), self._fix_age)
+
+        if self._charger_pose is None:
+            await self._find_charger()
+            self._charger_pose = self._cache.pose
+
+        return self._charger_pose is not None
+
+    async def _align(self) -> bool:
+        """
+        Line up right in front of the charger.
+
+        :return: True on success, otherwise False
+        """
+
+        result = await self._final_adjust(self._charger_pose, budget=self._timeouts[DockingPhase.align] - 1)
+        return result.aligned
+
+    async def _reverse(self) -> bool:
+        """
+        Turn around and back the rear wheels onto the charger.
+
+        :return: True on success, otherwise False
+        """
+
+        robot = self._robot
+
+        # Turn around and start going backward
+        await self._turn_around()
+        robot.drive_wheel_motors(-120, -120)
+        await robot.set_lift_height(height=0.5, max_speed=10, in_parallel=True).wait_for_completed()
+        await robot.set_head_angle(degrees(0), in_parallel=True).wait_for_completed()
+
+        # Wait for back wheels to climb on charger
+        if not await self._wait_for_pitch(lambda pitch: pitch >= self._pitch_threshold, timeout=1):
+            print('ERROR: robot timed out before climbing on charger.')
+            return False
+
+        print('CHECK: backwheels on charger.')
+        return True
+
+    async def _climb(self) -> bool:
+        """
+        Back the front wheels onto the charger.
+
+        :return: True on success, otherwise False
+        """
+
+        robot = self._robot
+
+        # Wait for front wheels to climb on charger (or for the robot to climb the wall instead)
+        level = await self._wait_for_pitch(lambda pitch: pitch > WALL_PITCH or pitch < self._pitch_threshold,
+                                           timeout=2)
+        if not level or math.fabs(robot.pose_pitch.degrees) > WALL_PITCH:
+            print('ERROR: robot climbed on charger\'s wall or timed out.')
+            return False
+
+        print('CHECK: robot on charger, backing up on pins.')
+        robot.stop_all_motors()
+        return True
+
+    async def _seat(self) -> bool:
+        """
+        Back up onto the charger's contacts.
+
+        :return: True on success, otherwise False
+        """
+
+        robot = self._robot
+
+        await robot.set_lift_height(height=0, max_speed=10, in_parallel=True).wait_for_completed()
+        await robot.backup_onto_charger(max_drive_time=3)
+        if not robot.is_on_charger:
+            return False
+
+        print('PROCEDURE SUCCEEDED')
+        return True
+
+    async def _celebrate(self):
+        """
+        Celebrate success.
+        """
+
+        robot = self._robot
+
+        await robot.drive_off_charger_contacts().wait_for_completed()
+        await celebrate(robot)  # A small celebration where only the head moves
+        await robot.backup_onto_charger(max_drive_time=3)
+
+    def _now(self) -> float:
+        """
+        :return: The current time (seconds on the loop's clock)
+        """
+        return asyncio.get_event_loop().time()
+
+    def _observe(self):
+        """
+        Note the charger's pose in the cache if the robot can see it right now.
+        """
+
+        robot = self._robot
+        charger = robot.world.charger
+
+        # Make sure Cozmo was not delocalized after observing the charger
+        if charger is not None and charger.pose.is_comparable(robot.pose):
+            self._cache.remember(charger.pose, self._now() - charger.time_since_last_seen)
+
+    async def _find_charger(self) -> cozmo.objects.Charger:
+        """
+        Look for the charger until it is in sight.
+
+        The search starts with a quick look straight ahead, then looks around
+        for longer and longer. It goes on until the phase runs out of time.
+
+        :return: The charger
+        """
+
+        robot = self._robot
+
+        for round_number in itertools.count():
+            timeout = SEARCH_TIMEOUTS[min(round_number, len(SEARCH_TIMEOUTS) - 1)]
+
+            # After the first round, look around
+            behavior = None
+            if round_number > 0:
+                behavior = robot.start_behavior(cozmo.behavior.BehaviorTypes.LookAroundInPlace)
+
+            try:
+                charger = await robot.world.wait_for_observed_charger(timeout=timeout, include_existing=False)
+            except asyncio.TimeoutError:
+                charger = None
+            finally:
+                if behavior is not None:
+                    behavior.stop()
+
+            if charger is not None:
+                self._observe()
+                return charger
+
+            # Ask for help once the search is at its widest
+            if timeout == SEARCH_TIMEOUTS[-1]:
+                await frustrated(robot)
+                await robot.say_text('Charge?', duration_scalar=0.5).wait_for_completed()
+
+    async def _final_adjust(self, charger_pose: Pose, dist_charger=40, rate=20, budget=15) -> AlignmentResult:
+        """
+        Make the final adjustment to properly face the charger.
+
+        This steers the wheels continuously from the pose error, at a fixed
+        control rate, until the robot is on the spot in front of the charger
+        (within tolerance) or runs out of time. Whenever the charger is in
+        view, its latest pose is used as the reference.
+
+        :param charger_pose: The charger pose
+        :param dist_charger: The distance in front of the charger (mm)
+        :param rate: The control rate (Hz)
+        :param budget: The time budget (seconds)
+        :return: The result
+        """
+
+        robot = self._robot
+        loop = asyncio.get_event_loop()
+
+        start = loop.time()
+        deadline = start + budget
+        period = 1 / rate
+
+        iterations = 0
+        aligned = False
+
+        print('CHECK: Adjusting position')
+
+        try:
+            while True:
+                # Follow the charger if we can see it
+                self._observe()
+                if self._cache.pose is not None and self._cache.pose.is_comparable(robot.pose):
+                    charger_pose = self._cache.pose
+
+                x, y, _, c_z_rot = target_pose(charger_pose, dist_charger)
+                target = (x, y, c_z_rot)
+                pose = (robot.pose.position.x, robot.pose.position.y, robot.pose.rotation.angle_z.radians)
+
+                if self._controller.within_tolerance(pose, target):
+                    aligned = True
+                    break
+
+                if loop.time() >= deadline:
+                    break
+
+                left, right = self._controller.command(pose, target)
+                robot.drive_wheel_motors(left, right)
+                iterations += 1
+
+                # Keep to the control rate, no matter how long this iteration took
+                await asyncio.sleep(max(0, start + iterations * period - loop.time()))
+        finally:
+            robot.stop_all_motors()
+
+        distance, heading = self._controller.error(pose, target)
+        result = AlignmentResult(aligned, loop.time() - start, iterations, distance, heading)
+        self._stats.record_alignment(result)
+
+        if aligned:
+            print(f'CHECK: Robot aligned relative to the charger ({result})')
+        else:
+            print(f'ERROR: Robot not aligned relative to the charger ({result})')
+
+        return result
+
+    async def _restart_procedure(self) -> bool:
+        """
+        Back away from the charger so the procedure can start over.
+
+        :return: True on success, otherwise False
+        """
+
+        robot = self._robot
+
+        robot.abort_all_actions(log_abort_messages=False)
+        robot.stop_all_motors()
+        await robot.set_lift_height(height=0.5, max_speed=10, in_parallel=True).wait_for_completed()
+
+        print('ABORT: Driving away')
+        await robot.drive_wheels(80, 80, duration=2)
+        await self._turn_around()
+        await robot.set_lift_height(height=0, max_speed=10, in_parallel=True).wait_for_completed()
+        return True
+
+    async def _turn_around(self):
+        """
+        Turn the robot around.
+        """
+
+        await self._robot.turn_in_place(degrees(-180)).wait_for_completed()
+
+    async def _wait_for_pitch(self, condition: Callable[[float], bool], timeout: float) -> bool:
+        """
+        Wait for the robot's pitch to meet a condition.
+
+        This wakes up on every robot state update rather than polling.
+
+        :param condition: The condition on the absolute pitch (degrees)
+        :param timeout: The maximum time to wait (seconds)
+        :return: True if the condition was met, otherwise False
+        """
+
+        robot = self._robot
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + timeout
+
+        while not condition(math.fabs(robot.pose_pitch.degrees)):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+
+            try:
+                await robot.wait_for(cozmo.robot.EvtRobotStateUpdated, timeout=remaining)
+            except asyncio.TimeoutError:
+                return False
+
+        return True
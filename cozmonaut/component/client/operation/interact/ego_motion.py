@@ -0,0 +1,259 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+import bisect
+import math
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+# The camera's field of view (radians), for when the robot hasn't told us yet
+DEFAULT_FOV_X = math.radians(58)
+DEFAULT_FOV_Y = math.radians(45)
+
+
+class FramePose:
+    """
+    Where the camera was pointing when a frame was taken.
+
+    Only rotation is kept: the body heading and the head angle. The robot
+    doesn't move far between frames, and faces are far enough away that
+    turning is what moves them across the frame.
+    """
+
+    def __init__(self, timestamp: float, heading: float, head_angle: float):
+        """
+        :param timestamp: When the frame was taken (seconds)
+        :param heading: The body heading (radians)
+        :param head_angle: The head angle (radians)
+        """
+
+        self._timestamp = timestamp
+        self._heading = heading
+        self._head_angle = head_angle
+
+    def __repr__(self):
+        return (f'FramePose({self._timestamp:.3f}, heading={math.degrees(self._heading):.1f} deg, '
+                f'head={math.degrees(self._head_angle):.1f} deg)')
+
+    @property
+    def timestamp(self) -> float:
+        """
+        :return: When the frame was taken (seconds)
+        """
+        return self._timestamp
+
+    @property
+    def heading(self) -> float:
+        """
+        :return: The body heading (radians)
+        """
+        return self._heading
+
+    @property
+    def head_angle(self) -> float:
+        """
+        :return: The head angle (radians)
+        """
+        return self._head_angle
+
+
+class PoseHistory:
+    """
+    A short history of a robot's heading and head angle.
+
+    Camera frames arrive a little after they were taken, and the robot may
+    have turned in the meantime, so the pose to pair with a frame has to be
+    looked up from shortly before it arrived.
+    """
+
+    def __init__(self, span: float = 2):
+        """
+        :param span: How much history to keep (seconds)
+        """
+
+        self._span = span
+
+        # The recorded times, and the heading and head angle at each
+        self._times: Deque[float] = deque()
+        self._poses: Deque[Tuple[float, float]] = deque()
+
+    def record(self, t: float, heading: float, head_angle: float):
+        """
+        Record the robot's pose.
+
+        :param t: The time (seconds)
+        :param heading: The body heading (radians)
+        :param head_angle: The head angle (radians)
+        """
+
+        # Ignore anything out of order
+        if self._times and t <= self._times[-1]:
+            return
+
+        self._times.append(t)
+        self._poses.append((heading, head_angle))
+
+        while self._times[0] < t - self._span:
+            self._times.popleft()
+            self._poses.popleft()
+
+    def at(self, t: float) -> Optional[FramePose]:
+        """
+        Look up the robot's pose at some time.
+
+        Between two records, the pose is interpolated. Outside the history, the
+        nearest record is used.
+
+        :param t: The time (seconds)
+        :return: The pose, or None if nothing has been recorded
+        """
+
+        if not self._times:
+            return None
+
+        i = bisect.bisect_left(self._times, t)
+
+        if i == 0:
+            heading, head_angle = self._poses[0]
+        elif i == len(self._times):
+            heading, head_angle = self._poses[-1]
+        else:
+            t0 = self._times[i - 1]
+            t1 = self._times[i]
+            heading0, head0 = self._poses[i - 1]
+            heading1, head1 = self._poses[i]
+
+            f = (t - t0) / (t1 - t0)
+
+            # Go the short way around
+            turn = math.atan2(math.sin(heading1 - heading0), math.cos(heading1 - heading0))
+
+            heading = heading0 + f * turn
+            head_angle = head0 + f * (head1 - head0)
+
+        return FramePose(t, heading, head_angle)
+
+
+def shift_point(x: float, y: float, before: FramePose, after: FramePose, frame_size: Tuple[int, int],
+                fov: Tuple[float, float]) -> Tuple[float, float]:
+    """
+    Predict where a far-away point moves in the frame as the camera turns.
+
+    :param x: The x coordinate in the earlier frame (pixels)
+    :param y: The y coordinate in the earlier frame (pixels)
+    :param before: The camera pose for the earlier frame
+    :param after: The camera pose for the later frame
+    :param frame_size: The frame size (width, height in pixels)
+    :param fov: The camera's horizontal and vertical field of view (radians)
+    :return: The predicted x and y coordinates in the later frame (pixels)
+    """
+
+    width, height = frame_size
+    fx = width / 2 / math.tan(fov[0] / 2)
+    fy = height / 2 / math.tan(fov[1] / 2)
+
+    turn = math.atan2(math.sin(after.heading - before.heading), math.cos(after.heading - before.heading))
+    tilt = after.head_angle - before.head_angle
+
+    # Angles of the point off the optical axis (positive is to the left and up)
+    yaw = math.atan((width / 2 - x) / fx)
+    pitch = math.atan((height / 2 - y) / fy)
+
+    # Turning left moves the point right, and tilting up moves it down
+    # Past 90 degrees it's behind the camera, so just push it far out of the frame
+    yaw = min(max(yaw - turn, -1.5), 1.5)
+    pitch = min(max(pitch - tilt, -1.5), 1.5)
+
+    return width / 2 - fx * math.tan(yaw), height / 2 - fy * math.tan(pitch)
+
+
+class TrackingStats:
+    """
+    Statistics on how face tracks hold up as the camera moves.
+
+    A frame counts as taken in motion if the camera turned enough since the
+    previous one to move faces a noticeable distance. A compensated update
+    counts as a rescue if the predicted shift was more than half the face box,
+    which is about as far as the correlation tracker can follow on its own.
+    Rescues are therefore an estimate of the losses avoided. For a measured
+    comparison, run once with motion compensation and once without, then
+    compare the losses in motion.
+    """
+
+    def __init__(self, motion_px: float = 8):
+        """
+        :param motion_px: The shift past which a frame counts as taken in motion (pixels)
+        """
+
+        self._motion_px = motion_px
+
+        self._updates = 0
+        self._updates_in_motion = 0
+        self._compensated = 0
+        self._losses = 0
+        self._losses_in_motion = 0
+        self._rescues = 0
+
+    @property
+    def updates(self) -> int:
+        """
+        :return: The number of tracker updates
+        """
+        return self._updates
+
+    @property
+    def losses(self) -> int:
+        """
+        :return: The number of tracks lost
+        """
+        return self._losses
+
+    @property
+    def losses_in_motion(self) -> int:
+        """
+        :return: The number of tracks lost on frames taken in motion
+        """
+        return self._losses_in_motion
+
+    @property
+    def rescues(self) -> int:
+        """
+        :return: The estimated number of track losses avoided by compensation
+        """
+        return self._rescues
+
+    def record(self, shift: float, box_size: float, compensated: bool, lost: bool):
+        """
+        Record one tracker update.
+
+        :param shift: How far the camera's motion moved the face (pixels)
+        :param box_size: The smaller side of the face box (pixels)
+        :param compensated: True if the tracker was told about the shift, otherwise False
+        :param lost: True if the track was lost, otherwise False
+        """
+
+        in_motion = shift > self._motion_px
+
+        self._updates += 1
+        if in_motion:
+            self._updates_in_motion += 1
+        if compensated:
+            self._compensated += 1
+
+        if lost:
+            self._losses += 1
+            if in_motion:
+                self._losses_in_motion += 1
+        elif compensated and shift > box_size / 2:
+            self._rescues += 1
+
+    def summary(self) -> str:
+        """
+        :return: A human-readable summary of the statistics
+        """
+
+        return (f'{self._updates} tracker updates ({self._updates_in_motion} in motion, {self._compensated} '
+                f'compensated), {self._losses} tracks lost ({self._losses_in_motion} in motion), '
+                f'about {self._rescues} losses avoided by motion compensation')
@@ -0,0 +1,208 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+from threading import Lock
+from typing import Iterable, Tuple
+
+import numpy
+
+# The dimensionality of a face identity (the ResNet model produces 128-dimensional embeddings)
+IDENT_DIM = 128
+
+
+class GallerySnapshot:
+    """
+    An immutable view of the face gallery at some version.
+
+    Snapshots are never modified once published, so any number of threads may
+    read from one without taking a lock.
+    """
+
+    def __init__(self, version: int, fids: numpy.ndarray, idents: numpy.ndarray):
+        self._version = version
+        self._fids = fids
+        self._idents = idents
+
+        # Freeze the arrays so nobody writes through a shared snapshot by accident
+        self._fids.flags.writeable = False
+        self._idents.flags.writeable = False
+
+    def __len__(self) -> int:
+        return len(self._fids)
+
+    def __contains__(self, fid: int) -> bool:
+        return bool(numpy.any(self._fids == fid))
+
+    @property
+    def version(self) -> int:
+        """
+        :return: The gallery version this snapshot was taken at
+        """
+        return self._version
+
+    @property
+    def fids(self) -> numpy.ndarray:
+        """
+        :return: The face IDs (one per row of the identity matrix)
+        """
+        return self._fids
+
+    @property
+    def idents(self) -> numpy.ndarray:
+        """
+        :return: The face identities (an N-by-128 float32 matrix)
+        """
+        return self._idents
+
+    def match(self, ident: numpy.ndarray, tolerance: float) -> Tuple[int, float]:
+        """
+        Find the closest known face to an identity.
+
+        :param ident: The face identity (128-dimensional vector)
+        :param tolerance: The maximum Euclidean distance for a match
+        :return: The best face ID (or -1 if none is close enough) and its distance
+        """
+
+        if len(self._fids) == 0:
+            return -1, tolerance
+
+        # Distances from the identity to every known face at once
+        distances = numpy.linalg.norm(self._idents - ident, ord=None, axis=1)
+
+        # Pick the closest one
+        best = int(numpy.argmin(distances))
+        if distances[best] < tolerance:
+            return int(self._fids[best]), float(distances[best])
+
+        return -1, tolerance
+
+
+class FaceGallery:
+    """
+    A versioned gallery of known face identities.
+
+    One gallery can be shared by any number of face trackers. Writers copy the
+    current snapshot, modify the copy, and swap it in under a lock. Readers just
+    grab the current snapshot reference, so recognition never waits on an
+    enrollment in progress, and every enrollment is visible to all trackers as
+    soon as the swap happens.
+    """
+
+    def __init__(self):
+        # The current snapshot
+        # Reading or replacing this reference is atomic, so readers need no lock
+        self._snapshot = GallerySnapshot(0, numpy.empty(0, numpy.int64), numpy.empty((0, IDENT_DIM), numpy.float32))
+
+        # Serializes writers (readers never take this)
+        self._write_lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    @property
+    def snapshot(self) -> GallerySnapshot:
+        """
+        :return: The current snapshot
+        """
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        """
+        :return: The current gallery version
+        """
+        return self._snapshot.version
+
+    def add_identity(self, fid: int, ident: Tuple[float, ...]):
+        """
+        Add a face identity to the gallery, replacing any with the same ID.
+
+        :param fid: The face ID
+        :param ident: The face identity (128-dimensional vector)
+        """
+
+        self.add_identities([fid], [ident])
+
+    def add_identities(self, fids: Iterable[int], idents: Iterable[Tuple[float, ...]]):
+        """
+        Add many face identities to the gallery in one swap.
+
+        :param fids: The face IDs
+        :param idents: The face identities (128-dimensional vectors)
+        """
+
+        new_fids = numpy.asarray(list(fids), dtype=numpy.int64)
+        new_idents = numpy.asarray(list(idents), dtype=numpy.float32).reshape(-1, IDENT_DIM)
+
+        if len(new_fids) != len(new_idents):
+            raise ValueError(f'Got {len(new_fids)} face IDs but {len(new_idents)} identities')
+
+        with self._write_lock:
+            old = self._snapshot
+
+            # Drop rows being replaced, then append the new ones
+            keep = ~numpy.isin(old.fids, new_fids)
+            fids_next = numpy.concatenate((old.fids[keep], new_fids))
+            idents_next = numpy.concatenate((old.idents[keep], new_idents))
+
+            self._snapshot = GallerySnapshot(old.version + 1, fids_next, idents_next)
+
+    def remove_identity(self, fid: int):
+        """
+        Remove a face identity from the gallery.
+
+        :param fid: The face ID
+        :raises KeyError: If the face ID is not in the gallery
+        """
+
+        with self._write_lock:
+            if fid not in self._snapshot:
+                raise KeyError(fid)
+
+            self._remove_locked([fid])
+
+    def remove_identities(self, fids: Iterable[int]):
+        """
+        Remove many face identities from the gallery in one swap.
+
+        Unknown face IDs are ignored.
+
+        :param fids: The face IDs
+        """
+
+        with self._write_lock:
+            self._remove_locked(list(fids))
+
+    def replace(self, fids: numpy.ndarray, idents: numpy.ndarray):
+        """
+        Replace the whole gallery contents in one swap.
+
+        The arrays are adopted as-is (no copy), so the caller must not modify
+        them afterward.
+
+        :param fids: The face IDs
+        :param idents: The face identities (an N-by-128 float32 matrix)
+        """
+
+        if len(fids) != len(idents):
+            raise ValueError(f'Got {len(fids)} face IDs but {len(idents)} identities')
+
+        with self._write_lock:
+            self._snapshot = GallerySnapshot(self._snapshot.version + 1, fids, idents)
+
+    def _remove_locked(self, fids: list):
+        """
+        Remove face identities. The write lock must be held.
+
+        :param fids: The face IDs
+        """
+
+        old = self._snapshot
+
+        keep = ~numpy.isin(old.fids, numpy.asarray(fids, dtype=numpy.int64))
+        if keep.all():
+            return
+
+        self._snapshot = GallerySnapshot(old.version + 1, old.fids[keep], old.idents[keep])
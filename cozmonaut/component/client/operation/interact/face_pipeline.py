@@ -0,0 +1,159 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from cozmonaut.component.client.operation.interact.face_tracker import DetectedFace
+from cozmonaut.component.client.operation.interact.track_events import TrackEvent, TrackEventKind
+
+
+class FacePipeline:
+    """
+    A bounded, concurrent pipeline of per-face interactions.
+
+    Each new face track gets its own interaction task, but only a limited number
+    of them run at a time. When a slot frees up, the biggest waiting face goes
+    next, as a bigger face is usually a closer person. When a track is lost, its
+    task is cancelled (or it is simply forgotten if it was still waiting), and it
+keeps its slot until it has wound down.
+    """
+
+    def __init__(self, interact: Callable[[DetectedFace], Awaitable], max_tasks: int = 3):
+        """
+        :param interact: The interaction coroutine function (called with the face)
+        :param max_tasks: The maximum number of interactions at once
+        """
+
+        self._interact = interact
+        self._max_tasks = max_tasks
+
+        # The faces waiting for a slot
+        self._waiting: Dict[int, DetectedFace] = {}
+
+        # The running interaction tasks
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+        # The tasks of lost tracks that were cancelled but have yet to wind down
+        # These still hold their slots, as the track index may be reused before they're done
+        self._cancelled: Set[asyncio.Task] = set()
+
+        # The latest known info about every track we're handling
+        self._faces: Dict[int, DetectedFace] = {}
+
+    @property
+    def active(self) -> int:
+        """
+        :return: The number of running interactions (including cancelled ones still winding down)
+        """
+        return len(self._tasks) + len(self._cancelled)
+
+    @property
+    def tracked(self) -> int:
+        """
+        :return: The number of tracked faces in the pipeline (running, waiting, or done)
+        """
+        return len(self._faces)
+
+    @property
+    def waiting(self) -> int:
+        """
+        :return: The number of faces waiting for a slot
+        """
+        return len(self._waiting)
+
+    def face(self, index: int) -> Optional[DetectedFace]:
+        """
+        Get the latest info about a face in the pipeline.
+
+        :param index: The track index
+        :return: The face, or None if the track is not in the pipeline
+        """
+
+        return self._faces.get(index)
+
+    def handle(self, event: TrackEvent):
+        """
+        Handle a track event.
+
+        :param event: The event
+        """
+
+        if event.kind == TrackEventKind.new:
+            self._faces[event.index] = event.face
+            self._waiting[event.index] = event.face
+            self._dispatch()
+        elif event.kind == TrackEventKind.updated:
+            # Refresh the face (this also refreshes its priority if still waiting)
+            if event.index in self._faces:
+                self._faces[event.index] = event.face
+            if event.index in self._waiting:
+                self._waiting[event.index] = event.face
+        elif event.kind == TrackEventKind.lost:
+            self._faces.pop(event.index, None)
+            self._waiting.pop(event.index, None)
+
+            # Stop wasting effort on a face that's gone
+            task = self._tasks.pop(event.index, None)
+            if task is not None:
+                task.cancel()
+                self._cancelled.add(task)
+
+    async def cancel_all(self):
+        """
+        Cancel all interactions and wait for them to wind down.
+        """
+
+        self._waiting.clear()
+
+        tasks = list(self._tasks.values()) + list(self._cancelled)
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _dispatch(self):
+        """
+        Start interactions for the highest priority waiting faces while there
+        are free slots.
+        """
+
+        while self._waiting and self.active < self._max_tasks:
+            # Bigger faces are closer, so greet them first
+            index = max(self._waiting, key=lambda i: _face_area(self._waiting[i]))
+            face = self._waiting.pop(index)
+
+            task = asyncio.ensure_future(self._interact(face))
+            task.add_done_callback(lambda t, i=index: self._on_task_done(i, t))
+            self._tasks[index] = task
+
+    def _on_task_done(self, index: int, task: asyncio.Task):
+        """
+        Clean up after an interaction finishes.
+
+        :param index: The track index
+        :param task: The finished task
+        """
+
+        # The track index may have been taken by a newer task already
+        if self._tasks.get(index) is task:
+            del self._tasks[index]
+        self._cancelled.discard(task)
+
+        if not task.cancelled() and task.exception() is not None:
+            print(f'Interaction with face {index} failed: {task.exception()!r}')
+
+        # Give the slot to the next face
+        self._dispatch()
+
+
+def _face_area(face: DetectedFace) -> int:
+    """
+    :param face: The face
+    :return: The area of the face box in pixels
+    """
+
+    left, top, right, bottom = face.coords
+    return max(0, right - left) * max(0, bottom - top)
@@ -0,0 +1,286 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+import asyncio
+import math
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+import cozmo
+from cozmo.util import radians
+
+from cozmonaut.component.client.operation.interact.ego_motion import DEFAULT_FOV_X, DEFAULT_FOV_Y
+from cozmonaut.component.client.operation.interact.face_tracker import DetectedFace
+from cozmonaut.component.client.operation.interact.motion import MotionLock
+
+
+class FaceServo:
+    """
+    Keeps a robot looking at the face it is interacting with.
+
+    This is a visual servo on the face tracker's output. Each control tick, it
+    finds how far the focused face is from the middle of the frame and turns
+    the head (and, when allowed, the body) part of the way toward it.
+
+    Commands go out at a limited rate, and the face coordinates used for each
+    one come from frames taken after the last move finished. Frames taken while
+    the camera was swinging are blurry and show the face where it was before the
+    move, so acting on them would overshoot.
+
+    It also says when a face is steady in the frame, so recognition is only
+    asked for once there's a sharp look at it.
+
+    Moves are run in parallel and only while the robot's motion lock is free,
+    so the servo never gets in the way of the robot's other actions.
+    """
+
+    def __init__(self, robot: cozmo.robot.Robot, may_move: Callable[[], bool], may_turn: Callable[[], bool],
+                 motion: MotionLock = None, rate: float = 10, deadband: float = math.radians(3),
+                 head_gain: float = 0.7, turn_gain: float = 0.7, steady_px: float = 12, steady_time: float = 0.3):
+        """
+        :param robot: The robot instance
+        :param may_move: Says whether the servo may move the head at all
+        :param may_turn: Says whether the servo may turn the body, too
+        :param motion: The robot's motion lock (optional)
+        :param rate: The most commands to send per second (Hz)
+        :param deadband: The smallest error worth correcting (radians)
+        :param head_gain: The fraction of the vertical error to correct at a time
+        :param turn_gain: The fraction of the horizontal error to correct at a time
+        :param steady_px: The most a steady face may wander in the frame (pixels)
+        :param steady_time: How long a face must hold still to count as steady (seconds)
+        """
+
+        self._robot = robot
+        self._may_move = may_move
+        self._may_turn = may_turn
+        self._motion = motion if motion is not None else MotionLock()
+        self._period = 1 / rate
+        self._deadband = deadband
+        self._head_gain = head_gain
+        self._turn_gain = turn_gain
+        self._steady_px = steady_px
+        self._steady_time = steady_time
+
+        # The recent face centers for each track (time, x, y), as of the last move
+        self._history: Dict[int, Deque[Tuple[float, float, float]]] = {}
+
+        # The latest info about each track
+        self._faces: Dict[int, DetectedFace] = {}
+
+        # The size of the frames the face coordinates are given in (width, height)
+        self._frame_size: Optional[Tuple[int, int]] = None
+
+        # The face being looked at, if any
+        self._focus: Optional[int] = None
+
+        # When the last move finished, and whether one is going now
+        self._settled_at = -math.inf
+        self._moving = False
+
+        # The number of commands sent
+        self._commands = 0
+
+    @property
+    def focus(self) -> Optional[int]:
+        """
+        :return: The track index of the face being looked at, if any
+        """
+        return self._focus
+
+    @focus.setter
+    def focus(self, index: Optional[int]):
+        """
+        :param index: The track index of the face to look at, if any
+        """
+        self._focus = index
+
+    @property
+    def commands(self) -> int:
+        """
+        :return: The number of commands sent
+        """
+        return self._commands
+
+    def observe(self, face: DetectedFace, now: float, frame_size: Tuple[int, int]):
+        """
+        Take in the latest position of a tracked face.
+
+        :param face: The face
+        :param now: The current time (seconds)
+        :param frame_size: The size of the frame its coordinates are given in (width, height)
+        """
+
+        self._faces[face.index] = face
+        self._frame_size = frame_size
+
+        # Frames from while the camera was moving say nothing about where the face is now
+        if self._moving:
+            return
+
+        left, top, right, bottom = face.coords
+        history = self._history.setdefault(face.index, deque())
+        history.append((now, (left + right) / 2, (top + bottom) / 2))
+
+        # Only the last little while matters for steadiness
+        while len(history) > 2 and history[1][0] <= now - self._steady_time:
+            history.popleft()
+
+    def forget(self, index: int):
+        """
+        Forget a face that is no longer tracked.
+
+        :param index: The track index
+        """
+
+        self._faces.pop(index, None)
+        self._history.pop(index, None)
+
+        if self._focus == index:
+            self._focus = None
+
+    def steady(self, index: int, now: float) -> bool:
+        """
+        Check if a face is holding still in the frame.
+
+        :param index: The track index
+        :param now: The current time (seconds)
+        :return: True if so, otherwise False
+        """
+
+        if self._moving:
+            return False
+
+        history = self._history.get(index)
+        if not history or now - history[0][0] < self._steady_time:
+            return False
+
+        xs = [x for _, x, _ in history]
+        ys = [y for _, _, y in history]
+
+        return max(xs) - min(xs) <= self._steady_px and max(ys) - min(ys) <= self._steady_px
+
+    async def wait_steady(self, index: int) -> bool:
+        """
+        Wait for a face to hold still in the frame.
+
+        :param index: The track index
+        :return: True once it does, or False if the face is forgotten first
+        """
+
+        loop = asyncio.get_event_loop()
+
+        while index in self._faces:
+            if self.steady(index, loop.time()):
+                return True
+
+            await asyncio.sleep(self._period)
+
+        return False
+
+    async def run(self, keep_going: Callable[[], bool]):
+        """
+        Run the servo loop.
+
+        :param keep_going: Says whether to keep servoing
+        """
+
+        while keep_going():
+            error = self._error()
+
+            if error is not None and self._may_move():
+                await self._move(*error)
+
+            await asyncio.sleep(self._period)
+
+    def _error(self) -> Optional[Tuple[float, float]]:
+        """
+        Find how far off the focused face is.
+
+        :return: The horizontal and vertical angles to the face (radians), or None if there's nothing to do
+        """
+
+        face = self._faces.get(self._focus)
+        history = self._history.get(self._focus)
+        if face is None or not history or self._frame_size is None:
+            return None
+
+        # Wait for a frame from after the last move
+        t, x, y = history[-1]
+        if t <= self._settled_at:
+            return None
+
+        width, height = self._frame_size
+        fov_x, fov_y = self._fov()
+
+        # Angles off the optical axis (positive is to the left and up, like the robot's turns)
+        yaw = math.atan((width / 2 - x) / (width / 2) * math.tan(fov_x / 2))
+        pitch = math.atan((height / 2 - y) / (height / 2) * math.tan(fov_y / 2))
+
+        if math.fabs(yaw) < self._deadband and math.fabs(pitch) < self._deadband:
+            return None
+
+        return yaw, pitch
+
+    async def _move(self, yaw: float, pitch: float):
+        """
+        Move part of the way toward a face.
+
+        :param yaw: The horizontal angle to the face (radians)
+        :param pitch: The vertical angle to the face (radians)
+        """
+
+        robot = self._robot
+        motion = self._motion
+
+        turn_head = math.fabs(pitch) >= self._deadband
+        turn_body = math.fabs(yaw) >= self._deadband and self._may_turn()
+        if not turn_head and not turn_body:
+            return
+
+        # Give way to everything else
+        if not motion.available:
+            return
+
+        async with motion.background():
+            self._moving = True
+            try:
+                actions = []
+
+                if turn_head:
+                    head = robot.head_angle.radians + self._head_gain * pitch
+                    head = min(max(head, cozmo.robot.MIN_HEAD_ANGLE.radians), cozmo.robot.MAX_HEAD_ANGLE.radians)
+                    actions.append(robot.set_head_angle(radians(head), in_parallel=True))
+                    motion.track(actions[-1])
+
+                if turn_body:
+                    actions.append(robot.turn_in_place(radians(self._turn_gain * yaw), in_parallel=True))
+                    motion.track(actions[-1])
+
+                self._commands += len(actions)
+
+                # This returns early if the moves are aborted because something else needs the robot
+                for action in actions:
+                    await action.wait_for_completed()
+            except cozmo.exceptions.CozmoSDKException as e:
+                # Something else has the robot busy, so try again later
+                print(f'Robot {robot.serial} could not look at face {self._focus}: {e!r}')
+            finally:
+                self._moving = False
+
+                # Start over on steadiness, as the face has moved in the frame
+                self._settled_at = asyncio.get_event_loop().time()
+                for history in self._history.values():
+                    history.clear()
+
+    def _fov(self) -> Tuple[float, float]:
+        """
+        :return: The camera's horizontal and vertical field of view (radians)
+        """
+
+        config = self._robot.camera.config
+        if config is None:
+            return DEFAULT_FOV_X, DEFAULT_FOV_Y
+
+        return config.fov_x.radians, config.fov_y.radians
@@ -3,11 +3,14 @@
 # Copyright 2019 The Cozmonaut Contributors
 #
 
+import asyncio
+import heapq
+import math
 import time
 from concurrent.futures import Future
 from concurrent.futures.thread import ThreadPoolExecutor
 from threading import Thread, Lock
-from typing import List, Tuple, Dict
+from typing import Dict, List, Optional, Set, Tuple
 
 import PIL.Image
 import cv2
@@ -15,6 +18,11 @@ import dlib
 import numpy
 from pkg_resources import resource_filename
 
+from cozmonaut.component.client.operation.interact.ego_motion import (DEFAULT_FOV_X, DEFAULT_FOV_Y, FramePose,
+                                                                      TrackingStats, shift_point)
+from cozmonaut.component.client.operation.interact.face_gallery import FaceGallery
+from cozmonaut.component.client.operation.interact.track_events import TrackEvent, TrackEventKind, TrackEventStream
+
 # The face detector
 _detector = dlib.get_frontal_face_detector()
 
@@ -26,6 +34,9 @@ _predictor = dlib.shape_predictor(_predictor_serialized_file_name)
 _model_file_serialized_file_name = resource_filename(__name__, "data/dlib_face_recognition_resnet_model_v1.dat")
 _model = dlib.face_recognition_model_v1(_model_file_serialized_file_name)
 
+# The distance under which a face matches a known one
+RECOGNITION_TOLERANCE = 0.6
+
 
 class DetectedFace:
     """
@@ -106,15 +117,47 @@ class RecognizedFace(DetectedFace):
         self._ident = value
 
 
+class TrackLostError(Exception):
+    """
+    Raised when a face track is lost before an operation on it completes.
+    """
+
+    def __init__(self, index: int):
+        super().__init__(f'Face track {index} was lost')
+        self.index = index
+
+
 class FaceTracker:
     """
     A tracker for faces in a stream of images.
+
+    Known faces come from a face gallery, which may be shared with other
+    trackers. If no gallery is given, the tracker gets a private one.
+
+    Track indices are reused once their tracks are lost, and at most
+    `max_tracks` faces are tracked at a time, so the tracker's state stays
+    bounded no matter how long it runs. A track index alone is therefore not
+    unique over time; internally, each track also gets a serial number so that
+    work for a dead track is never confused with work for its successor.
     """
 
-    def __init__(self):
+    def __init__(self, gallery: FaceGallery = None, quality_threshold: float = 7, max_tracks: int = 16,
+                 compensate_motion: bool = True, fov: Tuple[float, float] = (DEFAULT_FOV_X, DEFAULT_FOV_Y)):
+        """
+        :param gallery: The face gallery to recognize against
+        :param quality_threshold: The correlation tracker quality below which a track is lost
+        :param max_tracks: The maximum number of faces tracked at once
+        :param compensate_motion: True to move tracker boxes along with the camera's motion, otherwise False
+        :param fov: The camera's horizontal and vertical field of view (radians)
+        """
+
+        self._quality_threshold = quality_threshold
+        self._max_tracks = max_tracks
+        self._compensate_motion = compensate_motion
+        self._fov = fov
+
         # The face identities
-        self._identities: Dict[int, Tuple[float, ...]] = {}
-        self._identities_lock = Lock()
+        self._gallery = gallery if gallery is not None else FaceGallery()
 
         # The detection thread
         # We only need one of these, as each detection operation finds all faces in a frame
@@ -133,40 +176,72 @@ class FaceTracker:
         # The individual face trackers
         self._trackers = {}
         self._tracker_images = {}
+        self._tracker_serials: Dict[int, int] = {}
+        self._tracker_poses: Dict[int, FramePose] = {}  # The camera pose for the last frame each tracker saw
         self._trackers_lock = Lock()
         self._next_tracker_id = 0
+        self._free_tracker_ids: List[int] = []  # A min-heap of released IDs
+        self._next_tracker_serial = 0
+
+        # The outstanding recognition futures for each tracker
+        self._recognitions: Dict[int, Set[Future]] = {}
+        self._recognitions_lock = Lock()
 
-        # The latest frame pending detection
+        # The latest frame pending detection (and its camera pose)
         self._pending_detection = None
+        self._pending_detection_pose = None
         self._pending_detection_flag = False
         self._pending_detection_lock = Lock()
 
-        # The list of "next track" futures
-        self._next_track_futures = []
-        self._next_track_futures_lock = Lock()
+        # The open track event streams
+        self._streams: List[TrackEventStream] = []
+        self._streams_lock = Lock()
+
+        # The size of the frames that face coordinates are given in (width, height)
+        self._frame_size: Optional[Tuple[int, int]] = None
+
+        # Statistics on how tracks hold up as the camera moves
+        self._stats = TrackingStats()
+
+    @property
+    def gallery(self) -> FaceGallery:
+        """
+        :return: The face gallery used for recognition
+        """
+        return self._gallery
+
+    @property
+    def frame_size(self) -> Optional[Tuple[int, int]]:
+        """
+        :return: The size of the frames that face coordinates are given in (width, height), if known yet
+        """
+        return self._frame_size
+
+    @property
+    def stats(self) -> TrackingStats:
+        """
+        :return: Statistics on how tracks hold up as the camera moves
+        """
+        return self._stats
 
     def add_identity(self, fid: int, ident: Tuple[float, ...]):
         """
-        Add a new face identity to the tracker.
+        Add a new face identity to the tracker's gallery.
 
         :param fid: The face ID
         :param ident: The face identity (128-dimensional vector)
         """
 
-        with self._identities_lock:
-            # Map the identity
-            self._identities[fid] = ident
+        self._gallery.add_identity(fid, ident)
 
     def remove_identity(self, fid: int):
         """
-        Remove a face identity from the tracker.
+        Remove a face identity from the tracker's gallery.
 
         :param fid: The face ID
         """
 
-        with self._identities_lock:
-            # Unmap the identity
-            del self._identities[fid]
+        self._gallery.remove_identity(fid)
 
     def start(self):
         """
@@ -193,11 +268,24 @@ class FaceTracker:
         # Wait for the detection thread to die
         self._thread_detection.join()
 
-    def update(self, image: PIL.Image):
+        with self._streams_lock:
+            streams = list(self._streams)
+
+        # Let all consumers finish up
+        for stream in streams:
+            stream.close()
+
+    def update(self, image: PIL.Image, pose: FramePose = None):
         """
         Update with the next image in the stream.
 
+        If the camera pose is given, the tracker boxes are moved to where the
+        camera's motion since their last frame should have put the faces,
+        before the trackers look for them. Otherwise, a quick turn of the head
+        leaves the faces outside the trackers' view, and the tracks are lost.
+
         :param image: The next frame
+        :param pose: The camera pose when the frame was taken, if known
         """
 
         # Convert to numpy matrix
@@ -208,58 +296,207 @@ class FaceTracker:
         image_np = cv2.pyrUp(image_np)
         image_np = cv2.medianBlur(image_np, 3)
 
+        # Face coordinates are in the prepared image
+        self._frame_size = image_np.shape[1], image_np.shape[0]
+
+        # Updates to publish once we're done with the trackers
+        events = []
+
         with self._trackers_lock:
-            # IDs of trackers that need pruning because faces have left us
-            doomed_tracker_ids = []
+            # Trackers that need pruning because faces have left us (and where those faces were last seen)
+            doomed_trackers = []
 
             # For each registered tracker...
             for tracker_id in self._trackers.keys():
-                # ...update it with the image!
-                quality = self._trackers[tracker_id].update(image_np)
+                tracker = self._trackers[tracker_id]
+                box = tracker.get_position()
+
+                # Predict where the camera's motion moved the face
+                shift_x, shift_y = 0, 0
+                before = self._tracker_poses.get(tracker_id)
+                if pose is not None and before is not None:
+                    center_x = box.left() + box.width() / 2
+                    center_y = box.top() + box.height() / 2
+                    x, y = shift_point(center_x, center_y, before, pose, self._frame_size, self._fov)
+                    shift_x, shift_y = x - center_x, y - center_y
+
+                compensated = self._compensate_motion and (shift_x != 0 or shift_y != 0)
+
+                # ...update it with the image (starting from the predicted box, if we have one)!
+                if compensated:
+                    quality = tracker.update(image_np, dlib.drectangle(box.left() + shift_x, box.top() + shift_y,
+                                                                       box.right() + shift_x, box.bottom() + shift_y))
+                else:
+                    quality = tracker.update(image_np)
+
                 self._tracker_images[tracker_id] = image_np
+                if pose is not None:
+                    self._tracker_poses[tracker_id] = pose
+
+                self._stats.record(math.hypot(shift_x, shift_y), min(box.width(), box.height()), compensated,
+                                   quality < self._quality_threshold)
+
+                # Info about where the face went
+                face = DetectedFace()
+                face.index = tracker_id
+                face.coords = _rectangle_coords(self._trackers[tracker_id].get_position())
 
                 # Doom the trackers with low quality tracks
-                if quality < 7:  # TODO: Allow user to set this
-                    doomed_tracker_ids.append(tracker_id)
+                if quality < self._quality_threshold:
+                    doomed_trackers.append((tracker_id, face))
+                else:
+                    events.append(TrackEvent(TrackEventKind.updated, face))
 
             # Prune the doomed trackers
-            for tracker_id in doomed_tracker_ids:
-                self._trackers.pop(tracker_id, None)
-                self._tracker_images.pop(tracker_id, None)
+            # Each one is announced lost before its ID can be reused, so its successor's new event comes after
+            for tracker_id, face in doomed_trackers:
+                self._publish(TrackEvent(TrackEventKind.lost, face))
+                self._release_tracker_locked(tracker_id)
+
+        for event in events:
+            self._publish(event)
 
         with self._pending_detection_lock:
             # Update pending detection frame
             self._pending_detection = image
+            self._pending_detection_pose = pose
             self._pending_detection_flag = True
 
-    def next_track(self):
+    def track_events(self, loop: asyncio.AbstractEventLoop = None) -> TrackEventStream:
         """
-        Obtain a future on the next initiated face track. This does not notify
-        of any preexisting tracks.
+        Open a stream of track events. This does not notify of any preexisting
+        tracks.
+
+        The stream delivers new, updated, lost, and recognized events on the
+        given loop until it is closed or the tracker stops.
 
-        :return: A future for the next DetectedFace object
+        :param loop: The loop to deliver events on (defaults to the current one)
+        :return: The event stream
         """
 
-        # Create a future for the detection (they say we're not supposed to call this)
-        # We will keep one copy and send another to the caller
-        # Later on, after we track a new face, we'll complete the future
-        future = Future()
+        if loop is None:
+            loop = asyncio.get_event_loop()
 
-        with self._next_track_futures_lock:
-            # Lock, append the future to, and unlock the next track futures list
-            self._next_track_futures.append(future)
+        stream = TrackEventStream(loop, on_close=self._close_stream)
 
-        return future
+        with self._streams_lock:
+            self._streams.append(stream)
+
+        return stream
 
-    def recognize(self, index: int):
+    def recognize(self, index: int) -> Future:
         """
         Obtain a future on the recognition of a face track.
 
+        The result is also published to all track event streams. If the track
+        is lost first, the future is cancelled or fails with TrackLostError.
+
+        :param index: The track index
+        """
+
+        with self._trackers_lock:
+            serial = self._tracker_serials.get(index)
+
+            # Fail right away if there's no such track
+            if serial is None:
+                future = Future()
+                future.set_exception(TrackLostError(index))
+                return future
+
+            # Send off a request to recognize the face in this track
+            future = self._thread_pool_recognizers.submit(self._recognize_main, index, serial)
+
+            with self._recognitions_lock:
+                # Remember the request, so we can call it off if the track is lost
+                self._recognitions.setdefault(index, set()).add(future)
+
+        future.add_done_callback(lambda f: self._forget_recognition(index, f))
+        return future
+
+    def _allocate_tracker_locked(self) -> Tuple[int, int]:
+        """
+        Allocate a tracker ID and serial number. The trackers lock must be held.
+
+        :return: The tracker ID (or None if we're at capacity) and serial number
+        """
+
+        if len(self._trackers) >= self._max_tracks:
+            return None, None
+
+        # Prefer the lowest released ID, so IDs stay small and dense
+        if self._free_tracker_ids:
+            tracker_id = heapq.heappop(self._free_tracker_ids)
+        else:
+            tracker_id = self._next_tracker_id
+            self._next_tracker_id += 1
+
+        serial = self._next_tracker_serial
+        self._next_tracker_serial += 1
+
+        return tracker_id, serial
+
+    def _release_tracker_locked(self, tracker_id: int):
+        """
+        Release a tracker and all its state. The trackers lock must be held.
+
+        :param tracker_id: The tracker ID
+        """
+
+        self._trackers.pop(tracker_id, None)
+        self._tracker_images.pop(tracker_id, None)
+        self._tracker_serials.pop(tracker_id, None)
+        self._tracker_poses.pop(tracker_id, None)
+
+        with self._recognitions_lock:
+            futures = self._recognitions.pop(tracker_id, ())
+
+        # Call off any recognitions that have yet to start
+        # Ones already running will notice the track is gone and give up
+        for future in futures:
+            future.cancel()
+
+        heapq.heappush(self._free_tracker_ids, tracker_id)
+
+    def _forget_recognition(self, index: int, future: Future):
+        """
+        Forget about a finished recognition.
+
         :param index: The track index
+        :param future: The recognition future
         """
 
-        # Send off a request to recognize the face in this track
-        return self._thread_pool_recognizers.submit(self._recognize_main, index)
+        with self._recognitions_lock:
+            futures = self._recognitions.get(index)
+            if futures is not None:
+                futures.discard(future)
+                if not futures:
+                    del self._recognitions[index]
+
+    def _publish(self, event: TrackEvent):
+        """
+        Publish a track event to all open streams.
+
+        This never blocks for long, so it is safe to call with the trackers lock held.
+
+        :param event: The event
+        """
+
+        with self._streams_lock:
+            streams = list(self._streams)
+
+        for stream in streams:
+            stream.publish(event)
+
+    def _close_stream(self, stream: TrackEventStream):
+        """
+        Forget about a closed stream.
+
+        :param stream: The stream
+        """
+
+        with self._streams_lock:
+            if stream in self._streams:
+                self._streams.remove(stream)
 
     def _thread_detection_main(self):
         """
@@ -268,26 +505,30 @@ class FaceTracker:
         This runs all the time, and it picks up the latest image.
         """
 
-        # The latest frame
+        # The latest frame (and its camera pose)
         frame: PIL.Image = None
+        frame_pose: FramePose = None
 
         while True:
             with self._detection_kill_lock:
                 # Test kill switch
-                if self._detection_kill:
-                    # Unlock it and die
-                    self._detection_kill_lock.release()
-                    break
+                kill = self._detection_kill
+
+            # Die if asked to
+            if kill:
+                break
 
             with self._pending_detection_lock:
                 # If a pending frame is available
                 if self._pending_detection_flag:
                     # Save the frame
                     frame = self._pending_detection
+                    frame_pose = self._pending_detection_pose
 
                     # Clear pending frame slot
                     # We've kept it for ourselves
                     self._pending_detection = None
+                    self._pending_detection_pose = None
                     self._pending_detection_flag = False
 
             # If we've got a frame to work with
@@ -315,6 +556,17 @@ class FaceTracker:
                             # Get the current tracker position
                             tracker_box = self._trackers[tracker_id].get_position()
 
+                            # The tracker may have seen newer frames than this one, so move the face to match
+                            face_center_x = face.center().x
+                            face_center_y = face.center().y
+                            tracker_pose = self._tracker_poses.get(tracker_id)
+                            if frame_pose is not None and tracker_pose is not None:
+                                face_center_x, face_center_y = shift_point(face_center_x, face_center_y, frame_pose,
+                                                                           tracker_pose, frame_np.shape[1::-1],
+                                                                           self._fov)
+                            shift_x = face_center_x - face.center().x
+                            shift_y = face_center_y - face.center().y
+
                             # Tracker box coordinates
                             tb_l = int(tracker_box.left())  # left of tracker box
                             tb_r = int(tracker_box.left() + tracker_box.width())  # right of tracker box
@@ -330,15 +582,15 @@ class FaceTracker:
                             #  b) The tracker center is inside the face box
 
                             # Reject on (a) first
-                            if face.center().x < tb_l or face.center().x > tb_r:
+                            if face_center_x < tb_l or face_center_x > tb_r:
                                 continue
-                            if face.center().y < tb_t or face.center().y > tb_b:
+                            if face_center_y < tb_t or face_center_y > tb_b:
                                 continue
 
                             # Next, reject on (b)
-                            if tracker_center_x < face.left() or tracker_center_x > face.right():
+                            if tracker_center_x < face.left() + shift_x or tracker_center_x > face.right() + shift_x:
                                 continue
-                            if tracker_center_y < face.top() or tracker_center_y > face.bottom():
+                            if tracker_center_y < face.top() + shift_y or tracker_center_y > face.bottom() + shift_y:
                                 continue
 
                             # If neither (a) or (b) was rejected, we have match. Hooray!
@@ -352,13 +604,19 @@ class FaceTracker:
                             new_tracker = dlib.correlation_tracker()
 
                             # Get next available tracker ID
-                            # FIXME: For now, we don't reuse them (should we?)
-                            tracker_id = self._next_tracker_id
-                            self._next_tracker_id += 1
+                            # IDs of lost tracks are reused
+                            tracker_id, serial = self._allocate_tracker_locked()
+
+                            # If we're already tracking as many faces as we can, leave this one be
+                            if tracker_id is None:
+                                continue
 
                             # Map the new tracker in
                             self._trackers[tracker_id] = new_tracker
                             self._tracker_images[tracker_id] = frame_np
+                            self._tracker_serials[tracker_id] = serial
+                            if frame_pose is not None:
+                                self._tracker_poses[tracker_id] = frame_pose
 
                             # Add some padding to the face rectangle
                             # TODO: Make this slop configurable
@@ -376,25 +634,35 @@ class FaceTracker:
                             detected.index = tracker_id
                             detected.coords = (track_left, track_top, track_right, track_bottom)
 
-                            with self._next_track_futures_lock:
-                                # Complete all the next track futures
-                                for future in self._next_track_futures:
-                                    future.set_result(detected)
-                                self._next_track_futures.clear()
+                    # Tell everyone about the new track
+                    # This happens outside the trackers lock, so consumers can immediately ask for recognition
+                    if face_id_match is None:
+                        self._publish(TrackEvent(TrackEventKind.new, detected))
+
+                # Done with this frame
+                # Detecting on it again would only find the same faces
+                frame = None
 
             # Sleep for a bit
             time.sleep(0.5)
 
-    def _recognize_main(self, index: int) -> RecognizedFace:
+    def _recognize_main(self, index: int, serial: int) -> RecognizedFace:
         """
         Main function for recognizing a face.
 
         This runs to completion on an as-needed basis given by a thread pool.
+
+        :param index: The track index
+        :param serial: The track serial number at the time of the request
         """
 
         print(f'A recognition worker has kicked off for tracker {index}')
 
         with self._trackers_lock:
+            # Bail if the track was lost (and maybe replaced) since the request
+            if self._tracker_serials.get(index) != serial:
+                raise TrackLostError(index)
+
             # Query the latest face bounding box from the tracker
             position: dlib.rectangle = self._trackers[index].get_position()
 
@@ -418,23 +686,14 @@ class FaceTracker:
 
         print(f'Computed face embedding for tracker {index}; cross-referencing known faces...')
 
-        with self._identities_lock:
-            # Details about the best match
-            best_match_fid = -1  # Impossible by our definition of face IDs (valid only if >= 0)
-            best_match_distance = 0.6  # TODO: Make this user configurable (the maximum tolerance)
+        # Take the current gallery snapshot
+        # This never blocks, even if another thread is enrolling a face right now
+        snapshot = self._gallery.snapshot
 
-            for other_fid in self._identities.keys():
-                # The other full-blown identity (128-dim vector embedding)
-                other_ident = numpy.array(self._identities[other_fid])
-
-                # In numpy, the norm of two vectors with ord=None and axis=1 is simply Euclidean distance
-                distance = numpy.linalg.norm([ident - other_ident], ord=None, axis=1)
-
-                # If this is a new best distance
-                if distance < best_match_distance:
-                    # Update best match details
-                    best_match_fid = other_fid
-                    best_match_distance = distance
+        # Find the closest known face
+        # A face ID of -1 is impossible by our definition of face IDs (valid only if >= 0)
+        # TODO: Make tolerance user configurable
+        best_match_fid, best_match_distance = snapshot.match(ident, RECOGNITION_TOLERANCE)
 
         print(f'Cross-referencing for tracker {index} completed')
 
@@ -443,10 +702,57 @@ class FaceTracker:
         else:
             print(f'The face for tracker {index} known as {best_match_fid} in the database')
 
+        with self._trackers_lock:
+            # If the track was lost in the meantime, nobody wants this anymore
+            if self._tracker_serials.get(index) != serial:
+                raise TrackLostError(index)
+
         # Return info about the recognized face
         rec = RecognizedFace()
         rec.index = index
-        rec.coords = position
+        rec.coords = _rectangle_coords(position)
         rec.fid = best_match_fid
         rec.ident = ident
+
+        # Tell everyone about the recognition
+        self._publish(TrackEvent(TrackEventKind.recognized, rec))
+
         return rec
+
+
+def _rectangle_coords(rect) -> Tuple[int, int, int, int]:
+    """
+    Convert a dlib rectangle to face coordinates.
+
+    :param rect: The dlib rectangle (or drectangle)
+    :return: The face coordinates (left, top, right, bottom)
+    """
+
+    return int(rect.left()), int(rect.top()), int(rect.right()), int(rect.bottom())
+
+
+def compute_identities(image: numpy.ndarray, upsample: int = 1) -> List[numpy.ndarray]:
+    """
+    Detect all faces in a still image and compute their identities.
+
+    This runs the same detector, pose predictor, and recognition model as the
+    face tracker, just without any tracking.
+
+    :param image: The image (an RGB numpy matrix)
+    :param upsample: The number of times to upsample the image for detection
+    :return: The face identities (128-dimensional vectors), one per detected face
+    """
+
+    idents = []
+
+    # Detect all faces in the image
+    faces: List[dlib.rectangle] = _detector(image, upsample)
+
+    for face in faces:
+        # Predict 68 unique points on the face
+        prediction = _predictor(image, face)
+
+        # Compute the 128-dimensional vector embedding of the face
+        idents.append(numpy.array(_model.compute_face_descriptor(image, prediction, 1)))
+
+    return idents
@@ -0,0 +1,80 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+import os
+import struct
+from typing import Tuple
+
+import numpy
+
+from cozmonaut.component.client.operation.interact.face_gallery import GallerySnapshot, IDENT_DIM
+
+# The magic bytes at the start of a gallery snapshot file
+SNAPSHOT_MAGIC = b'CZGALLRY'
+
+# The current snapshot file version
+SNAPSHOT_VERSION = 2
+
+# The snapshot file header
+# This is the magic, file version, face count, identity dimensions, and database change version (padded to 64 bytes)
+_HEADER = struct.Struct('<8sIQIQ32x')
+
+
+def save_snapshot(path: str, snapshot: GallerySnapshot, change_version: int):
+    """
+    Save a gallery snapshot to a file.
+
+    The file is a 64-byte header, then the face IDs (int64), then the face
+    identities (float32, row-major). The file is written next to its final
+    location and renamed into place, so readers never see a partial file.
+
+    :param path: The file path
+    :param snapshot: The gallery snapshot
+    :param change_version: The database change version the snapshot is up to date with
+    """
+
+    tmp_path = f'{path}.tmp'
+
+    with open(tmp_path, 'wb') as file:
+        file.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(snapshot), IDENT_DIM, change_version))
+        file.write(numpy.ascontiguousarray(snapshot.fids, dtype='<i8').tobytes())
+        file.write(numpy.ascontiguousarray(snapshot.idents, dtype='<f4').tobytes())
+
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path: str) -> Tuple[numpy.ndarray, numpy.ndarray, int]:
+    """
+    Load a gallery snapshot from a file.
+
+    The arrays are memory-mapped read-only, not read, so loading is nearly
+    instant and any number of processes can share the same pages.
+
+    :param path: The file path
+    :return: The face IDs, the face identities, and the database change version
+    :raises ValueError: If the file is not a valid snapshot
+    """
+
+    with open(path, 'rb') as file:
+        header = file.read(_HEADER.size)
+
+    if len(header) != _HEADER.size:
+        raise ValueError(f'Gallery snapshot {path} is truncated')
+
+    magic, version, count, dim, change_version = _HEADER.unpack(header)
+
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or dim != IDENT_DIM:
+        raise ValueError(f'Gallery snapshot {path} is not a supported snapshot')
+
+    if os.path.getsize(path) != _HEADER.size + count * (8 + 4 * dim):
+        raise ValueError(f'Gallery snapshot {path} has the wrong size')
+
+    if count == 0:
+        return numpy.empty(0, numpy.int64), numpy.empty((0, dim), numpy.float32), change_version
+
+    fids = numpy.memmap(path, dtype='<i8', mode='r', offset=_HEADER.size, shape=(count,))
+    idents = numpy.memmap(path, dtype='<f4', mode='r', offset=_HEADER.size + 8 * count, shape=(count, dim))
+
+    return fids, idents, change_version
@@ -0,0 +1,189 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+import asyncio
+from typing import Dict
+
+from cozmonaut.component.client.operation.interact.face_gallery import FaceGallery
+from cozmonaut.database.friends import FriendRepository
+
+
+class GallerySync:
+    """
+    Keeps a face gallery in sync with the database.
+
+    This polls the database change log on an interval and applies only what
+    changed since the last poll, so enrollments and removals made anywhere
+    (another host, the friend remove operation, etc.) reach running trackers
+    without a full reload.
+
+    Change versions come from an auto-increment column, and a transaction that
+    started earlier may commit after one that started later. So a version
+    skipped over in the log is not taken to be gone: it is looked for again on
+    every poll until it shows up or enough time has passed that it must have
+    been rolled back.
+    """
+
+    def __init__(self, friends: FriendRepository, gallery: FaceGallery, version: int, interval: float = 5,
+                 reread: int = 1000, gap_timeout: float = 60, keep_changes: int = 100000,
+                 prune_interval: float = 3600):
+        """
+        :param friends: The friends repository
+        :param gallery: The face gallery to keep in sync
+        :param version: The change version the gallery is already up to date with
+        :param interval: The time between polls (seconds)
+        :param reread: The number of changes before the given version to apply again at first
+        :param gap_timeout: How long to keep looking for a skipped change (seconds)
+        :param keep_changes: The number of latest changes to keep in the log
+        :param prune_interval: The time between prunings of the log (seconds)
+        """
+
+        self._friends = friends
+        self._gallery = gallery
+        self._interval = interval
+        self._gap_timeout = gap_timeout
+        self._keep_changes = keep_changes
+        self._prune_interval = prune_interval
+
+        # The highest change version seen
+        self._version = version
+
+        # The number of changes before that to go back over on the first sync (and after a reload)
+        self._reread_window = reread
+        self._reread = reread
+
+        # The change versions skipped over so far, and when each was first found missing
+        self._gaps: Dict[int, float] = {}
+
+        # Whether we've been asked to stop
+        self._stopping = False
+
+    @property
+    def version(self) -> int:
+        """
+        :return: The change version the gallery is up to date with
+        """
+
+        # Nothing past a missing change can be vouched for
+        if self._gaps:
+            return min(self._gaps) - 1
+
+        return self._version
+
+    async def run(self):
+        """
+        Poll for changes until stopped.
+
+        The first poll happens right away, so a gallery loaded from an older
+        snapshot catches up quickly. The change log is pruned every so often.
+        """
+
+        loop = asyncio.get_event_loop()
+        next_prune = loop.time()
+
+        while not self._stopping:
+            try:
+                await self.sync()
+            except Exception as e:
+                # Try again next time around
+                print(f'Failed to sync the face gallery: {e!r}')
+
+            if loop.time() >= next_prune:
+                next_prune = loop.time() + self._prune_interval
+
+                try:
+                    pruned = await loop.run_in_executor(None, self._friends.prune_changes, self._keep_changes)
+                    if pruned:
+                        print(f'Pruned {pruned} old changes from the face change log')
+                except Exception as e:
+                    print(f'Failed to prune the face change log: {e!r}')
+
+            await asyncio.sleep(self._interval)
+
+    async def sync(self) -> int:
+        """
+        Pull and apply all changes since the last sync.
+
+        :return: The number of friends changed
+        """
+
+        loop = asyncio.get_event_loop()
+        total = 0
+
+        # If changes we never saw have been pruned from the log, there's nothing to catch up from
+        horizon = await loop.run_in_executor(None, self._friends.change_horizon)
+        if self._version < horizon:
+            return await self._reload()
+
+        # Changes just before the gallery was loaded may have committed after it was, so go back a bit at first
+        # Applying a change twice is harmless
+        if self._reread:
+            self._version = max(self._version - self._reread, horizon)
+            self._reread = 0
+
+        # Stop looking for changes that have surely been rolled back
+        now = loop.time()
+        for gap in [gap for gap, noticed in self._gaps.items() if now - noticed > self._gap_timeout]:
+            del self._gaps[gap]
+
+        while True:
+            versions, changes = await loop.run_in_executor(None, self._friends.changes_since, self._version,
+                                                           sorted(self._gaps))
+            if not changes:
+                break
+
+            # Apply all the changes with one swap each for additions and removals
+            added = {fid: ident for fid, ident in changes.items() if ident is not None}
+            removed = [fid for fid, ident in changes.items() if ident is None]
+
+            if added:
+                self._gallery.add_identities(added.keys(), added.values())
+            if removed:
+                self._gallery.remove_identities(removed)
+
+            # Note any versions skipped over on the way up
+            for version in versions:
+                if version > self._version:
+                    self._gaps.update(dict.fromkeys(range(self._version + 1, version), now))
+                    self._version = version
+                else:
+                    self._gaps.pop(version, None)
+
+            total += len(changes)
+
+        if total:
+            print(f'Synced {total} changed faces from the database (now at change {self._version}, '
+                  f'{len(self._gaps)} changes still missing)')
+
+        return total
+
+    async def _reload(self) -> int:
+        """
+        Reload every face from the database.
+
+        :return: The number of faces loaded
+        """
+
+        loop = asyncio.get_event_loop()
+
+        print(f'The face change log has moved on past change {self._version}; reloading all faces')
+
+        # Note where the change log is before loading, like on startup
+        version = await loop.run_in_executor(None, self._friends.change_version)
+        fids, idents = await loop.run_in_executor(None, self._friends.load_identities)
+
+        self._gallery.replace(fids, idents)
+        self._version = version
+        self._reread = self._reread_window
+        self._gaps.clear()
+
+        return len(fids)
+
+    def stop(self):
+        """
+        Stop polling.
+        """
+
+        self._stopping = True
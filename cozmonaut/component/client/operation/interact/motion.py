@@ -0,0 +1,94 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+import asyncio
+import contextlib
+from typing import Set
+
+import cozmo
+
+
+class MotionLock:
+    """
+    Decides who gets to move a robot.
+
+    The Cozmo SDK refuses to start an action (unless it is run in parallel)
+    while another action is still going, and raises RobotBusy instead. Actions
+    that are run in parallel get their way, but they fight with whatever else
+    is moving the robot.
+
+    Background moves (the face servo's) only start when nobody else has the
+    robot, and they give way as soon as someone does. Everything else (the
+    patrol, docking, leaving the charger) takes the robot exclusively. That
+    aborts any background move in flight and waits for it to wind down before
+    going ahead, and it keeps background moves out until done.
+    """
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+
+        # The number of exclusive holders (and would-be holders)
+        self._exclusive = 0
+
+        # The actions of the background move in flight
+        self._background: Set[cozmo.action.Action] = set()
+
+    @property
+    def available(self) -> bool:
+        """
+        :return: True if a background move may start now, otherwise False
+        """
+        return not self._exclusive and not self._lock.locked()
+
+    @contextlib.asynccontextmanager
+    async def background(self):
+        """
+        Hold the robot for a background move.
+
+        Only enter this when the robot is available. Register every action
+        started within with `track`, so it can be aborted when someone else
+        needs the robot.
+        """
+
+        async with self._lock:
+            try:
+                yield
+            finally:
+                self._background.clear()
+
+    def track(self, action: cozmo.action.Action):
+        """
+        Register an action of the background move in flight.
+
+        If the robot has been taken in the meantime, the action is aborted
+        right away.
+
+        :param action: The action
+        """
+
+        self._background.add(action)
+
+        if self._exclusive:
+            action.abort()
+
+    @contextlib.asynccontextmanager
+    async def exclusive(self):
+        """
+        Hold the robot exclusively.
+
+        Any background move in flight is aborted, and this waits for it to wind
+        down. Exclusive holders take turns.
+        """
+
+        self._exclusive += 1
+        try:
+            for action in list(self._background):
+                if action.is_running:
+                    action.abort()
+
+            async with self._lock:
+                yield
+        finally:
+            self._exclusive -= 1
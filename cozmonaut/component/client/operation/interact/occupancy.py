@@ -0,0 +1,339 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+import heapq
+import math
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy
+
+# A grid cell (column, row)
+Cell = Tuple[int, int]
+
+# The eight moves between neighboring cells, with their lengths (in cells)
+_MOVES = (
+    (1, 0, 1.0),
+    (-1, 0, 1.0),
+    (0, 1, 1.0),
+    (0, -1, 1.0),
+    (1, 1, math.sqrt(2)),
+    (1, -1, math.sqrt(2)),
+    (-1, 1, math.sqrt(2)),
+    (-1, -1, math.sqrt(2)),
+)
+
+
+class OccupancyGrid:
+    """
+    A grid map of where a robot can and can't go.
+
+    The grid covers a rectangle of floor, with each cell either free or blocked.
+    Obstacles are grown by the robot's radius as they are added, so a path only
+    has to keep the robot's center on free cells.
+
+    Static obstacles (walls, tables, the charger) are known up front. Transient
+    obstacles (people's feet, a cube someone left out) are added as the robot
+    runs into them, and they are forgotten after a while.
+    """
+
+    def __init__(self, min_x: float, min_y: float, max_x: float, max_y: float, resolution: float = 20,
+                 robot_radius: float = 40):
+        """
+        :param min_x: The low x edge of the map (mm)
+        :param min_y: The low y edge of the map (mm)
+        :param max_x: The high x edge of the map (mm)
+        :param max_y: The high y edge of the map (mm)
+        :param resolution: The size of a cell (mm)
+        :param robot_radius: How much to grow obstacles by (mm)
+        """
+
+        self._min_x = min_x
+        self._min_y = min_y
+        self._resolution = resolution
+        self._robot_radius = robot_radius
+
+        self._cols = max(1, int(math.ceil((max_x - min_x) / resolution)))
+        self._rows = max(1, int(math.ceil((max_y - min_y) / resolution)))
+
+        # The static obstacles (indexed by row, then column)
+        self._static = numpy.zeros((self._rows, self._cols), dtype=bool)
+
+        # When each transient obstacle cell expires (seconds; zero where there is none)
+        self._expiry = numpy.zeros((self._rows, self._cols))
+
+    @property
+    def resolution(self) -> float:
+        """
+        :return: The size of a cell (mm)
+        """
+        return self._resolution
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """
+        :return: The number of columns and rows
+        """
+        return self._cols, self._rows
+
+    def cell(self, x: float, y: float) -> Cell:
+        """
+        Find the cell under a point, clamped to the map.
+
+        :param x: The x coordinate (mm)
+        :param y: The y coordinate (mm)
+        :return: The cell
+        """
+
+        col = int((x - self._min_x) // self._resolution)
+        row = int((y - self._min_y) // self._resolution)
+
+        return min(max(col, 0), self._cols - 1), min(max(row, 0), self._rows - 1)
+
+    def center(self, cell: Cell) -> Tuple[float, float]:
+        """
+        :param cell: The cell
+        :return: The x and y coordinates of its center (mm)
+        """
+
+        col, row = cell
+        return self._min_x + (col + 0.5) * self._resolution, self._min_y + (row + 0.5) * self._resolution
+
+    def blocked(self, now: float) -> numpy.ndarray:
+        """
+        Take a snapshot of the blocked cells.
+
+        The snapshot is a copy, so it can be planned on in another thread while
+        this map keeps changing.
+
+        :param now: The current time (seconds)
+        :return: The blocked cells (indexed by row, then column)
+        """
+        return self._static | (self._expiry > now)
+
+    def add_obstacle(self, x: float, y: float, radius: float, until: Optional[float] = None) -> Set[Cell]:
+        """
+        Add a round obstacle.
+
+        :param x: The x coordinate of its center (mm)
+        :param y: The y coordinate of its center (mm)
+        :param radius: Its radius (mm)
+        :param until: When to forget it (seconds), or None if it is static
+        :return: The cells that it blocks
+        """
+
+        reach = radius + self._robot_radius
+
+        # The cells whose centers are within reach
+        col_lo, row_lo = self.cell(x - reach, y - reach)
+        col_hi, row_hi = self.cell(x + reach, y + reach)
+
+        cols = numpy.arange(col_lo, col_hi + 1)
+        rows = numpy.arange(row_lo, row_hi + 1)
+        xs = self._min_x + (cols + 0.5) * self._resolution
+        ys = self._min_y + (rows + 0.5) * self._resolution
+
+        inside = (xs[numpy.newaxis, :] - x) ** 2 + (ys[:, numpy.newaxis] - y) ** 2 <= reach ** 2
+
+        if until is None:
+            self._static[row_lo:row_hi + 1, col_lo:col_hi + 1] |= inside
+        else:
+            area = self._expiry[row_lo:row_hi + 1, col_lo:col_hi + 1]
+            area[inside] = numpy.maximum(area[inside], until)
+
+        return {(int(cols[c]), int(rows[r])) for r, c in zip(*numpy.nonzero(inside))}
+
+
+def find_path(blocked: numpy.ndarray, start: Cell, goal: Cell) -> Optional[List[Cell]]:
+    """
+    Find the shortest path between two cells with A*.
+
+    Moves go to any of the eight neighboring cells, but never cut the corner of
+    a blocked cell. The start cell counts as free even if it isn't (the robot
+    may have stopped right up against an obstacle), so it can always get out.
+
+    :param blocked: The blocked cells (indexed by row, then column)
+    :param start: The start cell
+    :param goal: The goal cell
+    :return: The cells along the path (start and goal included), or None if there is none
+    """
+
+    rows, cols = blocked.shape
+
+    def free(col: int, row: int) -> bool:
+        return 0 <= col < cols and 0 <= row < rows and (not blocked[row, col] or (col, row) == start)
+
+    if not free(*goal):
+        return None
+
+    def heuristic(cell: Cell) -> float:
+        # The octile distance (the exact length with no obstacles around)
+        dx = abs(cell[0] - goal[0])
+        dy = abs(cell[1] - goal[1])
+        return max(dx, dy) + (math.sqrt(2) - 1) * min(dx, dy)
+
+    # The cheapest known cost to each cell and the cell it was reached from
+    cost = {start: 0.0}
+    came_from = {start: None}
+
+    frontier = [(heuristic(start), 0.0, start)]
+
+    while frontier:
+        _, g, cell = heapq.heappop(frontier)
+
+        if cell == goal:
+            # Walk back to the start
+            path = []
+            while cell is not None:
+                path.append(cell)
+                cell = came_from[cell]
+            return path[::-1]
+
+        # Skip stale frontier entries
+        if g > cost[cell]:
+            continue
+
+        col, row = cell
+        for dc, dr, length in _MOVES:
+            nc = col + dc
+            nr = row + dr
+
+            if not free(nc, nr):
+                continue
+
+            # No squeezing diagonally between two blocked cells
+            if dc and dr and not (free(col + dc, row) and free(col, row + dr)):
+                continue
+
+            ng = g + length
+            if ng < cost.get((nc, nr), math.inf):
+                cost[(nc, nr)] = ng
+                came_from[(nc, nr)] = cell
+                heapq.heappush(frontier, (ng + heuristic((nc, nr)), ng, (nc, nr)))
+
+    return None
+
+
+def line_cells(a: Cell, b: Cell) -> List[Cell]:
+    """
+    Find every cell a straight line between two cell centers passes through.
+
+    Where the line passes exactly through a corner, both cells beside the
+    corner are included, so a line never slips diagonally between two
+    blocked cells.
+
+    :param a: The cell to start from
+    :param b: The cell to end at
+    :return: The cells along the line, in order (both ends included)
+    """
+
+    col, row = a
+    dc = abs(b[0] - col)
+    dr = abs(b[1] - row)
+    step_c = 1 if b[0] > col else -1
+    step_r = 1 if b[1] > row else -1
+
+    cells = [(col, row)]
+
+    # The column and row boundaries crossed so far
+    i = j = 0
+
+    while i < dc or j < dr:
+        # Compare where the line reaches the next column and row boundaries (in units of its length)
+        # Multiplied out as (i + 1/2) / dc against (j + 1/2) / dr, to stay in integers
+        d = (1 + 2 * i) * dr - (1 + 2 * j) * dc
+
+        if d == 0:
+            # Right through a corner
+            cells.append((col + step_c, row))
+            cells.append((col, row + step_r))
+            col += step_c
+            row += step_r
+            i += 1
+            j += 1
+        elif d < 0:
+            col += step_c
+            i += 1
+        else:
+            row += step_r
+            j += 1
+
+        cells.append((col, row))
+
+    return cells
+
+
+def line_of_sight(blocked: numpy.ndarray, a: Cell, b: Cell) -> bool:
+    """
+    Check if the robot can drive straight between two cells.
+
+    Like in find_path, the start cell counts as free even if it isn't.
+
+    :param blocked: The blocked cells (indexed by row, then column)
+    :param a: The cell to start from
+    :param b: The cell to end at
+    :return: True if every cell along the way is free, otherwise False
+    """
+
+    rows, cols = blocked.shape
+
+    for col, row in line_cells(a, b):
+        if (col, row) == a:
+            continue
+        if not (0 <= col < cols and 0 <= row < rows) or blocked[row, col]:
+            return False
+
+    return True
+
+
+def smooth(blocked: numpy.ndarray, path: Sequence[Cell]) -> List[Cell]:
+    """
+    Reduce a path to as few straight legs as the obstacles allow.
+
+    A grid path only moves in eight directions, so a diagonal-ish stretch comes
+    out as a staircase. Starting from each kept cell, this skips ahead along
+    the path for as long as there's a clear straight line, and keeps the last
+    cell it could see.
+
+    :param blocked: The blocked cells (indexed by row, then column)
+    :param path: The cells along the path
+    :return: The cells to drive between in straight lines (start and goal included)
+    """
+
+    path = list(path)
+    if len(path) < 3:
+        return path
+
+    kept = [path[0]]
+    i = 0
+
+    while i < len(path) - 1:
+        # Neighbors along the path can always see each other
+        j = i + 1
+        while j + 1 < len(path) and line_of_sight(blocked, path[i], path[j + 1]):
+            j += 1
+
+        kept.append(path[j])
+        i = j
+
+    return kept
+
+
+def swept_cells(legs: Iterable[Cell]) -> Set[Cell]:
+    """
+    Find every cell a path of straight legs passes through.
+
+    :param legs: The cells to drive between in straight lines
+    :return: The cells passed through
+    """
+
+    legs = list(legs)
+    if len(legs) < 2:
+        return set(legs)
+
+    cells = set()
+    for a, b in zip(legs, legs[1:]):
+        cells.update(line_cells(a, b))
+
+    return cells
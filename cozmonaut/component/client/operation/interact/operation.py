@@ -0,0 +1,901 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from enum import Enum
+
+import cozmo
+from cozmo.util import distance_mm, speed_mmps
+
+from cozmonaut.component.client.operation import AbstractClientOperation
+from cozmonaut.component.client.operation.interact.battery import BatteryModel, SwapScheduler
+from cozmonaut.component.client.operation.interact.camera_policy import CameraPolicy
+from cozmonaut.component.client.operation.interact.charger_cache import ChargerPoseCache
+from cozmonaut.component.client.operation.interact.docking import ChargerDocking, DockingOutcome, DockingStats
+from cozmonaut.component.client.operation.interact.ego_motion import PoseHistory
+from cozmonaut.component.client.operation.interact.face_gallery import FaceGallery
+from cozmonaut.component.client.operation.interact.face_pipeline import FacePipeline
+from cozmonaut.component.client.operation.interact.face_servo import FaceServo
+from cozmonaut.component.client.operation.interact.face_tracker import DetectedFace, FaceTracker, TrackLostError
+from cozmonaut.component.client.operation.interact.gallery_snapshot import load_snapshot, save_snapshot
+from cozmonaut.component.client.operation.interact.gallery_sync import GallerySync
+from cozmonaut.component.client.operation.interact.motion import MotionLock
+from cozmonaut.component.client.operation.interact.patrol import (DEFAULT_ROUTE, FaceHeatMap, RoutePlanner,
+                                                                  WaypointPatrol)
+from cozmonaut.component.client.operation.interact.track_events import TrackEventKind
+from cozmonaut.database import open_database
+from cozmonaut.database.friends import FriendRepository
+from cozmonaut.database.schema import create_schema
+from cozmonaut.database.write_behind import WriteBehind
+
+
+class OperationInteractMode(Enum):
+    """
+    A mode for interaction with Cozmo(s).
+    """
+
+    both = 0  # Run both Cozmos interactively
+    only_a = 1  # Only run Cozmo A interactively
+    only_b = 2  # Only run Cozmo B interactively
+
+
+class OperationInteract(AbstractClientOperation):
+    """
+    The interactive mode operation.
+
+    In this mode, the Cozmo robots are driven around to perform the primary goal
+    of meeting and greeting people. Support is hardcoded for two Cozmo robots,
+    and they are assigned the roles of Cozmo A and Cozmo B.
+
+    TODO: Add information about how they interact with passersby and themselves
+    """
+
+    def __init__(self, args: dict):
+        self._args = args
+
+        # Control variables for the component
+        # This is at the level of the command-line app hosting us
+        self._should_stop = False
+        self._stopping = False
+        self._thread = None
+
+        # Control variables for the robots
+        # This is at the level of interacting with passersby
+        self._swap = False  # The "global" flag from the whiteboard (the active robot wants relief)
+        self._active = None  # The serial number of the active robot (the other one idles on its charger)
+        self._convo = False  # TODO: Conversation flag
+        self._cd = 0  # TODO: Conversation identifier (better name?)
+
+        # The live robot instances
+        self._robot_a = None
+        self._robot_b = None
+
+        # The docking tasks in progress (by robot serial number)
+        self._docking = {}
+
+        # Statistics on how docking goes, for both robots
+        self._docking_stats = DockingStats()
+
+        # Where each robot last saw its charger (by robot serial number)
+        self._charger_caches = {}
+
+        # The battery models for the robots (by robot serial number)
+        self._battery_models = {}
+
+        # Decides who gets to move each robot (by robot serial number)
+        # These are made on first use, on the event loop they're used from
+        self._motions = {}
+
+        # Decides when the active robot should be relieved
+        # On top of the handoff margin, this leaves time to dock (as learned from experience)
+        self._swap_margin = self._args.get('swap_lead', 60)
+        self._swap_scheduler = SwapScheduler(threshold=self._args.get('battery_threshold', 3.5),
+                                             lead_time=self._swap_margin + 60)
+
+        # The patrol route and its map, shared by both robots (they leave their chargers the same way)
+        self._route_planner = RoutePlanner(self._args.get('patrol_route', DEFAULT_ROUTE),
+                                           self._args.get('patrol_obstacles', ()))
+
+        # Where along the route faces have turned up lately
+        self._face_heat = FaceHeatMap(len(self._route_planner.route))
+
+        # The patrols in progress (by robot serial number)
+        self._patrols = {}
+
+        # The number of faces each robot is tracking (by robot serial number)
+        self._faces_tracked = {}
+
+        # The friends database
+        # This is optional (without it, we forget everyone when we stop)
+        self._db = None
+        self._friends = None
+        self._write_behind = None
+        if self._args.get('database') is not None:
+            self._db = open_database(self._args.get('database'))
+            self._friends = FriendRepository(self._db)
+
+            # Sightings and enrollments are written in batches off the hot path
+            self._write_behind = WriteBehind(self._friends)
+
+        # Keeps the gallery in sync with the database (set up once the gallery is loaded)
+        self._gallery_sync = None
+
+        # The face gallery shared by both trackers
+        # A face enrolled by either robot is immediately known to the other
+        self._gallery = FaceGallery()
+
+        # The face trackers for the respective robots
+        track_quality = self._args.get('track_quality', 7)
+        compensate_motion = self._args.get('motion_compensation', True)
+        self._face_tracker_a = FaceTracker(self._gallery, quality_threshold=track_quality,
+                                           compensate_motion=compensate_motion)
+        self._face_tracker_b = FaceTracker(self._gallery, quality_threshold=track_quality,
+                                           compensate_motion=compensate_motion)
+
+        # The recent poses of the respective robots, for pairing camera frames with where the camera was pointing
+        self._pose_history_a = PoseHistory()
+        self._pose_history_b = PoseHistory()
+
+        # How long camera frames take to arrive after they are taken (seconds)
+        self._camera_latency = self._args.get('camera_latency', 0.07)
+
+        # The camera policies for the respective robots
+        self._camera_policy_a = CameraPolicy()
+        self._camera_policy_b = CameraPolicy()
+
+    @property
+    def finished(self) -> bool:
+        # This only happens on its own if the robots we need can't be found
+        return self._thread is not None and not self._thread.is_alive()
+
+    def start(self):
+        # Start operation thread
+        self._thread = threading.Thread(target=self.main)
+        self._thread.start()
+
+    def stop(self):
+        # Set the kill switch
+        self._should_stop = True
+
+        # Wait for the thread to die
+        # This also waits for the Cozmos to park, potentially
+        self._thread.join()
+
+    def main(self):
+        # Create an event loop on this thread
+        loop = asyncio.new_event_loop()
+
+        # The mode of interaction (given by name on the command line)
+        mode = self._args.get('mode', OperationInteractMode.both)
+        if isinstance(mode, str):
+            mode = OperationInteractMode[mode]
+
+        # The serial numbers for Cozmos A and B
+        serial_a = self._args.get('serial_a')
+        serial_b = self._args.get('serial_b')
+
+        print(f'Want Cozmo A to have serial number {serial_a or "(unknown)"}')
+        print(f'Want Cozmo B to have serial number {serial_b or "(unknown)"}')
+
+        while True:
+            # Connect to next available Cozmo
+            try:
+                conn = cozmo.connect_on_loop(loop)
+            except cozmo.exceptions.NoDevicesFound:
+                break
+
+            # Wait for the robot to become available
+            # We must do this to read its serial number
+            robot = loop.run_until_complete(conn.wait_for_robot())
+
+            print(f'Found a robot with serial {robot.serial}')
+
+            # Keep robot instances with desired serial numbers
+            if robot.serial == serial_a:
+                self._robot_a = robot
+            if robot.serial == serial_b:
+                self._robot_b = robot
+
+            # If both are assigned, we're good!
+            if self._robot_a is not None and self._robot_b is not None:
+                print('Both Cozmo A and Cozmo B assigned')
+                break
+
+        # A list for main function coroutines
+        # Coroutine objects for both the _cozmo_a_main and _cozmo_b_main async functions can go here
+        # Or neither of them can go here (that depends on which serial numbers were specified and found above)
+        coroutines_for_cozmo = []
+
+        # If we assigned a robot instance to play Cozmo A...
+        if self._robot_a is not None:
+            print(f'The role of Cozmo A is being played by robot {self._robot_a.serial}')
+
+            # Obtain a coroutine for Cozmo A main function
+            # Add the coroutine to the above coroutine list
+            coroutines_for_cozmo.append(self._cozmo_a_main(self._robot_a))
+        else:
+            print('Unable to cast the role of Cozmo A')
+
+            # If the current mode requires Cozmo A to be assigned
+            # The two modes that require this are "only_a" and "both"
+            if mode == OperationInteractMode.only_a or mode == OperationInteractMode.both:
+                print('Refusing to continue because Cozmo A was not assigned')
+
+                # Nothing was written, so just hang up on the database
+                if self._db is not None:
+                    self._db.close()
+
+                return
+            else:
+                print('Continuing without Cozmo A...')
+
+        # If we assigned a robot instance to play Cozmo B...
+        if self._robot_b is not None:
+            print(f'The role of Cozmo B is being played by robot {self._robot_b.serial}')
+
+            # Obtain a coroutine for Cozmo B main function
+            # Add the coroutine to the above coroutine list
+            coroutines_for_cozmo.append(self._cozmo_b_main(self._robot_b))
+        else:
+            print('Unable to cast the role of Cozmo B')
+
+            # If the current mode requires Cozmo B to be assigned
+            # The two modes that require this are "only_b" and "both"
+            if mode == OperationInteractMode.only_b or mode == OperationInteractMode.both:
+                print('Refusing to continue because Cozmo B was not assigned')
+
+                # Nothing was written, so just hang up on the database
+                if self._db is not None:
+                    self._db.close()
+
+                return
+            else:
+                print('Continuing without Cozmo B...')
+
+        # Flush database writes in the background (only now that we know we'll run)
+        if self._write_behind is not None:
+            coroutines_for_cozmo.append(self._write_behind.run())
+
+        # Cozmo A starts out active (or Cozmo B, if there's no Cozmo A)
+        self._active = (self._robot_a or self._robot_b).serial
+
+        # This wraps everything into one task object and schedules it on the loop
+        asyncio.gather(
+            # The operation watchdog (tells us when to call it quits)
+            self._watchdog(),
+
+            # Expand the main coroutines list into arguments
+            *coroutines_for_cozmo,
+
+            # Use the new loop
+            loop=loop,
+        )
+
+        # Start the face trackers
+        self._face_tracker_a.start()
+        self._face_tracker_b.start()
+
+        # Read the database into the trackers
+        self._load_gallery()
+
+        # Keep the trackers in sync with the database from here on
+        if self._gallery_sync is not None:
+            asyncio.ensure_future(self._gallery_sync.run(), loop=loop)
+
+        # Run the loop on this thread until it stops itself
+        loop.run_forever()
+
+        # Stop syncing from the database
+        if self._gallery_sync is not None:
+            self._gallery_sync.stop()
+
+        # Save whatever the trackers learned that hasn't made it to the database yet
+        if self._write_behind is not None:
+            loop.run_until_complete(self._write_behind.close())
+
+        # Save the gallery for next time
+        self._save_gallery_snapshot()
+
+        # Stop the face trackers
+        self._face_tracker_a.stop()
+        self._face_tracker_b.stop()
+
+        # Hang up on the database
+        if self._db is not None:
+            self._db.close()
+
+    def _load_gallery(self):
+        """
+        Load all known faces into the shared gallery.
+
+        If there's a gallery snapshot file, it is memory-mapped, and the gallery
+        sync catches it up with the database in the background. Otherwise, all
+        faces are read from the database.
+        """
+
+        start = time.perf_counter()
+
+        # Make sure the tables are there (and up to date)
+        if self._db is not None:
+            create_schema(self._db)
+
+        # Try the snapshot first
+        loaded = self._load_gallery_snapshot()
+
+        if loaded is not None:
+            fids, idents, version = loaded
+            source = 'snapshot'
+        elif self._friends is not None:
+            # Note where the change log is before loading
+            # Anything changed while we load gets applied again by the sync, which is harmless
+            version = self._friends.change_version()
+
+            # Pull all identities in one pass
+            fids, idents = self._friends.load_identities()
+            source = 'database'
+        else:
+            print('No database given; starting with no known faces')
+            return
+
+        # Swap them into the gallery all at once
+        self._gallery.replace(fids, idents)
+
+        elapsed = time.perf_counter() - start
+        size = (fids.nbytes + idents.nbytes) / (1 << 20)
+        print(f'Loaded {len(fids)} known faces from the {source} in {elapsed:.2f} s ({size:.1f} MiB)')
+
+        if self._friends is not None:
+            # Pick up changes made since
+            self._gallery_sync = GallerySync(self._friends, self._gallery, version)
+
+            # Give the next start a head start
+            if source == 'database':
+                self._save_gallery_snapshot()
+
+    def _load_gallery_snapshot(self):
+        """
+        Load the gallery snapshot file, if there is a usable one.
+
+        :return: The face IDs, face identities, and change version, or None
+        """
+
+        path = self._args.get('gallery_snapshot')
+        if path is None or not os.path.exists(path):
+            return None
+
+        try:
+            fids, idents, version = load_snapshot(path)
+        except ValueError as e:
+            print(f'Ignoring gallery snapshot: {e}')
+            return None
+
+        # A snapshot ahead of the change log belongs to some other database (or one that was reset)
+        if self._friends is not None and version > self._friends.change_version():
+            print(f'Ignoring gallery snapshot {path}, as it does not match the database')
+            return None
+
+        return fids, idents, version
+
+    def _save_gallery_snapshot(self):
+        """
+        Save the gallery to the gallery snapshot file, if we have one.
+        """
+
+        path = self._args.get('gallery_snapshot')
+        if path is None or self._gallery_sync is None:
+            return
+
+        save_snapshot(path, self._gallery.snapshot, self._gallery_sync.version)
+
+    async def _watchdog(self):
+        """
+        The operation watchdog.
+
+        This looks out for the "kill switch" set by another thread. If it is
+        set, we safe the robots and clean up gracefully.
+        """
+
+        while not self._stopping:
+            # If the kill switch is set but we're not stopping yet
+            if self._should_stop and not self._stopping:
+                # We're stopping now
+                self._stopping = True
+
+                # Drive both Cozmos back to their chargers, as the Ctrl+C or equivalent happened
+                # They dock at the same time, so this takes as long as the slowest one
+                robots = [robot for robot in (self._robot_a, self._robot_b) if robot is not None]
+                await asyncio.gather(*(self._dock(robot) for robot in robots if not robot.is_on_charger),
+                                     return_exceptions=True)
+
+                if self._docking_stats.outcomes:
+                    print(self._docking_stats.summary())
+
+                for serial, cache in self._charger_caches.items():
+                    print(f'Robot {serial} reused its charger pose {cache.hits} of {cache.hits + cache.misses} times')
+
+                if self._route_planner.plans:
+                    print(self._route_planner.summary())
+
+                for name, ft in (('A', self._face_tracker_a), ('B', self._face_tracker_b)):
+                    if ft.stats.updates:
+                        print(f'Face tracker {name}: {ft.stats.summary()}')
+
+                # Politely ask the loop to stop
+                loop = asyncio.get_event_loop()
+                loop.call_soon(loop.stop)
+
+            # Yield control to other coroutines
+            await asyncio.sleep(0)
+
+    async def _cozmo_a_main(self, robot: cozmo.robot.Robot):
+        """
+        Main function for Cozmo A.
+
+        :param robot: The robot instance
+        """
+
+        # Register to receive camera frames from this robot
+        robot.camera.add_event_handler(cozmo.robot.camera.EvtNewRawCameraImage, self._cozmo_a_on_new_raw_camera_image)
+
+        # Keep track of where the camera points
+        robot.add_event_handler(cozmo.robot.EvtRobotStateUpdated, self._on_robot_state_updated)
+
+        # Schedule a battery watcher for this robot onto the loop
+        coro_batt = asyncio.ensure_future(self._battery_watcher(robot))
+
+        # Schedule a face watcher for this robot onto the loop
+        coro_face = asyncio.ensure_future(self._face_watcher(robot))
+
+        # Schedule a camera governor for this robot onto the loop
+        coro_camera = asyncio.ensure_future(self._camera_governor(robot))
+
+        # Loop for Cozmo A
+        while not self._stopping:
+            # Swap back and forth between active and idle
+            if self._active == robot.serial:
+                await self._cozmo_common_active(robot)
+            else:
+                await self._cozmo_common_idle(robot)
+
+        # Wait for camera coroutine to stop
+        await coro_camera
+
+        # Wait for face coroutine to stop
+        await coro_face
+
+        # Wait for battery coroutine to stop
+        await coro_batt
+
+    def _cozmo_a_on_new_raw_camera_image(self, evt: cozmo.robot.camera.EvtNewRawCameraImage, **kwargs):
+        """
+        Event handler for Cozmo A's raw camera image event.
+
+        This function is not asynchronous, so go fast!
+
+        :param evt: The event instance
+        """
+
+        # Send the image off to face tracker A (if the camera policy wants it)
+        self._feed_face_tracker(self._camera_policy_a, self._face_tracker_a, self._pose_history_a, evt.image)
+
+    async def _cozmo_b_main(self, robot: cozmo.robot.Robot):
+        """
+        Main function for Cozmo B.
+
+        :param robot: The robot instance
+        """
+
+        # Register to receive camera frames from this robot
+        robot.camera.add_event_handler(cozmo.robot.camera.EvtNewRawCameraImage, self._cozmo_b_on_new_raw_camera_image)
+
+        # Keep track of where the camera points
+        robot.add_event_handler(cozmo.robot.EvtRobotStateUpdated, self._on_robot_state_updated)
+
+        # Schedule a battery watcher for this robot onto the loop
+        coro_batt = asyncio.ensure_future(self._battery_watcher(robot))
+
+        # Schedule a face watcher for this robot onto the loop
+        coro_face = asyncio.ensure_future(self._face_watcher(robot))
+
+        # Schedule a camera governor for this robot onto the loop
+        coro_camera = asyncio.ensure_future(self._camera_governor(robot))
+
+        # Loop for Cozmo B
+        while not self._stopping:
+            # Swap back and forth between active and idle (but opposite that of Cozmo A)
+            if self._active == robot.serial:
+                await self._cozmo_common_active(robot)
+            else:
+                await self._cozmo_common_idle(robot)
+
+        # Wait for camera coroutine to stop
+        await coro_camera
+
+        # Wait for face coroutine to stop
+        await coro_face
+
+        # Wait for battery coroutine to stop
+        await coro_batt
+
+    async def _cozmo_common_active(self, robot: cozmo.robot.Robot):
+        """
+        The active subroutine for a Cozmo robot.
+
+        The robot patrols its route, meeting passersby along the way. This
+        returns once the robot is relieved (and back on its charger).
+
+        :param robot: The robot instance
+        """
+
+        motion = self._motion_lock(robot)
+
+        # Get off the charger and out of its way
+        if robot.is_on_charger:
+            async with motion.exclusive():
+                await robot.drive_off_charger_contacts().wait_for_completed()
+                await robot.drive_straight(distance_mm(100), speed_mmps(50)).wait_for_completed()
+
+        def keep_going():
+            return not self._stopping and self._active == robot.serial
+
+        def engaged():
+            return self._faces_tracked.get(robot.serial, 0) > 0
+
+        patrol = WaypointPatrol(robot, self._route_planner, self._face_heat, keep_going, engaged, motion)
+
+        self._patrols[robot.serial] = patrol
+        try:
+            await patrol.run()
+        finally:
+            del self._patrols[robot.serial]
+
+        # If the patrol gave up early, stay put and meet whoever comes by
+        while keep_going():
+            await asyncio.sleep(0.5)
+
+        # Go charge (unless we're stopping, as then the watchdog docks everyone)
+        if not self._stopping:
+            outcome = await self._dock(robot)
+            if not outcome.docked:
+                # TODO: Get a human to come put it back on the charger
+                print(f'Robot {robot.serial} could not dock')
+
+    async def _cozmo_common_idle(self, robot: cozmo.robot.Robot):
+        """
+        The idle subroutine for a Cozmo robot.
+
+        This is where the idling-on-charger code should go. It returns once the
+        robot takes over as the active robot.
+
+        :param robot: The robot instance
+        """
+
+        while not self._stopping and self._active != robot.serial:
+            # Take over if the active robot wants relief (or there is none), as long as we're charged up
+            if (self._swap or self._active is None) and self._battery_ready(robot):
+                print(f'Robot {robot.serial} is taking over as the active robot')
+                self._active = robot.serial
+                self._swap = False
+                break
+
+            # Nothing happens fast on the charger
+            await asyncio.sleep(1)
+
+    def _cozmo_b_on_new_raw_camera_image(self, evt: cozmo.robot.camera.EvtNewRawCameraImage, **kwargs):
+        """
+        Event handler for Cozmo B's raw camera image event.
+
+        This function is not asynchronous, so go fast!
+
+        :param evt: The event instance
+        """
+
+        # Send the image off to face tracker B (if the camera policy wants it)
+        self._feed_face_tracker(self._camera_policy_b, self._face_tracker_b, self._pose_history_b, evt.image)
+
+    def _on_robot_state_updated(self, evt: cozmo.robot.EvtRobotStateUpdated, **kwargs):
+        """
+        Event handler for a robot's state update event.
+
+        This function is not asynchronous, so go fast!
+
+        :param evt: The event instance
+        """
+
+        robot = evt.robot
+
+        history = None
+        if robot == self._robot_a:
+            history = self._pose_history_a
+        elif robot == self._robot_b:
+            history = self._pose_history_b
+
+        history.record(time.monotonic(), robot.pose.rotation.angle_z.radians, robot.head_angle.radians)
+
+    def _feed_face_tracker(self, policy: CameraPolicy, ft: FaceTracker, history: PoseHistory, image):
+        """
+        Feed a camera frame to a face tracker, subject to a camera policy.
+
+        :param policy: The camera policy for the robot
+        :param ft: The face tracker for the robot
+        :param history: The recent poses of the robot
+        :param image: The camera frame
+        """
+
+        # Drop the frame if the policy says we've had enough for now
+        now = time.monotonic()
+        if not policy.admit(now):
+            return
+
+        # Note where the camera was pointing when the frame was taken
+        pose = history.at(now - self._camera_latency)
+
+        ft.update(image, pose)
+
+        # Let the policy know how long that took, so it can back off if we're falling behind
+        policy.report(time.monotonic() - now)
+
+    async def _camera_governor(self, robot: cozmo.robot.Robot):
+        """
+        A camera governor for a Cozmo robot.
+
+        This keeps the robot's camera settings in line with its camera policy.
+
+        :param robot: The robot instance
+        """
+
+        # Pick the camera policy for this robot
+        policy = None
+        if robot == self._robot_a:
+            policy = self._camera_policy_a
+        elif robot == self._robot_b:
+            policy = self._camera_policy_b
+
+        while not self._stopping:
+            # A robot sitting on its charger is idle
+            policy.set_idle(robot.is_on_charger)
+            policy.apply(robot)
+
+            # Camera settings don't need to change often
+            await asyncio.sleep(0.5)
+
+    async def _battery_watcher(self, robot: cozmo.robot.Robot):
+        """
+        A battery watcher for a Cozmo robot.
+
+        This is responsible for watching the battery potential on a robot object
+        and returning the robot to the charger. Rather than wait for the battery
+        to run low, it predicts when that will happen and asks for the other
+        robot to be swapped in early enough that it's out and about before this
+        one has to leave.
+
+        :param robot: The robot instance
+        """
+
+        loop = asyncio.get_event_loop()
+        model = self._battery_models.setdefault(robot.serial, BatteryModel())
+        scheduler = self._swap_scheduler
+
+        while not self._stopping:
+            if robot.is_on_charger:
+                # Charging voltage says nothing about discharge, so start over once we're off
+                model.clear()
+            else:
+                model.add(loop.time(), robot.battery_voltage)
+
+            if self._active == robot.serial and not robot.is_on_charger:
+                # Leave time for docking, going by how long it has been taking
+                if self._docking_stats.mean_duration is not None:
+                    scheduler.lead_time = self._swap_margin + self._docking_stats.mean_duration
+
+                if scheduler.must_dock(model):
+                    # Nobody took over in time, so go charge anyway
+                    print(f'Robot {robot.serial} battery is down to {model.voltage:.2f} V; going to charge')
+                    self._active = None
+                    self._swap = False
+                elif not self._swap and scheduler.swap_due(model):
+                    print(f'Robot {robot.serial} battery is at {model.voltage:.2f} V, with about '
+                          f'{scheduler.time_left(model):.0f} s left; asking for a swap')
+                    self._swap = True
+
+            # Voltage changes slowly
+            await asyncio.sleep(1)
+
+    def _battery_ready(self, robot: cozmo.robot.Robot) -> bool:
+        """
+        Check if a robot has enough charge to take over as the active robot.
+
+        :param robot: The robot instance
+        :return: True if so, otherwise False
+        """
+
+        # On the charger, wait until charging is done
+        if robot.is_on_charger:
+            return not robot.is_charging
+
+        model = self._battery_models.get(robot.serial)
+        return model is not None and not self._swap_scheduler.swap_due(model)
+
+    async def _dock(self, robot: cozmo.robot.Robot) -> DockingOutcome:
+        """
+        Drive a Cozmo robot back onto its charger.
+
+        If the robot is already docking (say, the battery ran low and then the
+        kill switch was set), this waits on the docking already in progress.
+
+        :param robot: The robot instance
+        :return: The outcome
+        """
+
+        task = self._docking.get(robot.serial)
+        if task is None or task.done():
+            cache = self._charger_caches.setdefault(robot.serial, ChargerPoseCache())
+            docking = ChargerDocking(robot, self._docking_stats, cache, self._motion_lock(robot),
+                                     max_attempts=self._args.get('dock_attempts', 5))
+            task = asyncio.ensure_future(docking.dock())
+            self._docking[robot.serial] = task
+
+        # Don't let one impatient caller cancel the docking for everyone
+        return await asyncio.shield(task)
+
+    async def _face_watcher(self, robot: cozmo.robot.Robot):
+        """
+        A face watcher for a Cozmo robot.
+
+        This is responsible for watching for faces
+
+        :param robot: The robot instance
+        """
+
+        # Pick the face tracker and camera policy for this robot
+        # Cozmo A gets tracker A and Cozmo B gets tracker B
+        ft = None
+        policy = None
+        if robot == self._robot_a:
+            ft = self._face_tracker_a
+            policy = self._camera_policy_a
+        elif robot == self._robot_b:
+            ft = self._face_tracker_b
+            policy = self._camera_policy_b
+
+        # Enable imaging on this robot's camera
+        policy.apply(robot)
+
+        # Keeps the robot looking at whoever it is interacting with
+        servo = FaceServo(robot, functools.partial(self._servo_may_move, robot),
+                          functools.partial(self._servo_may_turn, robot), self._motion_lock(robot))
+        servo_task = asyncio.ensure_future(servo.run(lambda: not self._stopping))
+
+        # The pipeline of per-face interactions
+        # Several faces can be handled at once, with the closest ones first
+        pipeline = FacePipeline(functools.partial(self._face_interaction, robot, ft, servo),
+                                max_tasks=self._args.get('max_face_tasks', 3))
+
+        loop = asyncio.get_event_loop()
+
+        try:
+            # Listen for track events from the tracker
+            # The stream ends when the tracker stops
+            async for event in ft.track_events():
+                if self._stopping:
+                    break
+
+                pipeline.handle(event)
+
+                # Let the servo know where the face is
+                if event.kind == TrackEventKind.new or event.kind == TrackEventKind.updated:
+                    servo.observe(event.face, loop.time(), ft.frame_size)
+                elif event.kind == TrackEventKind.lost:
+                    servo.forget(event.index)
+
+                # Note where along the patrol route the face turned up
+                patrol = self._patrols.get(robot.serial)
+                if event.kind == TrackEventKind.new and patrol is not None and patrol.waypoint is not None:
+                    self._face_heat.record(patrol.waypoint, loop.time())
+
+                # Keep the camera at full tilt as long as there are faces around
+                self._faces_tracked[robot.serial] = pipeline.tracked
+                policy.set_tracking(pipeline.tracked > 0)
+        finally:
+            # Drop whatever interactions are still going
+            await pipeline.cancel_all()
+
+            servo_task.cancel()
+
+    def _motion_lock(self, robot: cozmo.robot.Robot) -> MotionLock:
+        """
+        Get the motion lock for a robot.
+
+        Call this from the robot's event loop.
+
+        :param robot: The robot instance
+        :return: The motion lock
+        """
+
+        motion = self._motions.get(robot.serial)
+        if motion is None:
+            motion = self._motions[robot.serial] = MotionLock()
+
+        return motion
+
+    def _servo_may_move(self, robot: cozmo.robot.Robot) -> bool:
+        """
+        Check if the face servo may move a robot's head.
+
+        :param robot: The robot instance
+        :return: True if so, otherwise False
+        """
+
+        # Docking needs the head for finding the charger
+        task = self._docking.get(robot.serial)
+        return task is None or task.done()
+
+    def _servo_may_turn(self, robot: cozmo.robot.Robot) -> bool:
+        """
+        Check if the face servo may turn a robot's body.
+
+        :param robot: The robot instance
+        :return: True if so, otherwise False
+        """
+
+        # Turning would knock it off its charger, and it would fight with the patrol's driving
+        patrol = self._patrols.get(robot.serial)
+        return (self._servo_may_move(robot) and not robot.is_on_charger
+                and (patrol is None or not patrol.driving))
+
+    async def _face_interaction(self, robot: cozmo.robot.Robot, ft: FaceTracker, servo: FaceServo,
+                                track: DetectedFace):
+        """
+        An interaction between a Cozmo robot and one tracked face.
+
+        This is cancelled if the track is lost.
+
+        :param robot: The robot instance
+        :param ft: The face tracker for the robot
+        :param servo: The face servo for the robot
+        :param track: The tracked face
+        """
+
+        # Look at the face for social cue (for as long as the interaction goes)
+        servo.focus = track.index
+
+        try:
+            # Wait until the face holds still in the frame, as recognizing a blurry face is wasted effort
+            if not await servo.wait_steady(track.index):
+                return
+
+            # Request to recognize the face
+            # If we get cancelled, the pending recognition is cancelled, too
+            try:
+                rec = await asyncio.wrap_future(ft.recognize(track.index))
+            except TrackLostError:
+                # The face left before we got a good look at it
+                return
+
+            if rec.fid != -1:
+                # We know this face, so note that we saw it again
+                if self._write_behind is not None:
+                    self._write_behind.mark_seen(rec.fid)
+
+                # TODO: Greet the face
+            else:
+                # TODO: Meet the new person (and ask for their name)
+
+                # Store the new face and add it to the shared gallery, so both robots know it from now on
+                if self._write_behind is not None:
+                    fid = await self._write_behind.enroll('', rec.ident)
+                    self._gallery.add_identity(fid, rec.ident)
+        finally:
+            # Let the servo look at somebody else
+            if servo.focus == track.index:
+                servo.focus = None
+
+
+# Do not leave the charger until we say it's okay
+cozmo.robot.Robot.drive_off_charger_on_connect = False
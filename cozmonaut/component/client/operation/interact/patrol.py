@@ -0,0 +1,573 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+import asyncio
+import math
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import cozmo
+import numpy
+from cozmo.util import Pose, degrees, radians
+
+from cozmonaut.component.client.operation.interact.motion import MotionLock
+from cozmonaut.component.client.operation.interact.occupancy import (Cell, OccupancyGrid, find_path, smooth,
+                                                                      swept_cells)
+
+# The default patrol route (mm, in the patrol frame)
+# The patrol frame starts where the robot stands after leaving its charger, with x pointing away from the charger
+DEFAULT_ROUTE = ((200, 0), (500, 250), (800, 0), (500, -250))
+
+# Roughly where the charger sits in the patrol frame (x, y, and radius in mm)
+CHARGER_OBSTACLE = (-170, 0, 60)
+
+# The head angle for looking people in the face while on patrol
+PATROL_HEAD_ANGLE = degrees(30)
+
+
+class FaceHeatMap:
+    """
+    Remembers where along the route faces have turned up lately.
+
+    Each face seen adds heat to the waypoint the robot was at (or headed for),
+    and heat halves every so often, so the map follows the foot traffic over
+    the course of a day. The robot lingers longer at hot waypoints.
+    """
+
+    def __init__(self, size: int, half_life: float = 900):
+        """
+        :param size: The number of waypoints
+        :param half_life: How long it takes heat to halve (seconds)
+        """
+
+        self._half_life = half_life
+
+        # The heat at each waypoint, as of when it was last updated
+        self._heat = [0.0] * size
+        self._updated = [0.0] * size
+
+    def heat(self, index: int, now: float) -> float:
+        """
+        :param index: The waypoint index
+        :param now: The current time (seconds)
+        :return: The heat at the waypoint
+        """
+        return self._heat[index] * 0.5 ** ((now - self._updated[index]) / self._half_life)
+
+    def record(self, index: int, now: float, weight: float = 1):
+        """
+        Record a face seen at a waypoint.
+
+        :param index: The waypoint index
+        :param now: The current time (seconds)
+        :param weight: How much heat to add
+        """
+
+        self._heat[index] = self.heat(index, now) + weight
+        self._updated[index] = now
+
+    def dwell_time(self, index: int, now: float, base: float, extra: float) -> float:
+        """
+        Decide how long to stay at a waypoint.
+
+        :param index: The waypoint index
+        :param now: The current time (seconds)
+        :param base: The time to stay at the coldest waypoint (seconds)
+        :param extra: The additional time to stay at the hottest waypoint (seconds)
+        :return: The time to stay (seconds)
+        """
+
+        hottest = max(self.heat(i, now) for i in range(len(self._heat)))
+        if hottest <= 0:
+            return base
+
+        return base + extra * self.heat(index, now) / hottest
+
+
+class RoutePlanner:
+    """
+    Plans the paths between the waypoints of a patrol route.
+
+    The paths are found with A* on an occupancy grid, then straightened out
+    wherever there's a clear line of sight, so the robot drives a few long
+    legs instead of a staircase of short ones. Planning happens in an executor
+    on a snapshot of the grid, so it never holds up the event loop,
+    and the path between each pair of consecutive waypoints is kept for next
+    time around. When an obstacle turns up, only the kept paths running through
+    it are thrown away, and only those are planned again.
+    """
+
+    def __init__(self, route: Sequence[Tuple[float, float]], obstacles: Sequence[Tuple[float, float, float]] = (),
+                 margin: float = 300, resolution: float = 20):
+        """
+        :param route: The waypoints (mm, in the patrol frame)
+        :param obstacles: The static obstacles (x, y, and radius in mm, in the patrol frame)
+        :param margin: How far past the route the map reaches (mm)
+        :param resolution: The size of a map cell (mm)
+        """
+
+        self._route = [(float(x), float(y)) for x, y in route]
+
+        # Map the route, the start, and the charger, with room to go around things
+        xs = [x for x, _ in self._route] + [0, CHARGER_OBSTACLE[0]]
+        ys = [y for _, y in self._route] + [0, CHARGER_OBSTACLE[1]]
+        self._grid = OccupancyGrid(min(xs) - margin, min(ys) - margin, max(xs) + margin, max(ys) + margin,
+                                   resolution)
+
+        for x, y, radius in (CHARGER_OBSTACLE, *obstacles):
+            self._grid.add_obstacle(x, y, radius)
+
+        # The kept paths (by start and goal cell), with the cells each passes through
+        self._paths: Dict[Tuple[Cell, Cell], Tuple[List[Cell], Set[Cell]]] = {}
+
+        # Statistics
+        self._plans = 0
+        self._reuses = 0
+        self._invalidations = 0
+        self._plan_time = 0.0
+
+    @property
+    def route(self) -> List[Tuple[float, float]]:
+        """
+        :return: The waypoints (mm, in the patrol frame)
+        """
+        return self._route
+
+    @property
+    def grid(self) -> OccupancyGrid:
+        """
+        :return: The occupancy grid
+        """
+        return self._grid
+
+    @property
+    def plans(self) -> int:
+        """
+        :return: The number of paths planned
+        """
+        return self._plans
+
+    def summary(self) -> str:
+        """
+        :return: A human-readable summary of the planning statistics
+        """
+
+        mean = self._plan_time / self._plans * 1000 if self._plans else 0
+        return (f'Patrol planning: {self._plans} paths planned ({mean:.1f} ms each), {self._reuses} reused, '
+                f'{self._invalidations} thrown away because of obstacles')
+
+    async def prepare(self, now: float):
+        """
+        Plan the paths between all consecutive waypoints ahead of time.
+
+        Paths that are already kept are not planned again.
+
+        :param now: The current time (seconds)
+        """
+
+        for index in range(len(self._route)):
+            await self.plan(self._route[index - 1], index, now)
+
+    async def plan(self, start: Tuple[float, float], index: int, now: float) -> Optional[List[Cell]]:
+        """
+        Plan a path to a waypoint.
+
+        :param start: Where to start from (mm, in the patrol frame)
+        :param index: The index of the waypoint to go to
+        :param now: The current time (seconds)
+        :return: The cells to drive between in straight lines, or None if the waypoint can't be reached
+        """
+
+        start_cell = self._grid.cell(*start)
+        goal_cell = self._grid.cell(*self._route[index])
+
+        kept = self._paths.get((start_cell, goal_cell))
+        if kept is not None:
+            self._reuses += 1
+            return kept[0]
+
+        loop = asyncio.get_event_loop()
+        began = time.perf_counter()
+
+        path = await loop.run_in_executor(None, _plan_path, self._grid.blocked(now), start_cell, goal_cell)
+
+        self._plans += 1
+        self._plan_time += time.perf_counter() - began
+
+        # Keep paths between waypoints (paths from anywhere else are one-offs)
+        waypoint_cells = {self._grid.cell(*waypoint) for waypoint in self._route}
+        if path is not None and start_cell in waypoint_cells:
+            self._paths[(start_cell, goal_cell)] = path, swept_cells(path)
+
+        return path
+
+    def block(self, x: float, y: float, radius: float, until: float) -> Set[Cell]:
+        """
+        Add a transient obstacle, and throw away the kept paths running through it.
+
+        :param x: The x coordinate of its center (mm, in the patrol frame)
+        :param y: The y coordinate of its center (mm, in the patrol frame)
+        :param radius: Its radius (mm)
+        :param until: When to forget it (seconds)
+        :return: The cells that it blocks
+        """
+
+        cells = self._grid.add_obstacle(x, y, radius, until)
+
+        for key, (_, swept) in list(self._paths.items()):
+            if not cells.isdisjoint(swept):
+                del self._paths[key]
+                self._invalidations += 1
+
+        return cells
+
+
+def _plan_path(blocked: numpy.ndarray, start: Cell, goal: Cell) -> Optional[List[Cell]]:
+    """
+    Find a path and straighten it out (this runs in an executor).
+
+    :param blocked: The blocked cells (indexed by row, then column)
+    :param start: The start cell
+    :param goal: The goal cell
+    :return: The cells to drive between in straight lines, or None if there is no path
+    """
+
+    path = find_path(blocked, start, goal)
+    if path is None:
+        return None
+
+    return smooth(blocked, path)
+
+
+class WaypointPatrol:
+    """
+    Drives a robot around a patrol route to meet passersby.
+
+    The robot visits the waypoints in order, going around the obstacles it
+    knows of, and stays at each one for a while. It stays longer where faces
+    have turned up lately, and it doesn't leave while it is still busy with
+    someone. If it bumps into something, or sees a cube in the way, it marks the
+    spot on the map and plans its way around it.
+
+    The route is laid out in the patrol frame, which starts where the robot
+    stands when the patrol begins (right after leaving its charger).
+
+    Every action is taken with the robot's motion lock held exclusively, so
+    the face servo stays out of the way while the patrol moves the robot.
+    """
+
+    def __init__(self, robot: cozmo.robot.Robot, planner: RoutePlanner, heat: FaceHeatMap,
+                 keep_going: Callable[[], bool], engaged: Callable[[], bool], motion: MotionLock = None,
+                 base_dwell: float = 5, extra_dwell: float = 25, max_hold: float = 60, obstacle_ttl: float = 120,
+                 max_replans: int = 3, retry_delay: float = 2):
+        """
+        :param robot: The robot instance
+        :param planner: The route planner
+        :param heat: Where faces have turned up lately
+        :param keep_going: Says whether to keep patrolling
+        :param engaged: Says whether the robot is busy with someone
+        :param motion: The robot's motion lock (optional)
+        :param base_dwell: The time to stay at the coldest waypoint (seconds)
+        :param extra_dwell: The additional time to stay at the hottest waypoint (seconds)
+        :param max_hold: The longest to stay at a waypoint while busy with someone (seconds)
+        :param obstacle_ttl: How long to remember an obstacle for (seconds)
+        :param max_replans: The number of times to plan around obstacles on the way to a waypoint
+        :param retry_delay: The time to wait after failing to reach a waypoint (seconds)
+        """
+
+        self._robot = robot
+        self._planner = planner
+        self._heat = heat
+        self._keep_going = keep_going
+        self._engaged = engaged
+        self._motion = motion if motion is not None else MotionLock()
+        self._base_dwell = base_dwell
+        self._extra_dwell = extra_dwell
+        self._max_hold = max_hold
+        self._obstacle_ttl = obstacle_ttl
+        self._max_replans = max_replans
+        self._retry_delay = retry_delay
+
+        # Where the patrol frame sits in the robot's world
+        self._anchor: Optional[Pose] = None
+
+        # The waypoint being visited (or headed for), and the one last reached, if we haven't left it yet
+        self._waypoint: Optional[int] = None
+        self._reached: Optional[int] = None
+
+        # The path being followed, and whether an obstacle has turned up on it
+        self._path: Set[Cell] = set()
+        self._path_blocked = False
+
+        # Whether the robot is driving between points (as opposed to standing around)
+        self._driving = False
+
+        # The number of waypoints reached
+        self._visits = 0
+
+    @property
+    def waypoint(self) -> Optional[int]:
+        """
+        :return: The index of the waypoint being visited (or headed for), if any
+        """
+        return self._waypoint
+
+    @property
+    def visits(self) -> int:
+        """
+        :return: The number of waypoints reached
+        """
+        return self._visits
+
+    @property
+    def driving(self) -> bool:
+        """
+        :return: True if the robot is driving between points, otherwise False
+        """
+        return self._driving
+
+    async def run(self):
+        """
+        Patrol until told to stop.
+
+        This also returns early if the robot loses its bearings (say, it was
+        picked up), as the route can't be found again until it is back on its
+        charger.
+        """
+
+        robot = self._robot
+        loop = asyncio.get_event_loop()
+        route = self._planner.route
+
+        # Pin the patrol frame down where we stand
+        # Keep a copy, as Cozmo invalidates its own pose objects in place
+        pose = robot.pose
+        self._anchor = Pose(pose.position.x, pose.position.y, pose.position.z,
+                            q0=pose.rotation.q0, q1=pose.rotation.q1, q2=pose.rotation.q2, q3=pose.rotation.q3,
+                            origin_id=pose.origin_id)
+
+        async with self._motion.exclusive():
+            await robot.set_head_angle(PATROL_HEAD_ANGLE).wait_for_completed()
+
+        # Most paths were planned on an earlier patrol, and the rest are planned now
+        await self._planner.prepare(loop.time())
+
+        # Start with the nearest waypoint
+        x, y = self._position()
+        self._waypoint = min(range(len(route)), key=lambda i: math.hypot(route[i][0] - x, route[i][1] - y))
+
+        while self._keep_going():
+            if not robot.pose.is_comparable(self._anchor):
+                print(f'Robot {robot.serial} lost its bearings; giving up on the patrol route')
+                break
+
+            if await self._go_to(self._waypoint):
+                self._visits += 1
+                await self._dwell(self._waypoint)
+            elif self._keep_going():
+                # Give the way a chance to clear (otherwise, if we're boxed in, we'd just plan over and over)
+                await asyncio.sleep(self._retry_delay)
+
+            self._waypoint = (self._waypoint + 1) % len(route)
+
+        self._waypoint = None
+
+    async def _go_to(self, index: int) -> bool:
+        """
+        Go to a waypoint.
+
+        :param index: The waypoint index
+        :return: True if the robot got there, otherwise False
+        """
+
+        loop = asyncio.get_event_loop()
+
+        for _ in range(self._max_replans + 1):
+            # Start from the last waypoint if we're still there, so the kept path can be used
+            # (the robot never stops exactly on the waypoint)
+            if self._reached is not None:
+                start = self._planner.route[self._reached]
+            else:
+                start = self._position()
+
+            path = await self._planner.plan(start, index, loop.time())
+            if path is None:
+                print(f'Robot {self._robot.serial} cannot find a way to waypoint {index}; skipping it')
+                return False
+
+            self._path = swept_cells(path)
+            self._path_blocked = False
+
+            points = [self._planner.grid.center(cell) for cell in path][1:]
+
+            # Drive from corner to corner, facing along the path
+            for i, (x, y) in enumerate(points):
+                if not self._keep_going():
+                    return False
+
+                self._look_for_obstacles()
+                if self._path_blocked:
+                    break
+
+                if i + 1 < len(points):
+                    heading = math.atan2(points[i + 1][1] - y, points[i + 1][0] - x)
+                else:
+                    px, py = self._position()
+                    heading = math.atan2(y - py, x - px)
+
+                # Stop for anyone we meet on the way
+                await self._hold()
+
+                self._reached = None
+
+                if not await self._drive_to(x, y, heading):
+                    # Something's in the way, so mark it and plan around it
+                    self._block_ahead()
+                    break
+            else:
+                self._reached = index
+                return True
+
+        return False
+
+    async def _drive_to(self, x: float, y: float, heading: float) -> bool:
+        """
+        Drive to a point on the route.
+
+        :param x: The x coordinate (mm, in the patrol frame)
+        :param y: The y coordinate (mm, in the patrol frame)
+        :param heading: The heading to arrive with (radians, in the patrol frame)
+        :return: True if the robot got there, otherwise False
+        """
+
+        wx, wy, wheading = self._to_world(x, y, heading)
+        pose = Pose(wx, wy, 0, angle_z=radians(wheading), origin_id=self._anchor.origin_id)
+
+        async with self._motion.exclusive():
+            self._driving = True
+            try:
+                action = self._robot.go_to_pose(pose, num_retries=0)
+                await action.wait_for_completed()
+            finally:
+                self._driving = False
+
+        return not action.has_failed
+
+    async def _dwell(self, index: int):
+        """
+        Stay at a waypoint for a while.
+
+        :param index: The waypoint index
+        """
+
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+
+        dwell = self._heat.dwell_time(index, start, self._base_dwell, self._extra_dwell)
+
+        while self._keep_going():
+            elapsed = loop.time() - start
+
+            # Stay for the dwell time, and then for as long as someone is around (within reason)
+            if elapsed >= dwell and (not self._engaged() or elapsed >= self._max_hold):
+                break
+
+            await asyncio.sleep(0.5)
+
+    async def _hold(self):
+        """
+        Stay put while the robot is busy with someone (within reason).
+        """
+
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+
+        while self._keep_going() and self._engaged() and loop.time() - start < self._max_hold:
+            await asyncio.sleep(0.5)
+
+    def _look_for_obstacles(self):
+        """
+        Mark the objects in view (cubes and such) as obstacles.
+        """
+
+        until = asyncio.get_event_loop().time() + self._obstacle_ttl
+
+        for obj in self._robot.world.visible_objects:
+            if obj.pose is None or not obj.pose.is_comparable(self._anchor):
+                continue
+
+            x, y, _ = self._to_patrol(obj.pose.position.x, obj.pose.position.y, 0)
+            self._block(x, y, 30, until)
+
+    def _block_ahead(self):
+        """
+        Mark the spot right in front of the robot as an obstacle.
+        """
+
+        until = asyncio.get_event_loop().time() + self._obstacle_ttl
+
+        x, y = self._position()
+        _, _, heading = self._to_patrol(0, 0, self._robot.pose.rotation.angle_z.radians)
+
+        self._block(x + 80 * math.cos(heading), y + 80 * math.sin(heading), 40, until)
+
+    def _block(self, x: float, y: float, radius: float, until: float):
+        """
+        Mark an obstacle, noting whether it cuts off the path being followed.
+
+        :param x: The x coordinate of its center (mm, in the patrol frame)
+        :param y: The y coordinate of its center (mm, in the patrol frame)
+        :param radius: Its radius (mm)
+        :param until: When to forget it (seconds)
+        """
+
+        # Don't count the cell we're in, as we're already past that
+        here = self._planner.grid.cell(*self._position())
+
+        cells = self._planner.block(x, y, radius, until)
+        if not cells.isdisjoint(self._path - {here}):
+            self._path_blocked = True
+
+    def _position(self) -> Tuple[float, float]:
+        """
+        :return: The robot's position (mm, in the patrol frame)
+        """
+
+        position = self._robot.pose.position
+        x, y, _ = self._to_patrol(position.x, position.y, 0)
+
+        return x, y
+
+    def _to_world(self, x: float, y: float, heading: float) -> Tuple[float, float, float]:
+        """
+        Convert from the patrol frame to the robot's world.
+
+        :param x: The x coordinate (mm)
+        :param y: The y coordinate (mm)
+        :param heading: The heading (radians)
+        :return: The converted x, y (mm), and heading (radians)
+        """
+
+        ax = self._anchor.position.x
+        ay = self._anchor.position.y
+        a = self._anchor.rotation.angle_z.radians
+
+        return ax + x * math.cos(a) - y * math.sin(a), ay + x * math.sin(a) + y * math.cos(a), heading + a
+
+    def _to_patrol(self, x: float, y: float, heading: float) -> Tuple[float, float, float]:
+        """
+        Convert from the robot's world to the patrol frame.
+
+        :param x: The x coordinate (mm)
+        :param y: The y coordinate (mm)
+        :param heading: The heading (radians)
+        :return: The converted x, y (mm), and heading (radians)
+        """
+
+        dx = x - self._anchor.position.x
+        dy = y - self._anchor.position.y
+        a = self._anchor.rotation.angle_z.radians
+
+        return dx * math.cos(a) + dy * math.sin(a), -dx * math.sin(a) + dy * math.cos(a), heading - a
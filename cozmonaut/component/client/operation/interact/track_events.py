@@ -0,0 +1,199 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+import asyncio
+from collections import deque
+from enum import Enum
+from threading import Lock
+from typing import Callable, Deque, Dict, List, Optional, Union
+
+
+class TrackEventKind(Enum):
+    """
+    A kind of face track event.
+    """
+
+    new = 0  # A new face is being tracked
+    updated = 1  # A tracked face moved
+    lost = 2  # A tracked face is no longer being tracked
+    recognized = 3  # A tracked face was run through recognition
+
+
+class TrackEvent:
+    """
+    An event about a face track.
+    """
+
+    def __init__(self, kind: TrackEventKind, face):
+        self._kind = kind
+        self._face = face
+
+    def __repr__(self):
+        return f'TrackEvent({self._kind.name}, index={self._face.index})'
+
+    @property
+    def kind(self) -> TrackEventKind:
+        """
+        :return: The kind of event
+        """
+        return self._kind
+
+    @property
+    def face(self):
+        """
+        :return: The face (a RecognizedFace for recognized events, otherwise a DetectedFace)
+        """
+        return self._face
+
+    @property
+    def index(self) -> int:
+        """
+        :return: The track index
+        """
+        return self._face.index
+
+
+class TrackEventStream:
+    """
+    An asynchronous stream of face track events.
+
+    Events are published from any thread and delivered to one consumer on an
+    event loop with `call_soon_threadsafe`. Consume the stream with `async for`.
+
+    Updated events are the only high-rate events, so they are where we apply
+    backpressure: at most one updated event per track is pending at a time, and
+    a newer one simply replaces it. The other kinds are never dropped, and they
+    are delivered in order.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, on_close: Callable[['TrackEventStream'], None] = None):
+        self._loop = loop
+        self._on_close = on_close
+
+        # The pending events
+        # Updates are queued as single-item lists, so a newer update can replace an older one in place
+        self._pending: Deque[Union[TrackEvent, List[Optional[TrackEvent]]]] = deque()
+
+        # The pending update slot for each track
+        self._pending_updates: Dict[int, List[Optional[TrackEvent]]] = {}
+
+        # Guards all of the above and the flags below
+        self._lock = Lock()
+
+        # Whether a wakeup is already scheduled on the loop
+        self._wakeup_scheduled = False
+
+        # The future the consumer is waiting on (loop thread only)
+        self._waiter: Optional[asyncio.Future] = None
+
+        # Whether the stream has been closed
+        self._closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> TrackEvent:
+        while True:
+            with self._lock:
+                # Deliver the oldest pending event
+                if self._pending:
+                    entry = self._pending.popleft()
+
+                    if isinstance(entry, list):
+                        # Skip updates that were withdrawn when their track ended
+                        if entry[0] is None:
+                            continue
+
+                        self._pending_updates.pop(entry[0].index, None)
+                        return entry[0]
+
+                    return entry
+
+                # Nothing left and nothing more coming
+                if self._closed:
+                    raise StopAsyncIteration
+
+                # Wait to be woken up by a publisher
+                self._waiter = self._loop.create_future()
+
+            await self._waiter
+
+    @property
+    def pending(self) -> int:
+        """
+        :return: The number of events waiting to be consumed
+        """
+        return len(self._pending)
+
+    def publish(self, event: TrackEvent):
+        """
+        Publish an event to the stream. This may be called from any thread.
+
+        :param event: The event
+        """
+
+        with self._lock:
+            if self._closed:
+                return
+
+            if event.kind == TrackEventKind.updated:
+                # If the track already has an update pending, just refresh it in place
+                slot = self._pending_updates.get(event.index)
+                if slot is not None:
+                    slot[0] = event
+                    return
+
+                slot = [event]
+                self._pending_updates[event.index] = slot
+                self._pending.append(slot)
+            else:
+                # An update queued before a track is lost is stale by the time it would be delivered
+                if event.kind == TrackEventKind.lost:
+                    slot = self._pending_updates.pop(event.index, None)
+                    if slot is not None:
+                        slot[0] = None
+
+                self._pending.append(event)
+
+            # Only one wakeup is needed until the consumer drains the stream
+            if self._wakeup_scheduled:
+                return
+            self._wakeup_scheduled = True
+
+        self._loop.call_soon_threadsafe(self._wakeup)
+
+    def close(self):
+        """
+        Close the stream. This may be called from any thread.
+
+        The consumer gets any events already pending and then stops iterating.
+        """
+
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+
+            wake = not self._wakeup_scheduled
+            self._wakeup_scheduled = True
+
+        if self._on_close is not None:
+            self._on_close(self)
+
+        if wake and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup)
+
+    def _wakeup(self):
+        """
+        Wake up the consumer. This runs on the loop thread.
+        """
+
+        with self._lock:
+            self._wakeup_scheduled = False
+            waiter = self._waiter
+            self._waiter = None
+
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
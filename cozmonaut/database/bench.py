@@ -0,0 +1,101 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+"""
+Throughput benchmark for the friends database.
+
+By default, this runs against a throwaway SQLite database, which stands in
+for the MySQL server. Run it with:
+
+    python -m cozmonaut.database.bench [--rows N] [--threads N] [--url URL]
+
+The query plans of the lookups we depend on are checked by the tests (see
+tests/test_query_plans.py), not here.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures.thread import ThreadPoolExecutor
+
+import numpy
+
+from cozmonaut.database import open_database
+from cozmonaut.database.friends import FriendRepository
+from cozmonaut.database.schema import create_schema
+
+
+def _report(label: str, count: int, seconds: float):
+    print(f'{label:<32} {count:>8} ops in {seconds:7.3f} s = {count / seconds:10.0f} ops/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the friends database')
+    parser.add_argument('--rows', type=int, default=10000, help='number of friends to insert')
+    parser.add_argument('--threads', type=int, default=4, help='number of threads for concurrent lookups')
+    parser.add_argument('--url', help='database URL (defaults to a temporary SQLite database)')
+    args = parser.parse_args()
+
+    tmp_dir = None
+    url = args.url
+    if url is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        url = 'sqlite:///' + os.path.join(tmp_dir.name, 'bench.db')
+
+    db = open_database(url, pool_size=args.threads)
+    create_schema(db)
+    repo = FriendRepository(db)
+
+    rng = numpy.random.RandomState(0)
+    idents = rng.normal(0, 0.1, (args.rows, 128)).astype(numpy.float32)
+
+    # One transaction per insert (what the old per-call commit did)
+    single = min(args.rows, 1000)
+    start = time.perf_counter()
+    for i in range(single):
+        repo.add_friend(f'friend {i}', idents[i])
+    _report('insert (one per transaction)', single, time.perf_counter() - start)
+
+    # Batched inserts
+    start = time.perf_counter()
+    repo.add_friends((f'friend {i}', idents[i]) for i in range(single, args.rows))
+    _report('insert (one transaction)', args.rows - single, time.perf_counter() - start)
+
+    fids = repo.list_friend_ids()
+    lookups = [random.choice(fids) for _ in range(min(args.rows, 5000))]
+
+    # Point lookups on one thread
+    start = time.perf_counter()
+    for fid in lookups:
+        repo.get_friend(fid)
+    _report('lookup (1 thread)', len(lookups), time.perf_counter() - start)
+
+    # Point lookups across the pool
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        list(executor.map(repo.get_friend, lookups))
+    _report(f'lookup ({args.threads} threads)', len(lookups), time.perf_counter() - start)
+
+    # Last-seen updates
+    start = time.perf_counter()
+    for fid in lookups[:1000]:
+        repo.mark_seen(fid)
+    _report('mark seen', min(len(lookups), 1000), time.perf_counter() - start)
+
+    # Full identity load
+    start = time.perf_counter()
+    loaded, _ = repo.load_identities()
+    _report('load identities', len(loaded), time.perf_counter() - start)
+
+    db.close()
+
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,510 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+import base64
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy
+
+from cozmonaut.database import Database
+
+# The current face identity record version
+IDENT_VERSION = 1
+
+# The dtype code for little-endian float32 identities
+IDENT_DTYPE_F4 = 1
+
+# The dimensionality of a face identity
+IDENT_DIM = 128
+
+# The layout of a face identity record in the Ident column
+# This is an 8-byte header followed by the 512-byte identity itself
+IDENT_RECORD = numpy.dtype([
+    ('magic', 'S2'),
+    ('version', 'u1'),
+    ('dtype', 'u1'),
+    ('dim', '<u2'),
+    ('reserved', 'V2'),
+    ('ident', '<f4', (IDENT_DIM,)),
+])
+
+# The magic bytes at the start of every face identity record
+IDENT_MAGIC = b'CF'
+
+
+class Friend:
+    """
+    A friend in the database (a person Cozmo has met).
+    """
+
+    def __init__(self, fid: int, name: str, seen: str, ident: numpy.ndarray = None):
+        self._fid = fid
+        self._name = name
+        self._seen = seen
+        self._ident = ident
+
+    def __repr__(self):
+        return f'Friend(fid={self._fid}, name={self._name!r}, seen={self._seen!r})'
+
+    @property
+    def fid(self) -> int:
+        """
+        :return: The face ID (the Studentid column)
+        """
+        return self._fid
+
+    @property
+    def name(self) -> str:
+        """
+        :return: The name
+        """
+        return self._name
+
+    @property
+    def seen(self) -> str:
+        """
+        :return: The date and time last seen
+        """
+        return self._seen
+
+    @property
+    def ident(self) -> Optional[numpy.ndarray]:
+        """
+        :return: The face identity (128-dimensional vector), if it was loaded
+        """
+        return self._ident
+
+
+class FriendRepository:
+    """
+    Access to the friends (Students) table.
+
+    Every statement is parameterized, and every method runs as exactly one
+    transaction on a pooled connection, so the repository is safe to use from
+    any thread.
+    """
+
+    def __init__(self, db: Database):
+        self._db = db
+
+    def add_friend(self, name: str, ident: Iterable[float]) -> int:
+        """
+        Add a friend.
+
+        :param name: The name
+        :param ident: The face identity (128-dimensional vector)
+        :return: The new face ID
+        """
+
+        return self.add_friends([(name, ident)])[0]
+
+    def add_friends(self, friends: Iterable[Tuple[str, Iterable[float]]]) -> List[int]:
+        """
+        Add many friends in one transaction.
+
+        :param friends: The (name, face identity) pairs
+        :return: The new face IDs, in order
+        """
+
+        fids = []
+
+        with self._db.transaction() as cursor:
+            for name, ident in friends:
+                cursor.execute('INSERT INTO Students (Name, Ident) VALUES (?, ?)', (name, encode_ident(ident)))
+
+                # The new ID comes straight from the insert, so there's no need to look it up again
+                fids.append(cursor.lastrowid)
+
+        return fids
+
+    def get_friend(self, fid: int) -> Optional[Friend]:
+        """
+        Get a friend by face ID.
+
+        :param fid: The face ID
+        :return: The friend, or None if there's no such friend
+        """
+
+        with self._db.transaction() as cursor:
+            cursor.execute('SELECT Studentid, Name, Date_seen, Ident FROM Students WHERE Studentid = ?', (fid,))
+            row = cursor.fetchone()
+
+        if row is None:
+            return None
+
+        return Friend(row[0], row[1], str(row[2]), decode_ident(row[3]) if row[3] is not None else None)
+
+    def mark_seen(self, fid: int, when: datetime = None) -> bool:
+        """
+        Record that a friend was seen.
+
+        :param fid: The face ID
+        :param when: When the friend was seen (defaults to now)
+        :return: True if the friend exists, otherwise False
+        """
+
+        with self._db.transaction() as cursor:
+            cursor.execute('UPDATE Students SET Date_seen = ? WHERE Studentid = ?',
+                           (format_time(when or datetime.now()), fid))
+            return cursor.rowcount > 0
+
+    def mark_seen_many(self, sightings: Iterable[Tuple[int, datetime]]):
+        """
+        Record that many friends were seen, in one transaction.
+
+        :param sightings: The (face ID, when seen) pairs
+        """
+
+        with self._db.transaction() as cursor:
+            cursor.executemany('UPDATE Students SET Date_seen = ? WHERE Studentid = ?',
+                               [(format_time(when), fid) for fid, when in sightings])
+
+    def remove_friend(self, fid: int) -> bool:
+        """
+        Remove a friend.
+
+        :param fid: The face ID
+        :return: True if the friend existed, otherwise False
+        """
+
+        with self._db.transaction() as cursor:
+            cursor.execute('DELETE FROM Students WHERE Studentid = ?', (fid,))
+            return cursor.rowcount > 0
+
+    def iter_friends(self, sort: str = 'id', descending: bool = False, seen_since: datetime = None,
+                     name_prefix: str = None, page_size: int = 1000) -> Iterator[List[Friend]]:
+        """
+        Page through friends.
+
+        Pages are fetched with keyset pagination: each page picks up right after
+        the last row of the one before, using the sort key and the face ID as a
+        tiebreaker. Every page is its own short query, so memory stays flat and
+        the first page arrives right away no matter how many friends there are.
+
+        :param sort: The sort key ('id', 'name', or 'seen')
+        :param descending: True to sort in descending order
+        :param seen_since: Only friends seen at or after this time
+        :param name_prefix: Only friends whose names start with this
+        :param page_size: The number of friends per page
+        :return: An iterator over pages of friends
+        """
+
+        column = SORT_COLUMNS.get(sort)
+        if column is None:
+            raise ValueError(f'Unknown sort key: {sort}')
+
+        order = 'DESC' if descending else 'ASC'
+        after = '<' if descending else '>'
+
+        # The fixed filters
+        filters = []
+        filter_params = []
+
+        if seen_since is not None:
+            filters.append('Date_seen >= ?')
+            filter_params.append(format_time(seen_since))
+
+        if name_prefix:
+            # A range instead of LIKE, so the name index can be used
+            filters.append('Name >= ? AND Name < ?')
+            filter_params.extend((name_prefix, name_prefix[:-1] + chr(ord(name_prefix[-1]) + 1)))
+
+        # Where the last page left off
+        last = None
+
+        while True:
+            conditions = list(filters)
+            params = list(filter_params)
+
+            if last is not None:
+                last_key, last_fid = last
+                if column == 'Studentid':
+                    conditions.append(f'Studentid {after} ?')
+                    params.append(last_fid)
+                else:
+                    conditions.append(f'({column} {after} ? OR ({column} = ? AND Studentid {after} ?))')
+                    params.extend((last_key, last_key, last_fid))
+
+            where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+            order_by = f'{column} {order}' if column == 'Studentid' else f'{column} {order}, Studentid {order}'
+
+            with self._db.transaction() as cursor:
+                cursor.execute(f'SELECT Studentid, Name, Date_seen FROM Students {where} '
+                               f'ORDER BY {order_by} LIMIT ?', params + [page_size])
+                rows = cursor.fetchall()
+
+            if not rows:
+                return
+
+            yield [Friend(fid, name, str(seen)) for fid, name, seen in rows]
+
+            if len(rows) < page_size:
+                return
+
+            # Remember the sort key of the last row in its raw form
+            fid, name, seen = rows[-1]
+            last = ({'Studentid': fid, 'Name': name, 'Date_seen': seen}[column], fid)
+
+    def remove_friends(self, fids: Sequence[int]) -> int:
+        """
+        Remove many friends in one transaction.
+
+        Running trackers learn about the removals through the change log.
+
+        :param fids: The face IDs
+        :return: The number of friends that existed and were removed
+        """
+
+        if not fids:
+            return 0
+
+        with self._db.transaction() as cursor:
+            cursor.execute(f'DELETE FROM Students WHERE Studentid IN ({", ".join("?" * len(fids))})', tuple(fids))
+            return cursor.rowcount
+
+    def stale_friend_ids(self, seen_before: datetime, limit: int = 1000) -> List[int]:
+        """
+        Find friends not seen since some time, longest unseen first.
+
+        :param seen_before: The cutoff time
+        :param limit: The maximum number of face IDs to return
+        :return: The face IDs
+        """
+
+        with self._db.transaction() as cursor:
+            cursor.execute('SELECT Studentid FROM Students WHERE Date_seen < ? ORDER BY Date_seen LIMIT ?',
+                           (format_time(seen_before), limit))
+            return [row[0] for row in cursor.fetchall()]
+
+    def list_friend_ids(self) -> List[int]:
+        """
+        :return: The face IDs of all friends
+        """
+
+        with self._db.transaction() as cursor:
+            cursor.execute('SELECT Studentid FROM Students ORDER BY Studentid')
+            return [row[0] for row in cursor.fetchall()]
+
+    def load_identities(self, batch_size: int = 10000) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        Load the face identities of all friends.
+
+        Rows are streamed in large batches (on MySQL, the prepared statement
+        cursor reads rows off the server as we go instead of buffering the whole
+        result), and each batch is decoded straight into a preallocated matrix,
+        so the gallery is built in one pass.
+
+        :param batch_size: The number of rows to fetch at a time
+        :return: The face IDs and an N-by-128 float32 matrix of the matching face identities
+        """
+
+        with self._db.transaction() as cursor:
+            # Size the matrix up front
+            # The count is only a hint: on SQLite, a bare SELECT opens no transaction, so the two statements don't
+            # share a snapshot and rows may come and go in between (the loop below copes with either)
+            cursor.execute('SELECT COUNT(*) FROM Students WHERE Ident IS NOT NULL')
+            capacity = cursor.fetchall()[0][0]
+
+            fids = numpy.empty(capacity, numpy.int64)
+            idents = numpy.empty((capacity, IDENT_DIM), numpy.float32)
+            count = 0
+
+            cursor.execute('SELECT Studentid, Ident FROM Students WHERE Ident IS NOT NULL')
+
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+
+                # Grow if rows showed up after the count
+                end = count + len(rows)
+                if end > capacity:
+                    capacity = max(end, capacity * 2)
+                    fids = numpy.resize(fids, capacity)
+                    idents = numpy.resize(idents, (capacity, IDENT_DIM))
+
+                fids[count:end] = [row[0] for row in rows]
+                idents[count:end] = decode_idents([row[1] for row in rows])
+                count = end
+
+        return fids[:count], idents[:count]
+
+    def change_version(self) -> int:
+        """
+        :return: The version of the latest logged change to the face identities (0 if none)
+        """
+
+        with self._db.transaction() as cursor:
+            cursor.execute('SELECT MAX(Version) FROM FriendChanges')
+            return cursor.fetchall()[0][0] or 0
+
+    def change_horizon(self) -> int:
+        """
+        :return: The version the change log has been pruned up to (0 if never)
+        """
+
+        with self._db.transaction() as cursor:
+            cursor.execute('SELECT MIN(Version) FROM FriendChanges')
+            oldest = cursor.fetchall()[0][0]
+
+        return oldest - 1 if oldest is not None else 0
+
+    def changes_since(self, version: int, missing: Sequence[int] = (),
+                      limit: int = 10000) -> Tuple[List[int], Dict[int, Optional[numpy.ndarray]]]:
+        """
+        Get the changes to the face identities since some version.
+
+        Changes are collapsed to the current state of each changed friend, so
+        applying them is idempotent.
+
+        Versions are handed out when a change is made but show up in the log
+        when its transaction commits, which need not be in the same order. The
+        caller can ask again for versions it found missing earlier.
+
+        :param version: The version last seen
+        :param missing: Versions at or below that one to look for again
+        :param limit: The maximum number of logged changes to read
+        :return: The versions read, in order, and the current face identity of each changed friend (None if removed)
+        """
+
+        select = ('SELECT c.Version, c.Studentid, s.Ident FROM FriendChanges c '
+                  'LEFT JOIN Students s ON s.Studentid = c.Studentid ')
+
+        sql = select + 'WHERE c.Version > ?'
+        params = [version]
+
+        # Look the missing versions up on their own, as an OR with the range above makes SQLite scan the whole log
+        if missing:
+            sql += f' UNION ALL {select}WHERE c.Version IN ({", ".join("?" * len(missing))})'
+            params.extend(missing)
+
+        with self._db.transaction() as cursor:
+            cursor.execute(f'{sql} ORDER BY 1 LIMIT ?', params + [limit])
+            rows = cursor.fetchall()
+
+        versions = []
+        changes = {}
+        for row_version, fid, ident in rows:
+            versions.append(row_version)
+            changes[fid] = decode_ident(ident) if ident is not None else None
+
+        return versions, changes
+
+    def prune_changes(self, keep: int = 100000) -> int:
+        """
+        Forget all but the latest logged changes.
+
+        A host that falls further behind than this has to reload every face
+        instead of catching up from the log.
+
+        :param keep: The number of latest changes to keep
+        :return: The number of changes forgotten
+        """
+
+        with self._db.transaction() as cursor:
+            cursor.execute('SELECT MAX(Version) FROM FriendChanges')
+            latest = cursor.fetchall()[0][0]
+            if latest is None:
+                return 0
+
+            cursor.execute('DELETE FROM FriendChanges WHERE Version <= ?', (latest - max(keep, 1),))
+            return cursor.rowcount
+
+
+# The columns friends can be sorted by
+SORT_COLUMNS = {
+    'id': 'Studentid',
+    'name': 'Name',
+    'seen': 'Date_seen',
+}
+
+
+def encode_ident(ident: Iterable[float]) -> bytes:
+    """
+    Encode a face identity for the Ident column.
+
+    :param ident: The face identity (128-dimensional vector)
+    :return: The face identity record
+    """
+
+    record = numpy.zeros(1, IDENT_RECORD)
+    record['magic'] = IDENT_MAGIC
+    record['version'] = IDENT_VERSION
+    record['dtype'] = IDENT_DTYPE_F4
+    record['dim'] = IDENT_DIM
+    record['ident'] = numpy.asarray(ident, dtype=numpy.float32).reshape(IDENT_DIM)
+    return record.tobytes()
+
+
+def decode_ident(blob) -> numpy.ndarray:
+    """
+    Decode a face identity from the Ident column.
+
+    :param blob: The face identity record
+    :return: The face identity (128-dimensional vector)
+    """
+
+    return decode_idents([blob])[0]
+
+
+def decode_idents(blobs: Sequence) -> numpy.ndarray:
+    """
+    Decode a batch of face identities from the Ident column.
+
+    The records are joined and viewed in place with one `numpy.frombuffer`,
+    so there's no per-row parsing.
+
+    :param blobs: The face identity records
+    :return: An N-by-128 float32 matrix of the face identities
+    :raises ValueError: If any record is malformed
+    """
+
+    data = b''.join(blobs)
+
+    if len(data) != len(blobs) * IDENT_RECORD.itemsize:
+        raise ValueError('Face identity records have the wrong size')
+
+    records = numpy.frombuffer(data, dtype=IDENT_RECORD)
+
+    # Check all the headers at once
+    if (numpy.any(records['magic'] != IDENT_MAGIC) or numpy.any(records['version'] != IDENT_VERSION)
+            or numpy.any(records['dtype'] != IDENT_DTYPE_F4) or numpy.any(records['dim'] != IDENT_DIM)):
+        raise ValueError('Face identity records have an unsupported header')
+
+    return records['ident']
+
+
+def decode_ident_text(text) -> Optional[numpy.ndarray]:
+    """
+    Decode a face identity from the legacy Image column.
+
+    :param text: The Base64 text of the identity as little-endian float32
+    :return: The face identity (128-dimensional vector), or None if the text isn't one
+    """
+
+    if isinstance(text, (bytes, bytearray)):
+        text = text.decode('ascii', errors='replace')
+
+    try:
+        data = base64.b64decode(text, validate=True)
+    except ValueError:
+        return None
+
+    if len(data) != IDENT_DIM * 4:
+        return None
+
+    return numpy.frombuffer(data, dtype='<f4')
+
+
+def format_time(when: datetime) -> str:
+    """
+    Format a date and time for a DATETIME column.
+
+    :param when: The date and time
+    :return: The formatted date and time
+    """
+
+    return when.strftime('%Y-%m-%d %H:%M:%S')
@@ -0,0 +1,293 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+from typing import List
+
+from cozmonaut.database import Database, SQLITE
+from cozmonaut.database.friends import decode_ident_text, encode_ident
+
+
+def create_schema(db: Database) -> int:
+    """
+    Create the friends tables, or bring existing ones up to date.
+
+    The layout starts from the original Students table (with identities as
+    Base64 Image text), so the same code runs against the real MySQL server
+    and a local SQLite stand-in.
+    From there, the schema evolves through the numbered migrations below. The
+    database records the last migration applied, so each runs exactly once.
+
+    :param db: The database
+    :return: The schema version
+    """
+
+    with db.transaction(prepared=False) as cursor:
+        cursor.execute('CREATE TABLE IF NOT EXISTS SchemaVersion (Version int NOT NULL)')
+        cursor.execute('SELECT Version FROM SchemaVersion')
+        row = cursor.fetchone()
+
+        if row is None:
+            cursor.execute('INSERT INTO SchemaVersion (Version) VALUES (0)')
+
+    version = row[0] if row is not None else 0
+
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        print(f'Migrating friends database to schema version {number}: {migration.__doc__.strip().splitlines()[0]}')
+        migration(db)
+
+        with db.transaction() as cursor:
+            cursor.execute('UPDATE SchemaVersion SET Version = ?', (number,))
+
+    return len(MIGRATIONS)
+
+
+def _migrate_students(db: Database):
+    """
+    Create the Students table.
+
+    This is the original layout. It is skipped for a table that predates
+    schema versions.
+    """
+
+    d = db.dialect
+
+    with db.transaction(prepared=False) as cursor:
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS Students (
+                Studentid {d.auto_increment},
+                Name varchar(255) NOT NULL,
+                Image text NOT NULL,
+                Date_seen DATETIME NOT NULL DEFAULT {d.now}
+            )
+        ''')
+
+
+def _migrate_idents(db: Database):
+    """
+    Store face identities as binary records.
+
+    See migrate_image_column.
+    """
+
+    migrate_image_column(db)
+
+
+def _migrate_change_log(db: Database):
+    """
+    Log changes to the face identities.
+
+    Every insert, delete, or new identity for an existing friend is logged to
+    the FriendChanges table by triggers, so running hosts can pull just the
+    changes since they last looked, no matter who made them.
+    """
+
+    d = db.dialect
+
+    with db.transaction(prepared=False) as cursor:
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS FriendChanges (
+                Version {d.auto_increment},
+                Studentid int NOT NULL
+            )
+        ''')
+
+    _create_change_triggers(db)
+
+
+def _migrate_indexes(db: Database):
+    """
+    Index Students by name and by date last seen.
+
+    Name lookups and prefix searches, as well as "seen since" and recency
+    queries, would otherwise scan the whole table.
+    """
+
+    with db.transaction(prepared=False) as cursor:
+        if db.dialect is SQLITE:
+            cursor.execute('CREATE INDEX IF NOT EXISTS Students_name ON Students (Name)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS Students_seen ON Students (Date_seen)')
+            return
+
+        # MySQL has no CREATE INDEX IF NOT EXISTS, and python/tableSQL.txt creates these up front
+        cursor.execute("SELECT INDEX_NAME FROM information_schema.STATISTICS "
+                       "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Students'")
+        existing = {row[0] for row in cursor.fetchall()}
+
+        if 'Students_name' not in existing:
+            cursor.execute('CREATE INDEX Students_name ON Students (Name)')
+        if 'Students_seen' not in existing:
+            cursor.execute('CREATE INDEX Students_seen ON Students (Date_seen)')
+
+
+# The schema migrations, in order
+# Never change or reorder these once shipped; add new ones to the end
+# They also tolerate databases created before schema versions were tracked
+MIGRATIONS = [
+    _migrate_students,
+    _migrate_idents,
+    _migrate_change_log,
+    _migrate_indexes,
+]
+
+
+def migrate_image_column(db: Database, batch_size: int = 1000) -> int:
+    """
+    Migrate face identities from the Base64 Image column to the Ident column.
+
+    Rows whose Image text is not a face identity are left with no identity,
+    and their face IDs are logged. The Image column is dropped afterward, but
+    only if every row converted. Otherwise it is kept (and made optional, so
+    new friends can be added without it) until someone sorts those rows out.
+
+    :param db: The database
+    :param batch_size: The number of rows to convert per transaction
+    :return: The number of rows converted
+    """
+
+    columns = table_columns(db, 'Students')
+    if 'Image' not in columns:
+        return 0
+
+    if 'Ident' not in columns:
+        with db.transaction(prepared=False) as cursor:
+            cursor.execute('ALTER TABLE Students ADD COLUMN Ident blob')
+
+    converted = 0
+    failed = []
+    last_fid = -1
+
+    while True:
+        with db.transaction() as cursor:
+            # Walk the table in key order, one batch per transaction
+            cursor.execute('SELECT Studentid, Image FROM Students WHERE Studentid > ? ORDER BY Studentid LIMIT ?',
+                           (last_fid, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            updates = []
+            for fid, image in rows:
+                ident = decode_ident_text(image)
+                if ident is None:
+                    failed.append(fid)
+                else:
+                    updates.append((encode_ident(ident), fid))
+
+            cursor.executemany('UPDATE Students SET Ident = ? WHERE Studentid = ?', updates)
+
+            converted += len(updates)
+            last_fid = rows[-1][0]
+
+    print(f'Migrated {converted} face identities to binary')
+
+    if failed:
+        print(f'Keeping the Image column, as {len(failed)} rows had no usable identity in it '
+              f'(face IDs {", ".join(str(fid) for fid in failed)})')
+        _relax_image_column(db)
+    else:
+        with db.transaction(prepared=False) as cursor:
+            cursor.execute('ALTER TABLE Students DROP COLUMN Image')
+
+    return converted
+
+
+def _relax_image_column(db: Database):
+    """
+    Let new rows leave out the Image column.
+
+    :param db: The database
+    """
+
+    d = db.dialect
+
+    with db.transaction(prepared=False) as cursor:
+        if d is not SQLITE:
+            cursor.execute('ALTER TABLE Students MODIFY Image text NULL')
+            return
+
+        # SQLite can't change a column's constraints, so rebuild the table
+        # Nothing else (no triggers or indexes) hangs off it yet at this point in the migrations
+        cursor.execute(f'''
+            CREATE TABLE Students_relaxed (
+                Studentid {d.auto_increment},
+                Name varchar(255) NOT NULL,
+                Image text,
+                Date_seen DATETIME NOT NULL DEFAULT {d.now},
+                Ident blob
+            )
+        ''')
+        cursor.execute('INSERT INTO Students_relaxed (Studentid, Name, Image, Date_seen, Ident) '
+                       'SELECT Studentid, Name, Image, Date_seen, Ident FROM Students')
+        cursor.execute('DROP TABLE Students')
+        cursor.execute('ALTER TABLE Students_relaxed RENAME TO Students')
+
+
+def _create_change_triggers(db: Database):
+    """
+    Create the triggers that log changes to the FriendChanges table.
+
+    :param db: The database
+    """
+
+    with db.transaction(prepared=False) as cursor:
+        if db.dialect is SQLITE:
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS Students_added AFTER INSERT ON Students
+                BEGIN
+                    INSERT INTO FriendChanges (Studentid) VALUES (NEW.Studentid);
+                END
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS Students_changed AFTER UPDATE OF Ident ON Students
+                BEGIN
+                    INSERT INTO FriendChanges (Studentid) VALUES (NEW.Studentid);
+                END
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS Students_removed AFTER DELETE ON Students
+                BEGIN
+                    INSERT INTO FriendChanges (Studentid) VALUES (OLD.Studentid);
+                END
+            ''')
+            return
+
+        # MySQL has no CREATE TRIGGER IF NOT EXISTS (at least not before 8.0.29)
+        cursor.execute('SELECT TRIGGER_NAME FROM information_schema.TRIGGERS WHERE TRIGGER_SCHEMA = DATABASE()')
+        existing = {row[0] for row in cursor.fetchall()}
+
+        if 'Students_added' not in existing:
+            cursor.execute('''
+                CREATE TRIGGER Students_added AFTER INSERT ON Students FOR EACH ROW
+                INSERT INTO FriendChanges (Studentid) VALUES (NEW.Studentid)
+            ''')
+        if 'Students_changed' not in existing:
+            cursor.execute('''
+                CREATE TRIGGER Students_changed AFTER UPDATE ON Students FOR EACH ROW
+                INSERT INTO FriendChanges (Studentid) SELECT NEW.Studentid FROM DUAL WHERE NOT (NEW.Ident <=> OLD.Ident)
+            ''')
+        if 'Students_removed' not in existing:
+            cursor.execute('''
+                CREATE TRIGGER Students_removed AFTER DELETE ON Students FOR EACH ROW
+                INSERT INTO FriendChanges (Studentid) VALUES (OLD.Studentid)
+            ''')
+
+
+def table_columns(db: Database, table: str) -> List[str]:
+    """
+    List the columns of a table.
+
+    :param db: The database
+    :param table: The table name
+    :return: The column names
+    """
+
+    with db.transaction() as cursor:
+        if db.dialect is SQLITE:
+            cursor.execute(f'PRAGMA table_info({table})')
+            return [row[1] for row in cursor.fetchall()]
+
+        cursor.execute('SELECT COLUMN_NAME FROM information_schema.COLUMNS '
+                       'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = ?', (table,))
+        return [row[0] for row in cursor.fetchall()]
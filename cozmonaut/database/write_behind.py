@@ -0,0 +1,123 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+import asyncio
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+from cozmonaut.database.friends import FriendRepository
+
+
+class WriteBehind:
+    """
+    A write-behind queue for friend updates.
+
+    Recognizing a face should not wait on the database, so sightings and new
+    enrollments are queued here and written in batches on an interval (and one
+    last time when the queue is closed). Sightings of the same friend between
+    flushes coalesce into one update with the latest time.
+
+    All methods must be called on the loop thread. The actual database work
+    happens on the loop's default executor.
+    """
+
+    def __init__(self, friends: FriendRepository, interval: float = 2):
+        """
+        :param friends: The friends repository
+        :param interval: The time between flushes (seconds)
+        """
+
+        self._friends = friends
+        self._interval = interval
+
+        # The latest pending sighting of each friend
+        self._seen: Dict[int, datetime] = {}
+
+        # The pending enrollments and the futures waiting on their face IDs
+        self._enrollments: List[Tuple[str, Iterable[float], asyncio.Future]] = []
+
+        # Keeps flushes from overlapping
+        # This is created on first use, so it binds to the loop we actually run on
+        self._flush_lock = None
+
+        # Whether the queue has been closed
+        self._closed = False
+
+    def mark_seen(self, fid: int, when: datetime = None):
+        """
+        Queue a sighting of a friend.
+
+        :param fid: The face ID
+        :param when: When the friend was seen (defaults to now)
+        """
+
+        self._seen[fid] = when or datetime.now()
+
+    def enroll(self, name: str, ident: Iterable[float]) -> asyncio.Future:
+        """
+        Queue the enrollment of a new friend.
+
+        :param name: The name
+        :param ident: The face identity (128-dimensional vector)
+        :return: A future for the new face ID
+        """
+
+        if self._closed:
+            raise RuntimeError('Write-behind queue is closed')
+
+        future = asyncio.get_event_loop().create_future()
+        self._enrollments.append((name, ident, future))
+        return future
+
+    async def run(self):
+        """
+        Flush on an interval until the queue is closed.
+        """
+
+        while not self._closed:
+            await asyncio.sleep(self._interval)
+            await self.flush()
+
+    async def flush(self):
+        """
+        Write out everything queued so far.
+        """
+
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        async with self._flush_lock:
+            # Take everything pending; anything queued from here on goes in the next batch
+            seen, self._seen = self._seen, {}
+            enrollments, self._enrollments = self._enrollments, []
+
+            loop = asyncio.get_event_loop()
+
+            if enrollments:
+                try:
+                    fids = await loop.run_in_executor(None, self._friends.add_friends,
+                                                      [(name, ident) for name, ident, _ in enrollments])
+                except Exception as e:
+                    for _, _, future in enrollments:
+                        if not future.done():
+                            future.set_exception(e)
+                else:
+                    for (_, _, future), fid in zip(enrollments, fids):
+                        if not future.done():
+                            future.set_result(fid)
+
+            if seen:
+                try:
+                    await loop.run_in_executor(None, self._friends.mark_seen_many, list(seen.items()))
+                except Exception as e:
+                    print(f'Failed to record {len(seen)} sightings: {e!r}')
+
+    async def close(self):
+        """
+        Stop flushing on an interval and write out whatever is left.
+        """
+
+        self._closed = True
+        await self.flush()
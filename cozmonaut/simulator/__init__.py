@@ -0,0 +1,4 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
@@ -0,0 +1,198 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+"""
+Docking and patrol benchmarks on the kinematic simulator.
+
+Each docking trial drops a simulated robot somewhere in front of its charger
+and has it dock, all on virtual time, so thousands of dockings take seconds.
+Run it with:
+
+    python -m cozmonaut.simulator.bench [--trials N] [--seed N] [--warm] [--verbose]
+
+With --warm, the robot starts out having seen its charger (as after leaving
+it to go on patrol), so its charger pose cache is put to use.
+
+With --patrol, each trial instead has a robot patrol the default route for a
+while, with cubes (which it can see) and other obstacles (which it only finds
+by running into them) scattered along the way. Path planning runs in the
+loop's executor, just like on the real robots.
+"""
+
+import argparse
+import contextlib
+import math
+import os
+import random
+import time
+
+from cozmo.util import Pose, radians
+
+from cozmonaut.component.client.operation.interact.charger_cache import ChargerPoseCache
+from cozmonaut.component.client.operation.interact.docking import ChargerDocking, DockingStats
+from cozmonaut.component.client.operation.interact.patrol import (DEFAULT_ROUTE, FaceHeatMap, RoutePlanner,
+                                                                   WaypointPatrol)
+from cozmonaut.simulator.loop import VirtualTimeLoop
+from cozmonaut.simulator.robot import SimRobot
+
+
+async def _leave_charger(robot: SimRobot, cache: ChargerPoseCache, x: float, y: float, theta: float):
+    """
+    Take a good look at the charger and then drive off somewhere, as a robot on patrol would.
+    """
+
+    charger = await robot.world.wait_for_observed_charger(timeout=5)
+    cache.remember(charger.pose, robot.loop.time())
+
+    goal = Pose(x, y, 0, angle_z=radians(theta), origin_id=robot.pose.origin_id)
+    await robot.go_to_pose(goal).wait_for_completed()
+
+
+def _trial(seed: int, stats: DockingStats, warm: bool):
+    """
+    Run one docking trial.
+
+    :param seed: The random seed
+    :param stats: The statistics to record to
+    :param warm: True to start out having seen the charger
+    :return: The outcome and the true final pose
+    """
+
+    rng = random.Random(seed)
+    loop = VirtualTimeLoop()
+
+    # Start somewhere in front of the charger (where its marker can be made out), facing any which way
+    distance = rng.uniform(200, 600)
+    bearing = rng.uniform(-math.pi / 3, math.pi / 3)
+    x = -distance * math.cos(bearing)
+    y = distance * math.sin(bearing)
+    theta = rng.uniform(-math.pi, math.pi)
+
+    cache = ChargerPoseCache()
+
+    if warm:
+        # Start 150 mm out from the charger, facing it, and drive off from there
+        robot = SimRobot(loop, rng, start=(-150, 0, 0))
+        loop.run_until_complete(_leave_charger(robot, cache, robot.pose.position.x + x + 150,
+                                               robot.pose.position.y + y, theta))
+    else:
+        robot = SimRobot(loop, rng, start=(x, y, theta))
+
+    docking = ChargerDocking(robot, stats, cache)
+    outcome = loop.run_until_complete(docking.dock())
+    loop.close()
+
+    return outcome, robot.true_pose, cache
+
+
+def _patrol_trial(seed: int, duration: float):
+    """
+    Run one patrol trial.
+
+    :param seed: The random seed
+    :param duration: How long to patrol (seconds)
+    :return: The number of waypoints reached, the number of times the robot ran into something, and the planner
+    """
+
+    rng = random.Random(seed)
+    loop = VirtualTimeLoop()
+
+    # The robot has just driven off its charger, and faces away from it
+    start = (-60, 0, math.pi)
+
+    # Scatter obstacles along the legs of the route (the route is laid out facing away from the charger)
+    obstacles = []
+    for _ in range(rng.randint(1, 4)):
+        leg = rng.randrange(len(DEFAULT_ROUTE))
+        (x0, y0), (x1, y1) = DEFAULT_ROUTE[leg - 1], DEFAULT_ROUTE[leg]
+        f = rng.uniform(0.3, 0.7)
+        x = x0 + f * (x1 - x0) + rng.gauss(0, 40)
+        y = y0 + f * (y1 - y0) + rng.gauss(0, 40)
+        obstacles.append((start[0] - x, start[1] - y, rng.uniform(20, 40), rng.random() < 0.5))
+
+    robot = SimRobot(loop, rng, start=start, obstacles=obstacles)
+    planner = RoutePlanner(DEFAULT_ROUTE)
+    heat = FaceHeatMap(len(DEFAULT_ROUTE))
+
+    end = loop.time() + duration
+    patrol = WaypointPatrol(robot, planner, heat, lambda: loop.time() < end, lambda: False)
+
+    loop.run_until_complete(patrol.run())
+    loop.close()
+
+    return patrol.visits, robot.bumps, planner
+
+
+def _patrol_bench(args):
+    """
+    Run the patrol benchmark.
+
+    :param args: The command-line arguments
+    """
+
+    reached = 0
+    bumps = 0
+    plans = 0
+    planner = None
+
+    start = time.perf_counter()
+
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull):
+            for seed in range(args.seed, args.seed + args.trials):
+                trial_reached, trial_bumps, planner = _patrol_trial(seed, args.patrol_time)
+
+                reached += trial_reached
+                bumps += trial_bumps
+                plans += planner.plans
+
+    elapsed = time.perf_counter() - start
+    virtual_time = args.trials * args.patrol_time
+
+    print(f'{args.trials} patrols: {reached} waypoints reached, ran into something {bumps} times, '
+          f'{plans} paths planned')
+    print(f'Last trial: {planner.summary()}')
+    print(f'Simulated {virtual_time:.0f} s of patrol in {elapsed:.1f} s ({virtual_time / elapsed:.0f}x real time)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark docking (or patrol) on the kinematic simulator')
+    parser.add_argument('--trials', type=int, default=1000, help='number of dockings (or patrols)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for the first trial')
+    parser.add_argument('--warm', action='store_true', help='start out having seen the charger')
+    parser.add_argument('--verbose', action='store_true', help='show what the docking code prints')
+    parser.add_argument('--patrol', action='store_true', help='benchmark patrols instead of dockings')
+    parser.add_argument('--patrol-time', type=float, default=300, help='how long each patrol lasts (seconds)')
+    args = parser.parse_args()
+
+    if args.patrol:
+        _patrol_bench(args)
+        return
+
+    stats = DockingStats()
+    hits = 0
+    lookups = 0
+    virtual_time = 0.0
+
+    start = time.perf_counter()
+
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull):
+            for seed in range(args.seed, args.seed + args.trials):
+                outcome, _, cache = _trial(seed, stats, args.warm)
+
+                virtual_time += outcome.duration
+                hits += cache.hits
+                lookups += cache.hits + cache.misses
+
+    elapsed = time.perf_counter() - start
+
+    print(stats.summary())
+    print(f'Charger pose reused for {hits} of {lookups} lookups')
+    print(f'Simulated {virtual_time:.0f} s of docking in {elapsed:.1f} s ({virtual_time / elapsed:.0f}x real time)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+import asyncio
+import selectors
+
+
+class _VirtualSelector(selectors.SelectSelector):
+    """
+    A selector that never waits.
+
+    Where a real selector would block until the next timer is due, this one
+    moves the loop's clock forward to that timer instead.
+    """
+
+    def __init__(self, loop: 'VirtualTimeLoop'):
+        super().__init__()
+        self._loop = loop
+
+    def select(self, timeout=None):
+        if self._loop.executor_busy and timeout != 0:
+            # Wait (in real time) for the other threads, as if their work took no time at all
+            return super().select(None)
+
+        if timeout is None:
+            # Nothing is ready and nothing is scheduled, so nothing ever will be
+            raise RuntimeError('Simulation stalled with nothing left to run')
+
+        if timeout > 0:
+            self._loop.advance(timeout)
+
+        return super().select(0)
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """
+    An event loop that runs on virtual time.
+
+    Time passes only when every coroutine is waiting, and then it jumps straight
+    to the next scheduled wakeup. Code written for a real loop (sleeps, timeouts,
+    and loop.time()) runs unchanged, only as fast as the CPU allows.
+
+    Only timers drive the clock, so this is for simulations; it doesn't wait
+    for sockets. Work handed to an executor is waited for, but it takes no
+    virtual time.
+    """
+
+    def __init__(self):
+        self._virtual_time = 0.0
+        self._executor_jobs = 0
+        super().__init__(selector=_VirtualSelector(self))
+
+    @property
+    def executor_busy(self) -> bool:
+        """
+        :return: True if work handed to an executor is still running, otherwise False
+        """
+        return self._executor_jobs > 0
+
+    def run_in_executor(self, executor, func, *args):
+        self._executor_jobs += 1
+
+        future = super().run_in_executor(executor, func, *args)
+        future.add_done_callback(self._on_executor_job_done)
+
+        return future
+
+    def _on_executor_job_done(self, future: asyncio.Future):
+        self._executor_jobs -= 1
+
+    def time(self) -> float:
+        """
+        :return: The virtual time (seconds)
+        """
+        return self._virtual_time
+
+    def advance(self, seconds: float):
+        """
+        Move the clock forward.
+
+        :param seconds: The time to skip (seconds)
+        """
+
+        self._virtual_time += seconds
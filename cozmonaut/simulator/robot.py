@@ -0,0 +1,1023 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+import asyncio
+import math
+import random
+from typing import Awaitable, List, Optional, Sequence, Set, Tuple
+
+import cozmo
+from cozmo.util import Angle, Pose, radians
+
+# The distance between the treads (mm)
+TRACK_WIDTH = 46
+
+# The distance from the robot's center to its front and rear wheels (mm)
+HALF_LENGTH = 30
+
+# How close the robot's center can get to an obstacle's edge (mm)
+BODY_RADIUS = 35
+
+# The charger, measured along its axis from the lip of its ramp (mm)
+# A robot docks by backing up the ramp until it touches the contacts at the back
+CHARGER_DEPTH = 100
+CHARGER_HALF_WIDTH = 35
+CONTACTS = (50, 70)  # The robot center positions at which it touches the contacts
+
+# How far off a robot can be and still back up onto the ramp (mm and radians)
+CLIMB_LATERAL_TOL = 10
+CLIMB_ANGLE_TOL = math.radians(10)
+
+# The robot pitch with only its rear wheels on the ramp, and when riding up the charger's wall (degrees)
+CLIMB_PITCH = 12
+WALL_PITCH = 25
+
+# The camera's horizontal field of view (radians) and the range at which it can make out the charger (mm)
+CAMERA_FOV = math.radians(58)
+CAMERA_RANGE = (60, 800)
+
+# The range at which the camera can make out a cube (mm)
+CUBE_RANGE = (60, 600)
+
+# The camera frame rate and the robot state update rate (Hz)
+VISION_RATE = 15
+STATE_RATE = 30
+
+# The physics time step (seconds)
+TIME_STEP = 0.02
+
+# Battery voltages (volts) and rates (volts per second)
+FULL_VOLTAGE = 4.2
+DRAIN_IDLE = 0.00005
+DRAIN_MOVING = 0.0004
+CHARGE_RATE = 0.002
+
+
+def _clip_angle(angle: float) -> float:
+    """
+    :param angle: The angle (radians)
+    :return: The equivalent angle in [-pi, pi] (radians)
+    """
+    return math.atan2(math.sin(angle), math.cos(angle))
+
+
+def _arc(x: float, y: float, theta: float, v: float, w: float, dt: float) -> Tuple[float, float, float]:
+    """
+    Move along an arc at constant speed and turn rate.
+
+    :param x: The starting x (mm)
+    :param y: The starting y (mm)
+    :param theta: The starting heading (radians)
+    :param v: The speed (mm/s)
+    :param w: The turn rate (radians per second)
+    :param dt: The time (seconds)
+    :return: The final x, y, and heading
+    """
+
+    if math.fabs(w) < 1e-9:
+        return x + v * math.cos(theta) * dt, y + v * math.sin(theta) * dt, theta
+
+    end = theta + w * dt
+    r = v / w
+    return x + r * (math.sin(end) - math.sin(theta)), y - r * (math.cos(end) - math.cos(theta)), _clip_angle(end)
+
+
+class SimEvent:
+    """
+    A simulated event.
+
+    This just carries whatever attributes the real event would.
+    """
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class SimAction:
+    """
+    A simulated robot action.
+
+    Like with the real robot, an action can only be started while another is
+    going if it is run in parallel. Otherwise, RobotBusy is raised.
+    """
+
+    def __init__(self, robot: 'SimRobot', coro: Awaitable[bool], in_parallel: bool = False):
+        """
+        :param robot: The robot
+        :param coro: The coroutine carrying out the action (returns False on failure)
+        :param in_parallel: True to run alongside whatever else is going
+        :raises cozmo.exceptions.RobotBusy: If another action is going and this one isn't in parallel
+        """
+
+        if robot._actions and not in_parallel:
+            coro.close()
+            raise cozmo.exceptions.RobotBusy(f'Robot is already performing {len(robot._actions)} action(s)')
+
+        self._robot = robot
+        self._task = asyncio.ensure_future(coro, loop=robot.loop)
+        self._task.add_done_callback(lambda _: robot._actions.discard(self))
+
+        robot._actions.add(self)
+
+    @property
+    def is_running(self) -> bool:
+        """
+        :return: True if the action is still going, otherwise False
+        """
+        return not self._task.done()
+
+    @property
+    def is_completed(self) -> bool:
+        """
+        :return: True if the action is done (whether it succeeded or not), otherwise False
+        """
+        return self._task.done()
+
+    @property
+    def has_failed(self) -> bool:
+        """
+        :return: True if the action failed or was aborted, otherwise False
+        """
+
+        if not self._task.done():
+            return False
+
+        return self._task.cancelled() or self._task.exception() is not None or self._task.result() is False
+
+    def abort(self):
+        """
+        Abort the action.
+
+        The robot stops counting it as in progress right away (before it has
+        actually wound down), like the real one.
+        """
+
+        self._task.cancel()
+        self._robot._actions.discard(self)
+
+    async def wait_for_completed(self, timeout=None) -> SimEvent:
+        """
+        :param timeout: The maximum time to wait (seconds; None for no limit)
+        :return: The completion event
+        """
+
+        done, _ = await asyncio.wait([self._task], timeout=timeout)
+        if not done:
+            raise asyncio.TimeoutError()
+
+        return SimEvent(action=self, state='failed' if self.has_failed else 'succeeded')
+
+
+class SimBehavior:
+    """
+    A simulated robot behavior.
+
+    The only behavior simulated is looking around in place, which just spins
+    the robot slowly until stopped.
+    """
+
+    def __init__(self, robot: 'SimRobot', speed: float = math.radians(40)):
+        """
+        :param robot: The robot
+        :param speed: The spin rate (radians per second)
+        """
+
+        self._robot = robot
+        self._running = True
+
+        robot._set_wheels(-speed * TRACK_WIDTH / 2, speed * TRACK_WIDTH / 2)
+
+    @property
+    def is_active(self) -> bool:
+        """
+        :return: True if the behavior is running, otherwise False
+        """
+        return self._running
+
+    def stop(self):
+        """
+        Stop the behavior.
+        """
+
+        if self._running:
+            self._running = False
+            self._robot.stop_all_motors()
+
+
+class SimCharger:
+    """
+    The simulated robot's idea of where its charger is.
+    """
+
+    def __init__(self, robot: 'SimRobot'):
+        """
+        :param robot: The robot
+        """
+
+        self._robot = robot
+
+        # Where the charger was last seen (in the robot's frame of reference at the time)
+        self.pose: Optional[Pose] = None
+        self.last_observed_time: Optional[float] = None
+
+    @property
+    def time_since_last_seen(self) -> float:
+        """
+        :return: The time since the charger was last seen (seconds; infinite if never)
+        """
+
+        if self.last_observed_time is None:
+            return math.inf
+
+        return self._robot.loop.time() - self.last_observed_time
+
+    @property
+    def is_visible(self) -> bool:
+        """
+        :return: True if the charger is in view, otherwise False
+        """
+        return self._robot._look()
+
+
+class SimObject:
+    """
+    A simulated object the robot has seen (a cube).
+    """
+
+    def __init__(self, object_id: int, pose: Pose):
+        """
+        :param object_id: The object ID
+        :param pose: Where the object was seen (in the robot's frame of reference at the time)
+        """
+
+        self.object_id = object_id
+        self.pose = pose
+
+
+class SimWorld:
+    """
+    The simulated robot's world.
+    """
+
+    def __init__(self, robot: 'SimRobot'):
+        """
+        :param robot: The robot
+        """
+
+        self._robot = robot
+        self._charger = SimCharger(robot)
+
+    @property
+    def charger(self) -> Optional[SimCharger]:
+        """
+        :return: The charger, or None if it has never been seen
+        """
+
+        # Take a look (this is rate limited to the camera frame rate)
+        self._robot._look()
+
+        return self._charger if self._charger.pose is not None else None
+
+    @property
+    def visible_objects(self) -> List[SimObject]:
+        """
+        :return: The objects in view (this is rate limited to the camera frame rate)
+        """
+        return self._robot._look_for_objects()
+
+    async def wait_for_observed_charger(self, timeout=None, include_existing=True) -> SimCharger:
+        """
+        Wait until the charger is seen.
+
+        :param timeout: The maximum time to wait (seconds; None for no limit)
+        :param include_existing: True to return right away if the charger is in view
+        :return: The charger
+        """
+
+        if include_existing and self._robot._look():
+            return self._charger
+
+        async def watch():
+            while True:
+                await asyncio.sleep(1 / VISION_RATE)
+                if self._robot._look():
+                    return self._charger
+
+        return await asyncio.wait_for(watch(), timeout)
+
+
+class SimRobot:
+    """
+    A simulated Cozmo robot.
+
+    This is a lightweight 2D kinematic model of a Cozmo and its charger, which
+    duck-types the parts of cozmo.robot.Robot that our driving code uses. The
+    robot has a true pose, which the physics moves, and an estimated pose, which
+    is all the driving code gets to see. Tread slip makes the two drift apart,
+    and sightings of the charger are noisy and sometimes missed, so the code
+    under test deals with the same sort of trouble it would in real life.
+
+    The robot keeps time by its event loop. Run it on a VirtualTimeLoop, and
+    minutes of driving take milliseconds.
+
+    All poses are x and y (mm) and heading (radians).
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, rng: random.Random = None, serial: str = 'sim',
+                 start: Tuple[float, float, float] = (0, 0, 0), charger: Tuple[float, float, float] = (0, 0, 0),
+                 slip: float = 0.02, vision_noise: float = 2, vision_angle_noise: float = math.radians(1),
+                 detect_prob: float = 0.9, delocalize_rate: float = 0, voltage: float = FULL_VOLTAGE,
+                 obstacles: Sequence[Tuple[float, float, float, bool]] = ()):
+        """
+        :param loop: The event loop
+        :param rng: The random number generator (optional)
+        :param serial: The serial number
+        :param start: The true starting pose of the robot
+        :param charger: The true pose of the charger (the lip of its ramp, facing into it)
+        :param slip: The standard deviation of tread slip (fraction of tread speed)
+        :param vision_noise: The standard deviation of charger sightings at 200 mm (mm)
+        :param vision_angle_noise: The standard deviation of the heading of charger sightings (radians)
+        :param detect_prob: The chance of spotting the charger in a frame where it is in view
+        :param delocalize_rate: The rate at which the robot loses its bearings while moving (per second)
+        :param voltage: The starting battery voltage (volts)
+        :param obstacles: The true obstacles (x, y, radius in mm, and whether the camera sees it as a cube)
+        """
+
+        self.loop = loop
+        self.serial = serial
+
+        self._rng = rng if rng is not None else random.Random()
+        self._slip = slip
+        self._vision_noise = vision_noise
+        self._vision_angle_noise = vision_angle_noise
+        self._detect_prob = detect_prob
+        self._delocalize_rate = delocalize_rate
+
+        # The true pose and the estimated pose
+        self._x, self._y, self._theta = start
+        self._est_x, self._est_y, self._est_theta = 0.0, 0.0, 0.0
+        self._origin_id = 1
+
+        # The true charger pose
+        self._charger_x, self._charger_y, self._charger_theta = charger
+
+        # The commanded tread speeds (mm/s) and how much each tread is slipping (fraction)
+        self._left = 0.0
+        self._right = 0.0
+        self._slip_left = 0.0
+        self._slip_right = 0.0
+
+        # True while stuck riding up the charger's wall
+        self._on_wall = False
+
+        # The obstacles, and whether (and how often) the robot has run into one
+        self._obstacles = list(obstacles)
+        self._bumped = False
+        self._bumps = 0
+
+        # The time up to which the physics has run
+        self._time = loop.time()
+
+        # The head angle (radians) and lift height (0 to 1)
+        self._head_angle = 0.0
+        self._lift_height = 0.0
+
+        # The true battery voltage
+        self._voltage = voltage
+
+        # The last camera frame and whether the charger was spotted in it
+        self._frame_time = None
+        self._saw_charger = False
+
+        # The last camera frame looked over for objects and what was spotted in it
+        self._objects_frame_time = None
+        self._seen_objects: List[SimObject] = []
+
+        # The actions in progress, and the one driving the treads (if any)
+        self._actions: Set[SimAction] = set()
+        self._motion: Optional[SimAction] = None
+
+        self.world = SimWorld(self)
+
+    # Where things are
+
+    @property
+    def pose(self) -> Pose:
+        """
+        :return: The estimated pose
+        """
+
+        self._advance()
+        return Pose(self._est_x, self._est_y, 0, angle_z=radians(self._est_theta), origin_id=self._origin_id)
+
+    @property
+    def pose_angle(self) -> Angle:
+        """
+        :return: The estimated heading
+        """
+
+        self._advance()
+        return radians(self._est_theta)
+
+    @property
+    def pose_pitch(self) -> Angle:
+        """
+        :return: The pitch (as measured by the accelerometer, so with some noise)
+        """
+
+        self._advance()
+        return Angle(degrees=self._pitch() + self._rng.gauss(0, 0.2))
+
+    @property
+    def true_pose(self) -> Tuple[float, float, float]:
+        """
+        :return: The true pose (for checking up on the code under test)
+        """
+
+        self._advance()
+        return self._x, self._y, self._theta
+
+    @property
+    def head_angle(self) -> Angle:
+        """
+        :return: The head angle
+        """
+        return radians(self._head_angle)
+
+    @property
+    def lift_height(self) -> float:
+        """
+        :return: The lift height (0 to 1)
+        """
+        return self._lift_height
+
+    # Charging
+
+    @property
+    def is_on_charger(self) -> bool:
+        """
+        :return: True if the robot is touching the charger's contacts, otherwise False
+        """
+
+        self._advance()
+        return self._on_contacts()
+
+    @property
+    def is_charging(self) -> bool:
+        """
+        :return: True if the battery is charging, otherwise False
+        """
+        return self.is_on_charger and self._voltage < FULL_VOLTAGE
+
+    @property
+    def battery_voltage(self) -> float:
+        """
+        :return: The battery voltage (noisy, and sagging while the motors run)
+        """
+
+        self._advance()
+
+        sag = 0.05 if self._left or self._right else 0
+        return self._voltage - sag + self._rng.gauss(0, 0.02)
+
+    # Moving
+
+    def drive_wheel_motors(self, l_wheel_speed, r_wheel_speed, l_wheel_acc=None, r_wheel_acc=None):
+        """
+        :param l_wheel_speed: The left tread speed (mm/s)
+        :param r_wheel_speed: The right tread speed (mm/s)
+        """
+
+        self._set_wheels(l_wheel_speed, r_wheel_speed)
+
+    async def drive_wheels(self, l_wheel_speed, r_wheel_speed, l_wheel_acc=None, r_wheel_acc=None, duration=None):
+        """
+        :param l_wheel_speed: The left tread speed (mm/s)
+        :param r_wheel_speed: The right tread speed (mm/s)
+        :param duration: How long to drive before stopping (seconds; None to keep going)
+        """
+
+        self._set_wheels(l_wheel_speed, r_wheel_speed)
+
+        if duration:
+            await asyncio.sleep(duration)
+            self.stop_all_motors()
+
+    def stop_all_motors(self):
+        self._set_wheels(0, 0)
+
+    def abort_all_actions(self, log_abort_messages=False):
+        for action in list(self._actions):
+            action.abort()
+
+    async def backup_onto_charger(self, max_drive_time=3):
+        """
+        :param max_drive_time: The longest to back up without touching the contacts (seconds)
+        """
+
+        self._set_wheels(-30, -30)
+
+        deadline = self.loop.time() + max_drive_time
+        while not self.is_on_charger and self.loop.time() < deadline:
+            await asyncio.sleep(0.1)
+
+        self.stop_all_motors()
+
+    def turn_in_place(self, angle: Angle, in_parallel=False, num_retries=0, speed: Angle = None, accel=None,
+                      angle_tolerance=None, is_absolute=False) -> SimAction:
+        turn = angle.radians
+        if is_absolute:
+            turn = _clip_angle(turn - self.pose_angle.radians)
+
+        return self._motion_action(self._turn(turn, speed.radians if speed is not None else math.radians(100)),
+                                   in_parallel)
+
+    def drive_straight(self, distance, speed, should_play_anim=True, in_parallel=False,
+                       num_retries=0) -> SimAction:
+        return self._motion_action(self._drive(distance.distance_mm, speed.speed_mmps), in_parallel)
+
+    def drive_off_charger_contacts(self, in_parallel=False, num_retries=0) -> SimAction:
+        return self._motion_action(self._drive(40, 50), in_parallel)
+
+    def go_to_pose(self, pose: Pose, relative_to_robot=False, in_parallel=False, num_retries=0) -> SimAction:
+        if relative_to_robot:
+            pose = self.pose.define_pose_relative_this(pose)
+        elif pose.origin_id != self._origin_id:
+            return self._motion_action(self._fail(), in_parallel)
+
+        return self._motion_action(self._travel(pose.position.x, pose.position.y, pose.rotation.angle_z.radians),
+                                   in_parallel)
+
+    def go_to_object(self, target_object: SimCharger, distance_from_object, use_pre_dock_pose=False,
+                     in_parallel=False, num_retries=0) -> SimAction:
+        pose = target_object.pose
+        if pose is None or pose.origin_id != self._origin_id:
+            return self._motion_action(self._fail(), in_parallel)
+
+        # Line up facing the object
+        heading = pose.rotation.angle_z.radians
+        x = pose.position.x - distance_from_object.distance_mm * math.cos(heading)
+        y = pose.position.y - distance_from_object.distance_mm * math.sin(heading)
+        return self._motion_action(self._travel(x, y, heading), in_parallel)
+
+    def start_behavior(self, behavior_type) -> SimBehavior:
+        return SimBehavior(self)
+
+    # Head, lift, and the show
+
+    def set_head_angle(self, angle: Angle, accel=10.0, max_speed=10.0, duration=0.0, warn_on_clamp=True,
+                       in_parallel=False, num_retries=0) -> SimAction:
+        async def move():
+            await asyncio.sleep(math.fabs(angle.radians - self._head_angle) / max_speed + 0.05)
+            self._head_angle = angle.radians
+            return True
+
+        return SimAction(self, move(), in_parallel)
+
+    def set_lift_height(self, height, accel=10.0, max_speed=10.0, duration=0.0, in_parallel=False,
+                        num_retries=0) -> SimAction:
+        async def move():
+            # The lift travels about 0.86 radians from bottom to top
+            await asyncio.sleep(math.fabs(height - self._lift_height) * 0.86 / max_speed + 0.05)
+            self._lift_height = height
+            return True
+
+        return SimAction(self, move(), in_parallel)
+
+    def play_anim_trigger(self, trigger, loop_count=1, in_parallel=False, num_retries=0, use_lift_safe=False,
+                          ignore_body_track=False, ignore_head_track=False, ignore_lift_track=False) -> SimAction:
+        return SimAction(self, self._pause(2 * loop_count), in_parallel)
+
+    def say_text(self, text, play_excited_animation=False, use_cozmo_voice=True, duration_scalar=1.0,
+                 voice_pitch=0.0, in_parallel=False, num_retries=0) -> SimAction:
+        return SimAction(self, self._pause(0.5 + 0.1 * len(text) * duration_scalar), in_parallel)
+
+    # Events
+
+    async def wait_for(self, event_or_filter, timeout=30) -> SimEvent:
+        """
+        Wait for an event.
+
+        Only robot state updates are simulated.
+
+        :param event_or_filter: The event (cozmo.robot.EvtRobotStateUpdated)
+        :param timeout: The maximum time to wait (seconds; None for no limit)
+        :return: The event
+        """
+
+        if event_or_filter is not cozmo.robot.EvtRobotStateUpdated:
+            raise ValueError(f'Cannot simulate {event_or_filter}')
+
+        await asyncio.wait_for(asyncio.sleep(1 / STATE_RATE), timeout)
+        return SimEvent(robot=self)
+
+    # Mishaps
+
+    @property
+    def bumps(self) -> int:
+        """
+        :return: The number of times the robot has run into an obstacle
+        """
+        return self._bumps
+
+    def delocalize(self):
+        """
+        Make the robot lose its bearings (as if it were picked up).
+
+        Its estimated pose starts over in a new frame of reference, so nothing
+        it saw before is comparable anymore.
+        """
+
+        self._advance()
+
+        self._origin_id += 1
+        self._est_x, self._est_y, self._est_theta = 0.0, 0.0, 0.0
+
+    # Innards
+
+    def _motion_action(self, coro: Awaitable[bool], in_parallel: bool) -> SimAction:
+        """
+        Start an action that drives the treads, aborting any such action before it.
+
+        :param coro: The coroutine carrying out the action
+        :param in_parallel: True to run alongside whatever else is going
+        :return: The action
+        """
+
+        # Only one action can drive the treads at a time
+        # (an action that isn't in parallel can't start while another is going anyway)
+        if in_parallel and self._motion is not None and self._motion.is_running:
+            self._motion.abort()
+
+        self._motion = SimAction(self, coro, in_parallel)
+        return self._motion
+
+    async def _fail(self) -> bool:
+        await asyncio.sleep(0.1)
+        return False
+
+    async def _pause(self, seconds: float) -> bool:
+        await asyncio.sleep(seconds)
+        return True
+
+    async def _turn(self, angle: float, speed: float) -> bool:
+        """
+        Turn in place by dead reckoning.
+
+        :param angle: The angle to turn (radians)
+        :param speed: The turn rate (radians per second)
+        :return: True
+        """
+
+        if angle == 0:
+            return True
+
+        tread = math.copysign(speed * TRACK_WIDTH / 2, angle)
+        try:
+            self._set_wheels(-tread, tread)
+            await asyncio.sleep(math.fabs(angle) / speed)
+        finally:
+            self.stop_all_motors()
+
+        return True
+
+    async def _drive(self, distance: float, speed: float) -> bool:
+        """
+        Drive straight by dead reckoning.
+
+        :param distance: The distance (mm; negative to back up)
+        :param speed: The speed (mm/s)
+        :return: True, or False if the robot ran into an obstacle on the way
+        """
+
+        if distance == 0:
+            return True
+
+        tread = math.copysign(math.fabs(speed), distance)
+        try:
+            self._set_wheels(tread, tread)
+            self._bumped = False
+            await asyncio.sleep(math.fabs(distance / speed))
+        finally:
+            self.stop_all_motors()
+
+        return not self._bumped
+
+    async def _travel(self, x: float, y: float, heading: float) -> bool:
+        """
+        Travel to a pose by turning, driving, and turning, going by the estimated pose.
+
+        :return: True, or False if the robot ran into an obstacle on the way
+        """
+
+        self._advance()
+
+        dx = x - self._est_x
+        dy = y - self._est_y
+        bearing = math.atan2(dy, dx)
+
+        await self._turn(_clip_angle(bearing - self._est_theta), math.radians(100))
+        if not await self._drive(math.hypot(dx, dy), 100):
+            return False
+        await self._turn(_clip_angle(heading - self._est_theta), math.radians(100))
+        return True
+
+    def _set_wheels(self, left: float, right: float):
+        """
+        Command the tread speeds.
+
+        :param left: The left tread speed (mm/s)
+        :param right: The right tread speed (mm/s)
+        """
+
+        self._advance()
+
+        self._left = left
+        self._right = right
+
+        # Every new command slips a little differently
+        self._slip_left = self._rng.gauss(0, self._slip)
+        self._slip_right = self._rng.gauss(0, self._slip)
+
+    def _charger_frame(self, x: float, y: float, theta: float) -> Tuple[float, float, float]:
+        """
+        Express a true robot pose relative to the charger.
+
+        :return: The distance along the charger's axis from the lip, the distance off
+            the axis (mm), and how far off the robot is from facing straight out (radians)
+        """
+
+        dx = x - self._charger_x
+        dy = y - self._charger_y
+        cos = math.cos(self._charger_theta)
+        sin = math.sin(self._charger_theta)
+
+        along = dx * cos + dy * sin
+        across = -dx * sin + dy * cos
+        facing = _clip_angle(theta - self._charger_theta - math.pi)
+
+        return along, across, facing
+
+    def _near_ramp(self, along: float, across: float, facing: float) -> bool:
+        """
+        :return: True if the robot is backed up to (or onto) the charger's ramp, otherwise False
+        """
+
+        return (math.fabs(across) < CHARGER_HALF_WIDTH and math.fabs(facing) < math.pi / 3
+                and along + HALF_LENGTH >= 0 and along - HALF_LENGTH <= CHARGER_DEPTH)
+
+    def _pitch(self) -> float:
+        """
+        :return: The true pitch (degrees)
+        """
+
+        if self._on_wall:
+            return WALL_PITCH
+
+        along, across, facing = self._charger_frame(self._x, self._y, self._theta)
+        if not self._near_ramp(along, across, facing):
+            return 0
+
+        # Tilted back with only the rear wheels on the ramp
+        if along + HALF_LENGTH >= 0 > along - HALF_LENGTH:
+            return CLIMB_PITCH
+
+        return 0
+
+    def _on_contacts(self) -> bool:
+        """
+        :return: True if the robot is touching the charger's contacts, otherwise False
+        """
+
+        if self._on_wall:
+            return False
+
+        along, across, facing = self._charger_frame(self._x, self._y, self._theta)
+        return (CONTACTS[0] <= along <= CONTACTS[1] and math.fabs(across) <= CLIMB_LATERAL_TOL
+                and math.fabs(facing) <= CLIMB_ANGLE_TOL)
+
+    def _advance(self):
+        """
+        Run the physics up to the current time.
+        """
+
+        now = self.loop.time()
+        elapsed = now - self._time
+        if elapsed <= 0:
+            return
+
+        self._time = now
+
+        moving = bool(self._left or self._right)
+
+        # Drain (or charge) the battery
+        if self._on_contacts():
+            self._voltage = min(FULL_VOLTAGE, self._voltage + CHARGE_RATE * elapsed)
+        else:
+            self._voltage -= (DRAIN_MOVING if moving else DRAIN_IDLE) * elapsed
+
+        if not moving:
+            return
+
+        # What the robot thinks it's doing (its odometry doesn't know about slip)
+        v_est = (self._left + self._right) / 2
+        w_est = (self._right - self._left) / TRACK_WIDTH
+
+        # What it's actually doing
+        left = self._left * (1 + self._slip_left)
+        right = self._right * (1 + self._slip_right)
+        v = (left + right) / 2
+        w = (right - left) / TRACK_WIDTH
+
+        if self._delocalize_rate and self._rng.random() < self._delocalize_rate * elapsed:
+            self.delocalize()
+
+        # Unless backing up near the charger or close to an obstacle, nothing gets in the way, so take it in one step
+        _, _, facing = self._charger_frame(self._x, self._y, self._theta)
+        reach = CHARGER_DEPTH + 2 * HALF_LENGTH + math.fabs(v) * elapsed
+        clear = (math.hypot(self._x - self._charger_x, self._y - self._charger_y) > reach
+                 or math.fabs(facing) > math.pi / 3 + math.fabs(w) * elapsed)
+        clear = clear and all(math.hypot(self._x - x, self._y - y) > radius + BODY_RADIUS + math.fabs(v) * elapsed
+                              for x, y, radius, _ in self._obstacles)
+        if not self._on_wall and clear:
+            self._x, self._y, self._theta = _arc(self._x, self._y, self._theta, v, w, elapsed)
+            self._est_x, self._est_y, self._est_theta = _arc(self._est_x, self._est_y, self._est_theta,
+                                                             v_est, w_est, elapsed)
+            return
+
+        # Up close, move in small steps, minding the charger
+        steps = max(1, math.ceil(elapsed / TIME_STEP))
+        dt = elapsed / steps
+
+        for _ in range(steps):
+            x, y, theta = _arc(self._x, self._y, self._theta, v, w, dt)
+
+            if not self._can_move(x, y, theta, v):
+                continue
+
+            self._x, self._y, self._theta = x, y, theta
+            self._est_x, self._est_y, self._est_theta = _arc(self._est_x, self._est_y, self._est_theta,
+                                                             v_est, w_est, dt)
+
+    def _can_move(self, x: float, y: float, theta: float, v: float) -> bool:
+        """
+        Check if the robot can move to a new pose, given the charger in the way.
+
+        :param x: The new x (mm)
+        :param y: The new y (mm)
+        :param theta: The new heading (radians)
+        :param v: The forward speed (mm/s)
+        :return: True if so, otherwise False
+        """
+
+        # Running into an obstacle stops the robot (though it can still turn or back away)
+        for ox, oy, radius, _ in self._obstacles:
+            reach = radius + BODY_RADIUS
+            distance = math.hypot(x - ox, y - oy)
+            if distance < reach and distance < math.hypot(self._x - ox, self._y - oy):
+                if not self._bumped:
+                    self._bumps += 1
+                self._bumped = True
+                return False
+
+        # Driving forward gets the robot off the wall
+        if self._on_wall:
+            if v <= 0:
+                return False
+            self._on_wall = False
+
+        along, across, facing = self._charger_frame(x, y, theta)
+        if not self._near_ramp(along, across, facing):
+            return True
+
+        # Backing onto the ramp crooked rides the rear wheels up the side wall
+        was_along, _, _ = self._charger_frame(self._x, self._y, self._theta)
+        if was_along + HALF_LENGTH < 0 <= along + HALF_LENGTH:
+            if math.fabs(across) > CLIMB_LATERAL_TOL or math.fabs(facing) > CLIMB_ANGLE_TOL:
+                self._on_wall = True
+                return False
+
+        # The back wall stops the robot
+        return along <= CONTACTS[1] or v > 0
+
+    def _look(self) -> bool:
+        """
+        Take a look with the camera (at most once per frame).
+
+        If the charger is in view, and the robot makes it out, the sighting is
+        recorded in the world in the robot's frame of reference.
+
+        :return: True if the charger was spotted in the current frame, otherwise False
+        """
+
+        now = self.loop.time()
+        if self._frame_time is not None and now - self._frame_time < 1 / VISION_RATE:
+            return self._saw_charger
+
+        self._frame_time = now
+        self._advance()
+
+        # The camera is at the front of the robot, and the marker is on the charger's back wall
+        cam_x = self._x + HALF_LENGTH * math.cos(self._theta)
+        cam_y = self._y + HALF_LENGTH * math.sin(self._theta)
+        marker_x = self._charger_x + CHARGER_DEPTH * math.cos(self._charger_theta)
+        marker_y = self._charger_y + CHARGER_DEPTH * math.sin(self._charger_theta)
+
+        dx = marker_x - cam_x
+        dy = marker_y - cam_y
+        distance = math.hypot(dx, dy)
+        bearing = _clip_angle(math.atan2(dy, dx) - self._theta)
+
+        # The marker faces out of the charger, so it can't be read from too far off to the side
+        obliqueness = _clip_angle(math.atan2(dy, dx) - self._charger_theta)
+
+        self._saw_charger = (CAMERA_RANGE[0] <= distance <= CAMERA_RANGE[1]
+                             and math.fabs(bearing) <= CAMERA_FOV / 2
+                             and math.fabs(obliqueness) <= math.radians(70)
+                             and math.fabs(self._head_angle) < math.radians(20)
+                             and self._rng.random() < self._detect_prob)
+
+        if self._saw_charger:
+            self._record_sighting(distance)
+
+        return self._saw_charger
+
+    def _look_for_objects(self) -> List[SimObject]:
+        """
+        Take a look for objects with the camera (at most once per frame).
+
+        :return: The objects spotted in the current frame
+        """
+
+        now = self.loop.time()
+        if self._objects_frame_time is not None and now - self._objects_frame_time < 1 / VISION_RATE:
+            return self._seen_objects
+
+        self._objects_frame_time = now
+        self._advance()
+
+        cam_x = self._x + HALF_LENGTH * math.cos(self._theta)
+        cam_y = self._y + HALF_LENGTH * math.sin(self._theta)
+
+        self._seen_objects = []
+
+        for object_id, (x, y, _, is_cube) in enumerate(self._obstacles, start=1):
+            dx = x - cam_x
+            dy = y - cam_y
+            distance = math.hypot(dx, dy)
+            bearing = _clip_angle(math.atan2(dy, dx) - self._theta)
+
+            if (is_cube and CUBE_RANGE[0] <= distance <= CUBE_RANGE[1] and math.fabs(bearing) <= CAMERA_FOV / 2
+                    and self._rng.random() < self._detect_prob):
+                seen_x, seen_y, seen_theta = self._sighting(x, y, 0, distance)
+                pose = Pose(seen_x, seen_y, 0, angle_z=radians(seen_theta), origin_id=self._origin_id)
+                self._seen_objects.append(SimObject(object_id, pose))
+
+        return self._seen_objects
+
+    def _record_sighting(self, distance: float):
+        """
+        Record a sighting of the charger, as the robot would see it.
+
+        :param distance: The distance to the charger (mm)
+        """
+
+        x, y, theta = self._sighting(self._charger_x, self._charger_y, self._charger_theta, distance)
+
+        charger = self.world._charger
+        charger.pose = Pose(x, y, 0, angle_z=radians(theta), origin_id=self._origin_id)
+        charger.last_observed_time = self.loop.time()
+
+    def _sighting(self, x: float, y: float, theta: float, distance: float) -> Tuple[float, float, float]:
+        """
+        Find where the robot sees something to be.
+
+        :param x: The true x (mm)
+        :param y: The true y (mm)
+        :param theta: The true heading (radians)
+        :param distance: The distance to it (mm)
+        :return: The x, y, and heading the robot sees, in its own frame of reference
+        """
+
+        # The thing relative to where the robot truly is
+        dx = x - self._x
+        dy = y - self._y
+        cos = math.cos(self._theta)
+        sin = math.sin(self._theta)
+        rel_x = dx * cos + dy * sin
+        rel_y = -dx * sin + dy * cos
+        rel_theta = theta - self._theta
+
+        # Farther sightings are less precise
+        sigma = self._vision_noise * max(1.0, distance / 200)
+        rel_x += self._rng.gauss(0, sigma)
+        rel_y += self._rng.gauss(0, sigma)
+        rel_theta += self._rng.gauss(0, self._vision_angle_noise)
+
+        # ...and relative to where the robot thinks it is
+        cos = math.cos(self._est_theta)
+        sin = math.sin(self._est_theta)
+        return (self._est_x + rel_x * cos - rel_y * sin, self._est_y + rel_x * sin + rel_y * cos,
+                _clip_angle(self._est_theta + rel_theta))
@@ -1,6 +1,33 @@
-show databases;
+-- Sets up the friends database on a MySQL server by hand, as of schema version 4
+-- cozmonaut/database/schema.py creates and migrates the tables itself, so only the database is strictly needed
 create database Cozmo;
 
 use Cozmo;
 
-create table images(val numeric(50));
+CREATE TABLE Students (
+    	Studentid int NOT NULL AUTO_INCREMENT,
+    	Name varchar(255) NOT NULL,
+    	Date_seen DATETIME NOT NULL DEFAULT NOW(),
+    	Ident blob,
+    	PRIMARY KEY (Studentid),
+    	INDEX Students_name (Name),
+    	INDEX Students_seen (Date_seen)
+    );
+
+CREATE TABLE FriendChanges (
+    	Version int NOT NULL AUTO_INCREMENT,
+    	Studentid int NOT NULL,
+    	PRIMARY KEY (Version)
+    );
+
+CREATE TRIGGER Students_added AFTER INSERT ON Students FOR EACH ROW
+    	INSERT INTO FriendChanges (Studentid) VALUES (NEW.Studentid);
+
+CREATE TRIGGER Students_changed AFTER UPDATE ON Students FOR EACH ROW
+    	INSERT INTO FriendChanges (Studentid) SELECT NEW.Studentid FROM DUAL WHERE NOT (NEW.Ident <=> OLD.Ident);
+
+CREATE TRIGGER Students_removed AFTER DELETE ON Students FOR EACH ROW
+    	INSERT INTO FriendChanges (Studentid) VALUES (OLD.Studentid);
+
+CREATE TABLE SchemaVersion (Version int NOT NULL);
+INSERT INTO SchemaVersion (Version) VALUES (4);
@@ -9,13 +9,11 @@ connection = mysql.connector.connect(
         database="cozmo"
 )
 
-dateTime = datetime.now()
-dateFormat = dateTime.strftime('%Y-%m-%d %H:%M:%S')
 myCursor = connection.cursor()    
 
-# Retrieve and return 'Studentid' & 'imageID' pairs from db
+# Retrieve and return 'Studentid' & 'Ident' pairs from db
 def loadStudents():
-    selectQuery = """SELECT Studentid, Image FROM Students"""
+    selectQuery = """SELECT Studentid, Ident FROM Students"""
     myCursor.execute(selectQuery)
     retrieveAll = myCursor.fetchall()
 
@@ -24,34 +22,30 @@ def loadStudents():
             #print(studentPairs)
             return (studentPairs)
 
-# If studentID not seen by cosmo, insert new student with their name and imageID;
+# If studentID not seen by cosmo, insert new student with their name and face identity;
+# The identity is a binary record (see encode_ident in cozmonaut/database/friends.py)
 # Returns 'Studentid'
-def insertNewStudent(studentName, imageID):
+def insertNewStudent(studentName, ident):
     
-    insertStudent = """INSERT INTO Students(Name, Image) VALUES('%s', '%s')""" % (studentName, imageID)
-    myCursor.execute(insertStudent)
+    insertStudent = """INSERT INTO Students(Name, Ident) VALUES(%s, %s)"""
+    myCursor.execute(insertStudent, (studentName, ident))
     connection.commit()
     print("Insertion was a success...")
-    
-    returnID = """SELECT Studentid FROM Students WHERE Name = '%s' AND Image = '%s'""" % (studentName, imageID)
-    myCursor.execute(returnID)
-    fetchID = myCursor.fetchall()
-    if fetchID is not None:
-       for x in fetchID:
-            print("Returning Student's ID..")
-            #print (x[0]) #will return studentID number ? switch orint with return
-            return(x[0])
+
+    # The new ID comes straight from the insert (no need to look it up by name and identity)
+    print("Returning Student's ID..")
+    return myCursor.lastrowid
             
 # If studentID seen by cozmo before, update the Date_seen
 def checkForStudent(studentID):
     
-    checkUser = """SELECT Studentid FROM Students WHERE Studentid = '%s'""" % (studentID)
-    myCursor.execute(checkUser)
+    checkUser = """SELECT Studentid FROM Students WHERE Studentid = %s"""
+    myCursor.execute(checkUser, (studentID,))
     check = myCursor.fetchone()
     
     if check is not None: 
-        updateExistingUser = """UPDATE Students SET Date_seen = '%s' WHERE Image = '%s'""" % (dateFormat, studentID)
-        myCursor.execute(updateExistingUser)
+        updateExistingUser = """UPDATE Students SET Date_seen = %s WHERE Studentid = %s"""
+        myCursor.execute(updateExistingUser, (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), studentID))
         connection.commit() #Needed To Update Database
         print("Studentid has been seen, updating 'Date_seen' Column;")
         
@@ -0,0 +1,152 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+import math
+import random
+
+import pytest
+
+from cozmonaut.component.client.operation.interact.battery import BatteryModel, SwapScheduler
+
+# The discharge rate of the synthetic curves (volts per second)
+RATE = 0.0002
+
+
+def _linear(t: float) -> float:
+    """
+    A steady discharge.
+    """
+    return 4.1 - RATE * t
+
+
+def _knee(t: float) -> float:
+    """
+    A discharge that falls off a cliff near the end, as lithium cells do.
+    """
+    return 4.1 - RATE / 2 * t - 0.3 * math.exp((t - 3800) / 600)
+
+
+def _sag(t: float) -> float:
+    """
+    A steady discharge, sagging whenever the motors work (half the time).
+    """
+    return _linear(t) - (0.08 if (t // 20) % 2 else 0)
+
+
+def _discharge(curve, seed: int, scheduler: SwapScheduler, noise: float = 0.02, until: int = 0):
+    """
+    Feed a battery model one noisy reading a second from a discharge curve,
+    until the swap is due, the curve has crossed the threshold, and the given
+    time has passed.
+
+    :return: The model, when the swap was first due, and when the curve crossed the threshold
+    """
+
+    rng = random.Random(seed)
+    model = BatteryModel()
+
+    swap = None
+    cross = None
+
+    for t in range(10000):
+        voltage = curve(t)
+        if cross is None and voltage <= scheduler.threshold:
+            cross = t
+
+        model.add(t, voltage + rng.gauss(0, noise))
+        if swap is None and scheduler.swap_due(model):
+            swap = t
+
+        if swap is not None and cross is not None and t >= until:
+            break
+
+    return model, swap, cross
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_time_to_empty_on_linear_discharge(seed):
+    rng = random.Random(seed)
+    model = BatteryModel()
+
+    for t in range(1801):
+        model.add(t, _linear(t) + rng.gauss(0, 0.02))
+
+        if t in (600, 1200, 1800):
+            truth = (_linear(t) - 3.5) / RATE
+            assert model.time_to(3.5) == pytest.approx(truth, rel=0.15)
+
+    assert model.slope == pytest.approx(-RATE, rel=0.15)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_swap_on_linear_discharge(seed):
+    scheduler = SwapScheduler(threshold=3.5, lead_time=120)
+    _, swap, cross = _discharge(_linear, seed, scheduler)
+
+    # Around the lead time ahead (smoothing lags a little, and noise jitters the fit)
+    assert cross - 180 <= swap <= cross - 60
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_swap_on_knee_discharge(seed):
+    scheduler = SwapScheduler(threshold=3.5, lead_time=120)
+    _, swap, cross = _discharge(_knee, seed, scheduler)
+
+    # The line fit trails a steepening curve, but the swap still starts well ahead of it
+    assert cross - 180 <= swap <= cross - 60
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_swap_on_sagging_discharge(seed):
+    scheduler = SwapScheduler(threshold=3.5, lead_time=120)
+    _, swap, cross = _discharge(_sag, seed, scheduler)
+
+    # Sagging readings don't set off the swap long before it's needed, nor hold it off too long
+    assert cross - 240 <= swap < cross
+
+
+def test_must_dock_once_at_threshold():
+    scheduler = SwapScheduler(threshold=3.5, lead_time=120)
+    model, _, cross = _discharge(_linear, 0, scheduler, noise=0, until=3020)
+
+    # The smoothed voltage trails the readings by a few seconds
+    assert cross == 3000
+    assert model.voltage <= 3.5
+    assert model.time_to(3.5) == 0
+    assert scheduler.swap_due(model)
+    assert scheduler.must_dock(model)
+
+
+def test_no_prediction_without_enough_history():
+    scheduler = SwapScheduler(threshold=3.5, lead_time=120)
+    model = BatteryModel(min_span=30)
+
+    assert model.time_to(3.5) == math.inf
+
+    # Even a steep fall says nothing until there's enough of it
+    for t in range(30):
+        model.add(t, 4.0 - 0.01 * t)
+
+    assert model.time_to(3.5) == math.inf
+    assert not scheduler.swap_due(model)
+
+    model.add(30, 3.7)
+    assert model.time_to(3.5) < math.inf
+
+
+def test_no_swap_while_charging_or_cleared():
+    scheduler = SwapScheduler(threshold=3.5, lead_time=120)
+    model = BatteryModel()
+
+    for t in range(600):
+        model.add(t, 3.6 + RATE * t)
+
+    assert model.slope > 0
+    assert model.time_to(3.5) == math.inf
+    assert not scheduler.swap_due(model)
+
+    model.clear()
+    assert model.voltage is None
+    assert model.time_to(3.5) == math.inf
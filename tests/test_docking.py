@@ -0,0 +1,129 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+import asyncio
+import math
+import random
+
+import pytest
+
+from cozmonaut.component.client.operation.interact.alignment import AlignmentController
+from cozmonaut.component.client.operation.interact.docking import ChargerDocking, DockingPhase, DockingStats
+from cozmonaut.simulator.loop import VirtualTimeLoop
+from cozmonaut.simulator.robot import SimRobot
+
+
+@pytest.fixture
+def loop():
+    loop = VirtualTimeLoop()
+    yield loop
+    loop.close()
+
+
+async def _align(robot: SimRobot, controller: AlignmentController, target, rate: float = 20, budget: float = 15):
+    """
+    Steer a simulated robot onto a target pose, the way docking does.
+
+    :return: True if it made it within the budget, otherwise False
+    """
+
+    loop = asyncio.get_event_loop()
+    deadline = loop.time() + budget
+
+    try:
+        while loop.time() < deadline:
+            pose = (robot.pose.position.x, robot.pose.position.y, robot.pose.rotation.angle_z.radians)
+            if controller.within_tolerance(pose, target):
+                return True
+
+            robot.drive_wheel_motors(*controller.command(pose, target))
+            await asyncio.sleep(1 / rate)
+    finally:
+        robot.stop_all_motors()
+
+    return False
+
+
+@pytest.mark.parametrize('target', [
+    (150, 0, 0),  # Straight ahead
+    (150, 80, math.pi / 2),  # Ahead and to the side, facing across
+    (-120, 0, 0),  # Straight behind (backs up to it)
+    (-100, -60, math.pi),  # Behind and to the side, facing the other way
+    (0, 0, math.pi / 2),  # Right here, facing another way
+])
+def test_alignment_converges(loop, target):
+    # No slip, so the robot really ends up where it thinks it is
+    robot = SimRobot(loop, random.Random(0), slip=0)
+    controller = AlignmentController()
+
+    assert loop.run_until_complete(_align(robot, controller, target))
+
+    x, y, theta = robot.true_pose
+    distance, heading = controller.error((x, y, theta), target)
+    assert distance < 5
+    assert math.fabs(heading) < math.radians(5)
+
+
+def test_alignment_respects_max_speed():
+    controller = AlignmentController(max_speed=60)
+
+    for pose in [(0, 0, 0), (-500, 300, 2), (400, -400, -3)]:
+        left, right = controller.command(pose, (0, 0, math.pi / 2))
+        assert max(math.fabs(left), math.fabs(right)) <= 60 + 1e-9
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_docking_succeeds(loop, seed):
+    rng = random.Random(seed)
+
+    # Start somewhere in front of the charger, facing any which way (like the docking benchmark)
+    distance = rng.uniform(200, 600)
+    bearing = rng.uniform(-math.pi / 3, math.pi / 3)
+    start = (-distance * math.cos(bearing), distance * math.sin(bearing), rng.uniform(-math.pi, math.pi))
+
+    robot = SimRobot(loop, rng, start=start)
+    docking = ChargerDocking(robot, max_attempts=5)
+    outcome = loop.run_until_complete(docking.dock())
+
+    assert outcome.docked
+    assert 1 <= outcome.attempts <= 5
+    assert robot.is_on_charger
+
+
+def test_docking_gives_up_after_max_attempts(loop):
+    # The charger is never spotted, so every attempt fails
+    robot = SimRobot(loop, random.Random(0), start=(-300, 0, 0), detect_prob=0)
+    stats = DockingStats()
+    docking = ChargerDocking(robot, stats, max_attempts=3, backoff=1, max_backoff=2)
+    outcome = loop.run_until_complete(docking.dock())
+
+    assert not outcome.docked
+    assert outcome.attempts == 3
+    assert outcome.phase is DockingPhase.approach
+    assert len(stats.outcomes) == 1
+
+    # Each attempt fails in the first phase, and all but the last are followed by a recovery and a pause
+    assert stats.success_rate(DockingPhase.approach) == 0
+    assert stats.mean_time(DockingPhase.locate) == 0
+    assert stats.success_rate(DockingPhase.recover) == 1
+    assert outcome.duration <= 3 * 45 + 2 * (10 + 2)
+
+
+def test_docking_phase_times_out(loop):
+    robot = SimRobot(loop, random.Random(0), start=(-300, 0, 0), detect_prob=0)
+    stats = DockingStats()
+    docking = ChargerDocking(robot, stats, max_attempts=1, timeouts={DockingPhase.approach: 2})
+    outcome = loop.run_until_complete(docking.dock())
+
+    assert not outcome.docked
+    assert outcome.attempts == 1
+    assert outcome.phase is DockingPhase.approach
+    assert outcome.reason == 'timed out'
+    assert outcome.duration == pytest.approx(2, abs=0.1)
+
+    # Whatever the phase had the robot doing was stopped
+    before = robot.true_pose
+    loop.run_until_complete(asyncio.sleep(5))
+    assert robot.true_pose == pytest.approx(before)
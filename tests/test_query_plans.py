@@ -0,0 +1,124 @@
+#
+# Cozmonaut
+# Copyright 2019 The Cozmonaut Contributors
+#
+
+import os
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+import numpy
+import pytest
+
+from cozmonaut.database import Database, open_database
+from cozmonaut.database.friends import FriendRepository
+from cozmonaut.database.schema import create_schema
+
+# The number of synthetic friends
+ROWS = 20000
+
+
+@pytest.fixture(scope='module')
+def db(tmp_path_factory):
+    # A single connection, so every statement goes through the one we trace
+    db = open_database('sqlite:///' + os.path.join(str(tmp_path_factory.mktemp('plans')), 'friends.db'), pool_size=1)
+    create_schema(db)
+
+    rng = numpy.random.RandomState(0)
+    repo = FriendRepository(db)
+    repo.add_friends((f'friend {i}', rng.normal(0, 0.1, 128).astype(numpy.float32)) for i in range(ROWS))
+
+    # Spread the last seen dates out over a couple of months
+    with db.transaction() as cursor:
+        cursor.execute("UPDATE Students SET Date_seen = datetime('2019-03-01', '+' || (Studentid * 37 % 100000) || "
+                       "' minutes')")
+
+    yield db
+    db.close()
+
+
+def _plans(db: Database, call: Callable[[], object]) -> List[Tuple[str, List[str]]]:
+    """
+    Run some repository code and explain every query it made.
+
+    :return: The SQL (with parameters filled in) and plan of each SELECT
+    """
+
+    statements = []
+
+    with db.connection() as conn:
+        conn.set_trace_callback(statements.append)
+
+    try:
+        call()
+    finally:
+        with db.connection() as conn:
+            conn.set_trace_callback(None)
+
+    plans = []
+
+    with db.connection() as conn:
+        for sql in statements:
+            if sql.lstrip().upper().startswith('SELECT'):
+                plans.append((sql, [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql)]))
+
+    return plans
+
+
+@pytest.mark.parametrize('sort', ['id', 'name', 'seen'])
+@pytest.mark.parametrize('descending', [False, True])
+def test_iter_friends_pages_in_index_order(db, sort, descending):
+    repo = FriendRepository(db)
+    plans = _plans(db, lambda: list(repo.iter_friends(sort=sort, descending=descending, page_size=8000)))
+
+    assert len(plans) == 3
+
+    for sql, plan in plans:
+        # Never sort the table to find a page
+        assert not any('TEMP B-TREE' in detail for detail in plan), sql
+
+    # Every page after the first seeks straight to where the last one left off
+    for sql, plan in plans[1:]:
+        assert plan[0].startswith('SEARCH Students'), sql
+
+
+def test_iter_friends_seen_since_uses_index(db):
+    repo = FriendRepository(db)
+    plans = _plans(db, lambda: list(repo.iter_friends(sort='seen', seen_since=datetime(2019, 4, 1), page_size=1000)))
+
+    assert plans
+    for sql, plan in plans:
+        assert plan == ['SEARCH Students USING INDEX Students_seen (Date_seen>?)'], sql
+
+
+def test_iter_friends_name_prefix_uses_index(db):
+    repo = FriendRepository(db)
+    plans = _plans(db, lambda: list(repo.iter_friends(sort='name', name_prefix='friend 1', page_size=1000)))
+
+    assert plans
+    for sql, plan in plans:
+        assert len(plan) == 1 and plan[0].startswith('SEARCH Students USING INDEX Students_name'), sql
+
+
+@pytest.mark.parametrize('missing', [(), (5, 7, 11)])
+def test_changes_since_uses_primary_key(db, missing):
+    repo = FriendRepository(db)
+    plans = _plans(db, lambda: repo.changes_since(ROWS - 100, missing))
+
+    assert len(plans) == 1
+    sql, plan = plans[0]
+
+    # Both the log and the friends are looked up by key, never scanned
+    assert not any(detail.startswith('SCAN') for detail in plan), sql
+    assert any('SEARCH c USING INTEGER PRIMARY KEY' in detail for detail in plan), sql
+    assert any('SEARCH s USING INTEGER PRIMARY KEY' in detail for detail in plan), sql
+
+
+def test_load_identities_reads_in_one_pass(db):
+    repo = FriendRepository(db)
+    plans = _plans(db, repo.load_identities)
+
+    # One count and one read, each a single pass over the table with nothing to sort or build
+    assert len(plans) == 2
+    for sql, plan in plans:
+        assert plan == ['SCAN Students'], sql